@@ -0,0 +1,112 @@
+"""
+Markdown Rendering Benchmark
+Render time of large chat transcripts against the previous regex formatter, with and without the cache
+
+Usage:
+    python pipelines/benchmarks/bench_markdown.py [--sizes-kb 16,256,1024,4096] [--repeat N]
+"""
+
+import argparse
+import random
+import re
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from markdown_renderer import render, render_markdown
+
+WORDS = (
+    "the service renders markdown from chat transcripts into html before publishing to wordpress "
+    "with fenced code lists tables and nested emphasis in one linear pass over every line"
+).split()
+
+
+# Previous implementation: Pipeline._format_content_for_wordpress
+
+def legacy_format(content: str) -> str:
+    content = re.sub(r'^### (.+)$', r'<h3>\1</h3>', content, flags=re.MULTILINE)
+    content = re.sub(r'^## (.+)$', r'<h2>\1</h2>', content, flags=re.MULTILINE)
+    content = re.sub(r'^# (.+)$', r'<h1>\1</h1>', content, flags=re.MULTILINE)
+    content = re.sub(r'\*\*(.+?)\*\*', r'<strong>\1</strong>', content)
+    content = re.sub(r'\*(.+?)\*', r'<em>\1</em>', content)
+    content = re.sub(r'\[(.+?)\]\((.+?)\)', r'<a href="\2">\1</a>', content)
+    paragraphs = content.split('\n\n')
+    formatted_paragraphs = []
+    for para in paragraphs:
+        para = para.strip()
+        if para and not para.startswith('<'):
+            para = f'<p>{para}</p>'
+        formatted_paragraphs.append(para)
+    return '\n\n'.join(formatted_paragraphs)
+
+
+def sentence(rng: random.Random) -> str:
+    words = [rng.choice(WORDS) for _ in range(rng.randint(8, 20))]
+    i = rng.randrange(len(words) - 3)
+    style = rng.random()
+    if style < 0.2:
+        words[i] = f"**{words[i]} *{words[i + 1]}* {words[i + 2]}**"
+        del words[i + 1:i + 3]
+    elif style < 0.35:
+        words[i] = f"`{words[i]}()`"
+    elif style < 0.45:
+        words[i] = f"[{words[i]}](https://example.com/{words[i + 1]})"
+    return " ".join(words).capitalize() + "."
+
+
+def chat_reply(rng: random.Random, n: int) -> str:
+    """One assistant reply shaped like typical LLM output"""
+    parts = [f"## Step {n}: {rng.choice(WORDS)} {rng.choice(WORDS)}", " ".join(sentence(rng) for _ in range(3))]
+    parts.append("\n".join(
+        f"{k + 1}. {sentence(rng)}" + (f"\n   - {sentence(rng)}\n   - {sentence(rng)}" if k == 1 else "")
+        for k in range(4)
+    ))
+    code = "\n".join(f"    value_{k} = compute({k}) * 2  # {rng.choice(WORDS)}" for k in range(8))
+    parts.append(f"```python\ndef step_{n}():\n{code}\n    return value_0 < value_1\n```")
+    parts.append("| Option | Default | Effect |\n|:-------|--------:|--------|\n" + "\n".join(
+        f"| `{rng.choice(WORDS)}` | {k} | {sentence(rng)} |" for k in range(5)
+    ))
+    parts.append(f"> **Note:** {sentence(rng)}")
+    return "\n\n".join(parts)
+
+
+def transcript(size: int, seed: int = 7) -> str:
+    rng = random.Random(seed)
+    replies = []
+    length = 0
+    while length < size:
+        replies.append(chat_reply(rng, len(replies) + 1))
+        length += len(replies[-1]) + 2
+    return "\n\n".join(replies)
+
+
+def best_of(func, text: str, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(text)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes-kb", default="16,256,1024,4096")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"{'size':>8} {'regex (previous)':>18} {'renderer':>12} {'per MB':>10} {'cached':>10}")
+    for size_kb in (int(s) for s in args.sizes_kb.split(",")):
+        text = transcript(size_kb * 1024)
+        legacy = best_of(legacy_format, text, args.repeat)
+        uncached = best_of(render, text, args.repeat)
+        render_markdown(text)
+        cached = best_of(render_markdown, text, args.repeat)
+        print(f"{size_kb:>6}KB {legacy * 1e3:>16.1f}ms {uncached * 1e3:>10.1f}ms"
+              f" {uncached / (len(text) / 2**20) * 1e3:>8.1f}ms {cached * 1e3:>8.2f}ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,169 @@
+"""
+Preprocessing Benchmark
+Compares the per-feature regex passes with the single-pass analyzer on ~1 MB documents
+
+Usage:
+    python pipelines/benchmarks/bench_preprocessing.py [--size-kb N] [--repeat N]
+"""
+
+import argparse
+import asyncio
+import re
+import sys
+import time
+from collections import Counter
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import content_preprocessor
+from content_preprocessor import STOP_WORDS, analyze, analyze_async
+
+WORDS = (
+    "wordpress publishing workflow content automation excerpt heading anchor "
+    "pipeline connection schedule retry template category performance"
+).split()
+
+
+def build_document(size_kb: int) -> str:
+    """Synthetic post body: sections of headings and paragraphs"""
+    parts = ["<p>Introduction to the benchmark document. It has many sections.</p>\n"]
+    section = 0
+    while sum(len(p) for p in parts) < size_kb * 1024:
+        section += 1
+        parts.append(f"<h2>Section {section}: {WORDS[section % len(WORDS)].title()}</h2>\n")
+        for paragraph in range(4):
+            words = " ".join(WORDS[(section + paragraph + i) % len(WORDS)] for i in range(40))
+            parts.append(f"<p>{words}. <strong>Note</strong> <a href=\"/x/{section}\">link</a>.</p>\n")
+        # Attribute-heavy markup, whose attribute words would dominate tags counted over raw HTML
+        parts.extend(
+            '<p class="highlight important callout" data-track="sidebar widget">Tips for readers. '
+            '<img src="photo-gallery.jpg" alt="gallery gallery gallery" class="aligncenter"></p>\n'
+            for _ in range(4)
+        )
+    return "".join(parts)
+
+
+# Previous implementation: three independent regex scans, patterns compiled per call
+
+def legacy_excerpt(content: str, max_length: int = 160) -> str:
+    clean_content = re.sub(r'<[^>]+>', '', content)
+    clean_content = re.sub(r'\s+', ' ', clean_content).strip()
+    if len(clean_content) <= max_length:
+        return clean_content
+    excerpt = clean_content[:max_length]
+    last_period = excerpt.rfind('.')
+    if last_period > max_length * 0.7:
+        excerpt = excerpt[:last_period + 1]
+    else:
+        last_space = excerpt.rfind(' ')
+        if last_space > 0:
+            excerpt = excerpt[:last_space] + '...'
+    return excerpt
+
+
+def legacy_tags(content: str, max_tags: int = 8):
+    # Counted words inside markup too, so class names and alt text became tags
+    words = re.findall(r'\b[a-zA-Z]{3,}\b', content.lower())
+    filtered_words = [word for word in words if word not in STOP_WORDS and len(word) > 3]
+    return [word.capitalize() for word, _ in Counter(filtered_words).most_common(max_tags)]
+
+
+def legacy_toc(content: str) -> str:
+    headings = re.findall(r'<h([1-6])[^>]*>(.*?)</h[1-6]>', content, re.IGNORECASE)
+    if len(headings) < 2:
+        return content
+    toc_html = '<div class="table-of-contents">\n<h3>Table of Contents</h3>\n<ul>\n'
+    for level, heading_text in headings:
+        anchor = re.sub(r'[^a-zA-Z0-9\s]', '', heading_text).replace(' ', '-').lower()
+        toc_html += f'<li><a href="#{anchor}">{heading_text}</a></li>\n'
+    toc_html += '</ul>\n</div>\n\n'
+
+    def add_anchor(match):
+        anchor = re.sub(r'[^a-zA-Z0-9\s]', '', match.group(3)).replace(' ', '-').lower()
+        return f'<h{match.group(1)}{match.group(2)} id="{anchor}">{match.group(3)}</h{match.group(1)}>'
+
+    content_with_anchors = re.sub(r'<h([1-6])([^>]*)>(.*?)</h[1-6]>', add_anchor, content, flags=re.IGNORECASE)
+    first_p = content_with_anchors.find('<p>')
+    if first_p != -1:
+        first_p_end = content_with_anchors.find('</p>', first_p) + 4
+        return content_with_anchors[:first_p_end] + '\n\n' + toc_html + content_with_anchors[first_p_end:]
+    return toc_html + content_with_anchors
+
+
+def legacy_all(content: str):
+    return legacy_excerpt(content), legacy_tags(content), legacy_toc(content)
+
+
+def text_only(content: str) -> str:
+    """Text nodes of the document, one per line, as the single-pass analyzer sees them"""
+    return re.sub(r'<[^>]+>', '\n', content)
+
+
+def single_pass(content: str):
+    analysis = analyze(content)
+    return analysis.excerpt, analysis.suggest_tags(), analysis.with_table_of_contents()
+
+
+def timed(fn, arg, repeat: int) -> float:
+    """Best-of-N wall time in milliseconds"""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(arg)
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+async def max_loop_stall(document: str, offload: bool) -> float:
+    """Longest gap (ms) between 1 ms ticks of a probe task while the document is analyzed"""
+    content_preprocessor.PREPROCESS_OFFLOAD_CHARS = 0 if offload else len(document) + 1
+    worst = 0.0
+    done = False
+
+    async def probe():
+        nonlocal worst
+        last = time.perf_counter()
+        while not done:
+            await asyncio.sleep(0.001)
+            now = time.perf_counter()
+            worst = max(worst, now - last)
+            last = now
+
+    probe_task = asyncio.create_task(probe())
+    await asyncio.sleep(0.01)
+    await analyze_async(document)
+    done = True
+    await probe_task
+    return worst * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--size-kb", type=int, default=1024)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    document = build_document(args.size_kb)
+    excerpt, tags, toc = single_pass(document)
+    assert (excerpt, toc) == (legacy_excerpt(document), legacy_toc(document))
+    # Intentional difference: tags now come from text only, not from tag names and attributes
+    assert tags == legacy_tags(text_only(document))
+    assert tags != legacy_tags(document)
+
+    print(f"--- {len(document) / 1024:.0f} KB document ---")
+    for label, fn in (
+        ("three regex passes (previous)", legacy_all),
+        ("single-pass analyzer", single_pass),
+    ):
+        print(f"{label:<36} {timed(fn, document, args.repeat):9.2f} ms")
+
+    # Warm the worker pool so process start-up is not counted as a stall
+    asyncio.run(max_loop_stall(document[:1024], offload=True))
+    for label, offload in (("event loop stall, inline", False), ("event loop stall, process pool", True)):
+        print(f"{label:<36} {asyncio.run(max_loop_stall(document, offload)):9.2f} ms")
+    content_preprocessor.shutdown_pool()
+
+
+if __name__ == "__main__":
+    main()
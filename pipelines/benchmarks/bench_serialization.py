@@ -0,0 +1,102 @@
+"""
+Serialization Benchmark
+Compares the workflow listing encoders for 1k- and 10k-item responses
+
+Usage:
+    python pipelines/benchmarks/bench_serialization.py [--repeat N]
+"""
+
+import argparse
+import json
+import sys
+import time
+import uuid
+from datetime import datetime
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import orjson
+from fastapi.encoders import jsonable_encoder
+
+from content_automation import ContentWorkflow, ContentType, WorkflowStatus, WorkflowResponse
+
+
+def build_workflows(count: int):
+    """Build synthetic completed workflows"""
+    now = datetime.utcnow()
+    return [
+        ContentWorkflow(
+            id=str(uuid.uuid4()),
+            user_id="bench-user",
+            connection_id="wp_bench",
+            title=f"Benchmark post {i}",
+            content="",
+            content_type=ContentType.BLOG_POST,
+            status=WorkflowStatus.COMPLETED,
+            wordpress_post_id=i,
+            created_at=now,
+            updated_at=now,
+            completed_at=now
+        )
+        for i in range(count)
+    ]
+
+
+def encode_pydantic_default(workflows) -> bytes:
+    """Previous path: WorkflowResponse per item, then jsonable_encoder + json"""
+    models = [WorkflowResponse(**w.to_response_dict()) for w in workflows]
+    return json.dumps(jsonable_encoder(models)).encode()
+
+
+def encode_fast_path(workflows) -> bytes:
+    """Current path: plain dicts straight into orjson"""
+    return orjson.dumps([w.to_response_dict() for w in workflows])
+
+
+def encode_raw_passthrough(body: bytes) -> bytes:
+    """Upstream WordPress bytes relayed untouched"""
+    return body
+
+
+def encode_parse_and_reencode(body: bytes) -> bytes:
+    """Previous WordPress path: response.json() then re-serialize"""
+    return json.dumps(jsonable_encoder(json.loads(body))).encode()
+
+
+def timed(fn, arg, repeat: int) -> float:
+    """Best-of-N wall time in milliseconds"""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(arg)
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    for size in (1_000, 10_000):
+        workflows = build_workflows(size)
+        assert orjson.loads(encode_fast_path(workflows)) == json.loads(encode_pydantic_default(workflows))
+
+        wp_body = orjson.dumps([
+            {"id": i, "title": {"rendered": f"Post {i}"}, "content": {"rendered": "<p>Body</p>" * 20}, "tags": [1, 2, 3]}
+            for i in range(size)
+        ])
+
+        print(f"--- {size} items ---")
+        for label, fn, arg in (
+            ("workflows: pydantic + jsonable_encoder", encode_pydantic_default, workflows),
+            ("workflows: orjson fast path", encode_fast_path, workflows),
+            ("wp posts: parse + re-encode", encode_parse_and_reencode, wp_body),
+            ("wp posts: raw pass-through", encode_raw_passthrough, wp_body),
+        ):
+            print(f"{label:<42} {timed(fn, arg, args.repeat):9.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
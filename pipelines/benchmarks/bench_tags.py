@@ -0,0 +1,71 @@
+"""
+Tag Suggestion Benchmark
+Per-post TF-IDF suggestion latency against a site index of 100k documents
+
+Usage:
+    python pipelines/benchmarks/bench_tags.py [--documents N] [--repeat N]
+"""
+
+import argparse
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from content_preprocessor import analyze
+from tag_engine import TagEngine
+
+SITE = "wp_bench"
+
+
+def build_vocabulary(size: int, rng: random.Random):
+    """Pronounceable synthetic words, so the stop list and length filter behave as on real text"""
+    consonants, vowels = "bcdfghjklmnprstvwz", "aeiou"
+    words = set()
+    while len(words) < size:
+        words.add("".join(rng.choice(consonants) + rng.choice(vowels) for _ in range(rng.randint(2, 4))))
+    return sorted(words)
+
+
+def build_post(vocabulary, rng: random.Random, words: int) -> str:
+    """Zipf-ish word draw wrapped in paragraphs"""
+    weights = [1.0 / (rank + 1) for rank in range(len(vocabulary))]
+    body = rng.choices(vocabulary, weights=weights, k=words)
+    paragraphs = [" ".join(body[i:i + 80]) for i in range(0, len(body), 80)]
+    return "".join(f"<p>{paragraph}.</p>\n" for paragraph in paragraphs)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--documents", type=int, default=100_000)
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    rng = random.Random(7)
+    vocabulary = build_vocabulary(20_000, rng)
+    # A pool of distinct analyses reused to populate the index quickly
+    samples = [analyze(build_post(vocabulary, rng, 300)) for _ in range(500)]
+
+    engine = TagEngine()
+    start = time.perf_counter()
+    for i in range(args.documents):
+        engine.record(SITE, samples[i % len(samples)])
+    build_seconds = time.perf_counter() - start
+    index = engine.sites[SITE]
+    print(f"indexed {index.documents} documents, {len(index.vocabulary)} terms in {build_seconds:.1f} s "
+          f"({build_seconds / args.documents * 1e6:.1f} us per publish)")
+
+    for words in (300, 1_000, 3_000):
+        analysis = analyze(build_post(vocabulary, rng, words))
+        best = float("inf")
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            tags = engine.suggest(SITE, analysis)
+            best = min(best, time.perf_counter() - start)
+        print(f"suggest, {words:>5}-word post: {best * 1000:7.3f} ms  {tags[:4]}")
+
+
+if __name__ == "__main__":
+    main()
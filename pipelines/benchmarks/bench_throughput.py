@@ -0,0 +1,384 @@
+"""
+End-to-End Throughput Benchmark
+Sustained workflows per second through /api/content/workflows against a stubbed Authentik and a fake WordPress
+
+Runs the pipeline app in-process over ASGI with its real executor, store and
+WordPress client. Authentik and WordPress are served by a separate process on
+a local port, so their latency and failure rate are tunable and their work
+does not share this event loop. Results are printed as JSON for comparison
+across commits.
+
+Usage:
+    python pipelines/benchmarks/bench_throughput.py [--workflows N] [--concurrency N] [--rate R]
+        [--wp-latency-ms MS] [--wp-failure-rate F] [--output results.json] [--baseline previous.json]
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import math
+import multiprocessing
+import os
+import platform
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import httpx
+
+WORDS = (
+    "wordpress publishing workflow content automation excerpt heading anchor pipeline "
+    "connection schedule retry template category performance throughput benchmark "
+    "article tutorial draft review editor release feature update network cache"
+).split()
+CONTENT_TYPES = ("blog_post", "article", "tutorial", "faq", "documentation")
+
+
+def serve_upstream(port: int, latency_ms: float, failure_rate: float, seed: int) -> None:
+    """Fake Authentik userinfo and WordPress REST API, run in its own process"""
+    import uvicorn
+    from fastapi import FastAPI, Request
+    from fastapi.responses import JSONResponse
+
+    rng = random.Random(seed)
+    post_ids = iter(range(1, 1 << 62))
+    upstream = FastAPI()
+
+    @upstream.get("/application/o/userinfo/")
+    async def userinfo(request: Request):
+        token = request.headers.get("authorization", "").removeprefix("Bearer ")
+        return {"sub": token, "preferred_username": token}
+
+    @upstream.post("/wp-json/batch/v1")
+    async def batch(request: Request):
+        # One round trip for the whole batch, with the injected failure rate applied per item
+        await asyncio.sleep(latency_ms / 1000 * rng.uniform(0.5, 1.5))
+        responses = []
+        for _ in (await request.json())["requests"]:
+            if rng.random() < failure_rate:
+                responses.append({"status": 503, "body": {"code": "unavailable", "message": "Injected failure"}})
+            else:
+                post_id = next(post_ids)
+                responses.append({"status": 201, "body": {"id": post_id, "link": f"{request.base_url}?p={post_id}"}})
+        return JSONResponse({"responses": responses}, status_code=207)
+
+    @upstream.api_route("/{path:path}", methods=["GET", "POST", "PUT", "DELETE"])
+    async def wordpress(path: str, request: Request):
+        if path.rstrip("/") == "wp-json":
+            return {"name": "Benchmark Site", "url": str(request.base_url)}
+        # Uniform jitter of +/-50% around the mean latency
+        await asyncio.sleep(latency_ms / 1000 * rng.uniform(0.5, 1.5))
+        if rng.random() < failure_rate:
+            return JSONResponse({"code": "unavailable", "message": "Injected failure"}, status_code=503)
+        await request.body()
+        if request.method == "POST":
+            post_id = next(post_ids)
+            return JSONResponse({"id": post_id, "link": f"{request.base_url}?p={post_id}"}, status_code=201)
+        return {"id": 0}
+
+    uvicorn.run(upstream, host="127.0.0.1", port=port, log_level="warning", access_log=False)
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _rss_bytes() -> int:
+    with open("/proc/self/statm") as statm:
+        return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+
+
+def _commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+            cwd=Path(__file__).resolve().parent, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _percentiles(values: List[float]) -> Dict[str, Optional[float]]:
+    if not values:
+        return {"p50": None, "p90": None, "p99": None, "max": None}
+    ordered = sorted(values)
+
+    def at(fraction: float) -> float:
+        return round(ordered[min(len(ordered) - 1, math.ceil(fraction * len(ordered)) - 1)], 2)
+
+    return {"p50": at(0.5), "p90": at(0.9), "p99": at(0.99), "max": round(ordered[-1], 2)}
+
+
+def build_content(rng: random.Random, index: int, size: int, markdown: bool) -> str:
+    """A post body of about `size` characters, as HTML or as chat-style Markdown"""
+    parts = []
+    length = 0
+    section = 0
+    while length < size:
+        section += 1
+        heading = f"{rng.choice(WORDS).title()} {rng.choice(WORDS)} {section}"
+        words = " ".join(rng.choice(WORDS) for _ in range(60))
+        if markdown:
+            part = f"## {heading}\n\n{words} **{rng.choice(WORDS)}**.\n\n- {rng.choice(WORDS)}\n- `{rng.choice(WORDS)}`\n\n"
+        else:
+            part = f"<h2>{heading}</h2>\n<p>{words} <strong>{rng.choice(WORDS)}</strong>.</p>\n"
+        parts.append(part)
+        length += len(part)
+    # Unique per workflow, so neither idempotency nor the preprocess cache short-circuits it
+    parts.append(f"\n\n{index}-{rng.getrandbits(64):x}\n")
+    return "".join(parts)
+
+
+class LoopLagMonitor:
+    """Samples how late a short periodic sleep wakes up, and the peak RSS, while the load runs"""
+
+    def __init__(self, interval: float = 0.01):
+        self.interval = interval
+        self.lags_ms: List[float] = []
+        self.peak_rss = _rss_bytes()
+        self._task: Optional[asyncio.Task] = None
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            expected = loop.time() + self.interval
+            await asyncio.sleep(self.interval)
+            self.lags_ms.append(max(0.0, loop.time() - expected) * 1000)
+            if len(self.lags_ms) % 10 == 0:
+                self.peak_rss = max(self.peak_rss, _rss_bytes())
+
+    def start(self) -> None:
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+
+
+async def run(args, upstream_url: str, data_dir: str) -> Dict[str, Any]:
+    # Imported only now: the service reads its configuration at import time
+    from content_automation import content_automation
+    from wordpress_oauth import app, pipeline
+
+    logging.getLogger().setLevel(logging.WARNING)
+    # Keep the benchmark's connections out of the real connection database
+    pipeline.db_path = Path(data_dir) / "wordpress_connections.db"
+    pipeline._init_database()
+    rng = random.Random(args.seed)
+    service = content_automation
+
+    await app.router.startup()
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://pipeline", timeout=60.0) as client:
+        users = [f"bench-user-{u}" for u in range(args.users)]
+        connections = []
+        for s in range(args.sites):
+            user = users[s % len(users)]
+            response = await client.post(
+                "/api/wordpress/register-connection",
+                json={"site_url": f"{upstream_url}/site-{s}", "site_name": f"Site {s}", "application_password": "bench"},
+                headers={"Authorization": f"Bearer {user}"}
+            )
+            response.raise_for_status()
+            connections.append((user, response.json()["connection_id"]))
+
+        # Built up front so generating content does not count against the service
+        payloads = []
+        for index in range(args.workflows):
+            user, connection_id = connections[index % len(connections)]
+            size = int(math.exp(rng.uniform(math.log(args.min_kb * 1024), math.log(args.max_kb * 1024))))
+            markdown = rng.random() < args.markdown_fraction
+            payloads.append((user, {
+                "title": f"{rng.choice(WORDS).title()} benchmark post {index}",
+                "content": build_content(rng, index, size, markdown),
+                "content_format": "markdown" if markdown else "html",
+                "content_type": rng.choice(CONTENT_TYPES),
+                "connection_id": connection_id,
+                "tags": [rng.choice(WORDS)] if rng.random() < 0.5 else [],
+                "publish_immediately": rng.random() < 0.5
+            }))
+
+        submitted_at: Dict[str, float] = {}
+        pending = set()
+        rejected = 0
+        submit_errors = 0
+        counter = iter(range(args.workflows))
+        interval = 1 / args.rate if args.rate > 0 else 0.0
+
+        monitor = LoopLagMonitor()
+        rss_start = _rss_bytes()
+        monitor.start()
+        started = time.perf_counter()
+
+        async def submitter(slot: int) -> None:
+            nonlocal rejected, submit_errors
+            for index in counter:
+                if interval:
+                    # Open loop: each submission has a fixed slot in the schedule
+                    delay = started + index * interval - time.perf_counter()
+                    if delay > 0:
+                        await asyncio.sleep(delay)
+                user, payload = payloads[index]
+                while True:
+                    response = await client.post(
+                        "/api/content/workflows", json=payload, headers={"Authorization": f"Bearer {user}"}
+                    )
+                    if response.status_code != 503 or "Retry-After" not in response.headers:
+                        break
+                    # Backpressure from the full workflow queue: back off as told and resubmit
+                    rejected += 1
+                    await asyncio.sleep(float(response.headers["Retry-After"]) or 0.05)
+                if response.status_code >= 400:
+                    submit_errors += 1
+                    continue
+                workflow_id = response.json()["id"]
+                submitted_at[workflow_id] = time.perf_counter()
+                pending.add(workflow_id)
+
+        submitters = [asyncio.create_task(submitter(slot)) for slot in range(args.concurrency)]
+        submitters_done = asyncio.gather(*submitters)
+
+        deadline = started + args.timeout
+        last_finished = started
+        while (not submitters_done.done() or pending) and time.perf_counter() < deadline:
+            await asyncio.sleep(0.02)
+            finished = [wid for wid in pending if service.is_final(service.workflows[wid])]
+            if finished:
+                pending.difference_update(finished)
+                last_finished = time.perf_counter()
+        if not submitters_done.done():
+            submitters_done.cancel()
+        submit_seconds = max(submitted_at.values(), default=started) - started
+        elapsed = time.perf_counter() - started
+        await monitor.stop()
+
+        statuses: Dict[str, int] = {}
+        latencies_ms = []
+        retries = 0
+        for workflow_id in submitted_at:
+            workflow = service.workflows[workflow_id]
+            statuses[workflow.status.value] = statuses.get(workflow.status.value, 0) + 1
+            retries += workflow.retry_count
+            if workflow.status.value == "completed":
+                latencies_ms.append((workflow.completed_at - workflow.created_at).total_seconds() * 1000)
+        end_rss = _rss_bytes()
+    await app.router.shutdown()
+
+    completed = statuses.get("completed", 0)
+    active_seconds = max(last_finished - started, 1e-9)
+    return {
+        "throughput": {
+            "submitted_per_second": round(len(submitted_at) / max(submit_seconds, 1e-9), 1),
+            "completed_per_second": round(completed / active_seconds, 1),
+            "elapsed_seconds": round(elapsed, 3),
+            "timed_out": bool(pending)
+        },
+        "workflows": {
+            "submitted": len(submitted_at),
+            "rejected_queue_full": rejected,
+            "submit_errors": submit_errors,
+            "retries": retries,
+            "statuses": statuses
+        },
+        "latency_ms": _percentiles(latencies_ms),
+        "loop_lag_ms": _percentiles(monitor.lags_ms),
+        "memory": {
+            "rss_start_mib": round(rss_start / 2**20, 1),
+            "rss_peak_mib": round(monitor.peak_rss / 2**20, 1),
+            "rss_end_mib": round(end_rss / 2**20, 1),
+            "growth_bytes_per_workflow": round((end_rss - rss_start) / max(1, len(submitted_at)))
+        }
+    }
+
+
+def compare(result: Dict[str, Any], baseline: Dict[str, Any]) -> Dict[str, Any]:
+    """Relative change of every numeric result against a previous run's output"""
+    deltas = {}
+    for section, values in result["results"].items():
+        for key, value in values.items():
+            before = baseline.get("results", {}).get(section, {}).get(key)
+            if isinstance(value, (int, float)) and not isinstance(value, bool) and isinstance(before, (int, float)) and before:
+                deltas[f"{section}.{key}"] = f"{(value - before) / before:+.1%}"
+    return {"baseline_commit": baseline.get("commit"), "changes": deltas}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--workflows", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=32, help="Concurrent submitting clients")
+    parser.add_argument("--rate", type=float, default=0, help="Submissions per second; 0 submits as fast as accepted")
+    parser.add_argument("--users", type=int, default=4)
+    parser.add_argument("--sites", type=int, default=8, help="WordPress connections, spread over the users")
+    parser.add_argument("--min-kb", type=float, default=1)
+    parser.add_argument("--max-kb", type=float, default=256)
+    parser.add_argument("--markdown-fraction", type=float, default=0.3)
+    parser.add_argument("--wp-latency-ms", type=float, default=50, help="Mean fake WordPress write latency")
+    parser.add_argument("--wp-failure-rate", type=float, default=0.0, help="Fraction of writes answered with 503")
+    parser.add_argument("--retry-base-delay", type=float, default=0.2, help="WORKFLOW_RETRY_BASE_DELAY for the run")
+    parser.add_argument("--timeout", type=float, default=600, help="Give up waiting for completion after this many seconds")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="Also write the JSON result to this file")
+    parser.add_argument("--baseline", help="Earlier JSON result to report relative changes against")
+    args = parser.parse_args()
+
+    port = _free_port()
+    upstream_url = f"http://127.0.0.1:{port}"
+    upstream = multiprocessing.get_context("spawn").Process(
+        target=serve_upstream, args=(port, args.wp_latency_ms, args.wp_failure_rate, args.seed), daemon=True
+    )
+    upstream.start()
+
+    with tempfile.TemporaryDirectory(prefix="bench-throughput-") as data_dir:
+        from cryptography.fernet import Fernet
+        os.environ.update({
+            "AUTHENTIK_URL": upstream_url,
+            "WORDPRESS_ENCRYPTION_KEY": Fernet.generate_key().decode(),
+            "CONTENT_WORKFLOW_DB": os.path.join(data_dir, "content_workflows.db"),
+            "CONTENT_WORKFLOW_ARCHIVE_DIR": os.path.join(data_dir, "workflow_archive"),
+            "TAG_INDEX_DIR": os.path.join(data_dir, "tag_index"),
+            "WORKFLOW_RETRY_BASE_DELAY": str(args.retry_base_delay),
+            "WORKFLOW_RETRY_MAX_DELAY": str(args.retry_base_delay * 10),
+        })
+        try:
+            for _ in range(100):
+                try:
+                    httpx.get(f"{upstream_url}/wp-json/", timeout=1.0)
+                    break
+                except httpx.TransportError:
+                    time.sleep(0.1)
+            results = asyncio.run(run(args, upstream_url, data_dir))
+        finally:
+            upstream.terminate()
+            upstream.join()
+
+    output = {
+        "benchmark": "throughput",
+        "commit": _commit(),
+        "python": platform.python_version(),
+        "params": {key: value for key, value in vars(args).items() if key not in ("output", "baseline")},
+        "results": results
+    }
+    if args.baseline:
+        with open(args.baseline) as f:
+            output["comparison"] = compare(output, json.load(f))
+    text = json.dumps(output, indent=2)
+    print(text)
+    if args.output:
+        Path(args.output).write_text(text + "\n")
+
+
+if __name__ == "__main__":
+    main()
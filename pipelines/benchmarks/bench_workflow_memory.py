@@ -0,0 +1,148 @@
+"""
+Workflow Memory Benchmark
+Per-workflow bytes of the compact ContentWorkflow against the previous plain dataclass
+
+Usage:
+    python pipelines/benchmarks/bench_workflow_memory.py [--workflows N] [--pending-fraction F]
+"""
+
+import argparse
+import gc
+import multiprocessing
+import os
+import random
+import sys
+import time
+import uuid
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import List, Optional
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from content_automation import ContentType, ContentWorkflow, WorkflowStatus
+
+WORDS = (
+    "wordpress publishing workflow content automation excerpt heading anchor pipeline "
+    "connection schedule retry template category performance memory compact benchmark "
+    "article tutorial draft review editor release feature update network cache"
+).split()
+
+
+# Previous implementation: a plain dataclass with datetimes and per-instance lists
+
+@dataclass
+class LegacyContentWorkflow:
+    id: str
+    user_id: str
+    connection_id: str
+    title: str
+    content: str
+    content_type: ContentType
+    status: WorkflowStatus
+    wordpress_post_id: Optional[int] = None
+    tags: List[str] = None
+    categories: List[str] = None
+    featured_image_url: Optional[str] = None
+    publish_immediately: bool = False
+    scheduled_publish_time: Optional[datetime] = None
+    seo_title: Optional[str] = None
+    seo_description: Optional[str] = None
+    created_at: datetime = None
+    updated_at: datetime = None
+    completed_at: Optional[datetime] = None
+    error_message: Optional[str] = None
+    retry_count: int = 0
+    max_retries: int = 3
+    next_attempt_at: Optional[datetime] = None
+    batch_id: Optional[str] = None
+    idempotency_key: Optional[str] = None
+    update_post_id: Optional[int] = None
+
+    def __post_init__(self):
+        if self.created_at is None:
+            self.created_at = datetime.utcnow()
+        if self.updated_at is None:
+            self.updated_at = datetime.utcnow()
+        if self.tags is None:
+            self.tags = []
+        if self.categories is None:
+            self.categories = []
+
+
+def workflow_values(i: int, rng: random.Random, pending_fraction: float, body: str):
+    """Field values as they look after a reload from the store: fresh strings, mostly finished workflows"""
+    created = datetime(2026, 1, 1) + timedelta(seconds=i * 7)
+    pending = rng.random() < pending_fraction
+    tagged = rng.random() < 0.5
+    return dict(
+        id=str(uuid.UUID(int=rng.getrandbits(128), version=4)),
+        # Formatted per workflow, so each holds its own copy as after JSON decoding
+        user_id=f"user-{i % 50:04d}",
+        connection_id=f"wp_user-{i % 50:04d}_{i % 3}",
+        title=f"{WORDS[i % len(WORDS)].title()} notes, part {i}",
+        content=f"{body}<!-- {i} -->" if pending else "",
+        content_type=ContentType.BLOG_POST,
+        status=WorkflowStatus.PENDING if pending else WorkflowStatus.COMPLETED,
+        wordpress_post_id=None if pending else 1000 + i,
+        tags=[WORDS[(i + k) % len(WORDS)] for k in range(3)] if tagged else [],
+        categories=[],
+        created_at=created,
+        updated_at=created + timedelta(seconds=3),
+        completed_at=None if pending else created + timedelta(seconds=3),
+        idempotency_key=f"{rng.getrandbits(256):064x}",
+    )
+
+
+def _rss_bytes() -> int:
+    with open("/proc/self/statm") as statm:
+        return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+
+
+def measure(variant: str, count: int, pending_fraction: float, body: str):
+    """Resident bytes retained per workflow and construction time per workflow
+
+    Runs in a fresh process per variant, so memory freed by the previous
+    variant cannot be reused and hide the growth.
+    """
+    cls = LegacyContentWorkflow if variant == "legacy" else ContentWorkflow
+    rng = random.Random(11)
+    gc.collect()
+    baseline = _rss_bytes()
+    workflows = []
+    seconds = 0.0
+    for chunk_start in range(0, count, 10_000):
+        values = [workflow_values(i, rng, pending_fraction, body) for i in range(chunk_start, min(count, chunk_start + 10_000))]
+        start = time.perf_counter()
+        workflows.extend(cls(**v) for v in values)
+        seconds += time.perf_counter() - start
+    del values
+    gc.collect()
+    return (_rss_bytes() - baseline) / count, seconds / count
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--workflows", type=int, default=1_000_000)
+    parser.add_argument("--pending-fraction", type=float, default=0.05)
+    parser.add_argument("--body-kb", type=int, default=8)
+    args = parser.parse_args()
+
+    rng = random.Random(3)
+    words = []
+    while sum(len(w) + 1 for w in words) < args.body_kb * 1024:
+        words.append(rng.choice(WORDS))
+    body_template = "<p>" + " ".join(words) + "</p>"
+
+    print(f"--- {args.workflows:,} workflows, {args.pending_fraction:.0%} pending with {args.body_kb} KB bodies ---")
+    context = multiprocessing.get_context("spawn")
+    for label, variant in (("dataclass (previous)", "legacy"), ("compact slots", "compact")):
+        with context.Pool(1) as pool:
+            per_workflow, seconds = pool.apply(measure, (variant, args.workflows, args.pending_fraction, body_template))
+        print(f"{label:<24} {per_workflow:9.0f} bytes/workflow  {per_workflow * args.workflows / 2**20:8.0f} MiB total"
+              f"  {seconds * 1e6:6.2f} us to build")
+
+
+if __name__ == "__main__":
+    main()
@@ -4,19 +4,52 @@ Handles automated workflows for OpenWebUI → WordPress content publishing
 """
 
 import asyncio
+import hashlib
 import logging
 import json
+import os
+import random
+import sys
+import time
 import uuid
-from typing import Dict, Any, List, Optional
-from datetime import datetime, timedelta
+import zlib
+from typing import Dict, Any, List, Optional, Tuple
+from datetime import datetime, timedelta, timezone
 from enum import Enum
-from dataclasses import dataclass, asdict
+from dataclasses import dataclass
 from pathlib import Path
 
 import httpx
 from fastapi import FastAPI, HTTPException, BackgroundTasks
 from pydantic import BaseModel, Field
 
+from content_preprocessor import ContentAnalysis, PreprocessCache, analyze_async, shutdown_pool
+from markdown_renderer import render_markdown_async
+from metrics import workflow_dead_letters, workflow_processing_duration, workflow_queue_rejections, workflow_retries
+from publish_window import PublishPacer, PublishWindow, PublishWindows, WORKFLOW_PUBLISH_WINDOWS
+from retry_policy import PublishError, RetryPolicies, WORKFLOW_RETRY_POLICIES, is_retryable
+from workflow_archive import WorkflowArchive
+from workflow_executor import WorkflowExecutor, WorkflowQueueFull, PRIORITY_IMMEDIATE, PRIORITY_DRAFT
+from workflow_index import WorkflowIndex, decode_cursor, encode_cursor
+from workflow_lease import LeaseLost, WorkflowLeaseCoordinator, WORKFLOW_SHARED_QUEUE
+from workflow_scheduler import WorkflowScheduler
+from workflow_events import WorkflowEventBus
+from workflow_store import WorkflowStore
+from tag_engine import TagEngine
+
+# Finished workflows older than this (by last update) are archived out of memory
+WORKFLOW_RETENTION_DAYS = float(os.getenv("WORKFLOW_RETENTION_DAYS", "30"))
+# At most this many finished workflows per user are kept in memory
+WORKFLOW_RETENTION_PER_USER = int(os.getenv("WORKFLOW_RETENTION_PER_USER", "500"))
+# How often the retention sweep runs, in seconds
+WORKFLOW_RETENTION_INTERVAL = float(os.getenv("WORKFLOW_RETENTION_INTERVAL", "300"))
+# Largest number of workflows accepted by one batch submission
+WORKFLOW_BATCH_MAX = int(os.getenv("WORKFLOW_BATCH_MAX", "500"))
+# Most WordPress connections one fan-out workflow may publish to
+WORKFLOW_FANOUT_MAX = int(os.getenv("WORKFLOW_FANOUT_MAX", "20"))
+# Workflow bodies at least this long are held zlib-compressed in memory
+WORKFLOW_COMPRESS_MIN_CHARS = int(os.getenv("WORKFLOW_COMPRESS_MIN_CHARS", "1024"))
+
 # Workflow status enumeration
 class WorkflowStatus(str, Enum):
     PENDING = "pending"
@@ -24,6 +57,11 @@ class WorkflowStatus(str, Enum):
     COMPLETED = "completed"
     FAILED = "failed"
     CANCELLED = "cancelled"
+    # Out of retries or failed permanently; kept in memory until replayed
+    DEAD_LETTER = "dead_letter"
+
+# Statuses a workflow never leaves on its own; only these are subject to retention
+FINISHED_STATUSES = (WorkflowStatus.COMPLETED, WorkflowStatus.FAILED, WorkflowStatus.CANCELLED)
 
 class ContentType(str, Enum):
     BLOG_POST = "blog_post"
@@ -32,48 +70,283 @@ class ContentType(str, Enum):
     FAQ = "faq"
     DOCUMENTATION = "documentation"
 
-@dataclass
+class ContentFormat(str, Enum):
+    HTML = "html"
+    # Rendered to HTML before preprocessing, e.g. chat transcripts from OpenWebUI
+    MARKDOWN = "markdown"
+
+_EPOCH = datetime(1970, 1, 1)
+_MICROSECOND = timedelta(microseconds=1)
+
+
+class _Timestamp:
+    """Datetime attribute stored in a slot as integer microseconds since the epoch (naive UTC)"""
+
+    def __set_name__(self, owner, name: str):
+        self.slot = getattr(owner, f"_{name}")
+
+    def __get__(self, workflow, owner=None):
+        if workflow is None:
+            return self
+        value = self.slot.__get__(workflow, owner)
+        return None if value is None else _EPOCH + timedelta(microseconds=value)
+
+    def __set__(self, workflow, value: Optional[datetime]) -> None:
+        self.slot.__set__(workflow, None if value is None else (value - _EPOCH) // _MICROSECOND)
+
+
+class _Labels:
+    """List attribute stored as a tuple; every empty one is the shared empty tuple"""
+
+    def __set_name__(self, owner, name: str):
+        self.slot = getattr(owner, f"_{name}")
+
+    def __get__(self, workflow, owner=None):
+        if workflow is None:
+            return self
+        return self.slot.__get__(workflow, owner)
+
+    def __set__(self, workflow, value) -> None:
+        self.slot.__set__(workflow, tuple(value) if value else ())
+
+
 class ContentWorkflow:
-    """Content publishing workflow definition"""
+    """Content publishing workflow definition
+
+    Every workflow stays in memory until retention archives it, so instances
+    are kept small: __slots__ rather than a per-instance __dict__, timestamps
+    as integer epoch microseconds (read back as naive UTC datetimes), tags and
+    categories as tuples, interned user, connection and batch IDs, shared enum
+    members, and bodies of WORKFLOW_COMPRESS_MIN_CHARS or more held
+    zlib-compressed until they are read.
+    """
+
+    FIELDS = (
+        "id", "user_id", "connection_id", "title", "content", "content_type", "status",
+        "wordpress_post_id", "tags", "categories", "featured_image_url", "publish_immediately",
+        "scheduled_publish_time", "seo_title", "seo_description", "created_at", "updated_at",
+        "completed_at", "error_message", "retry_count", "max_retries", "next_attempt_at",
+        "batch_id", "idempotency_key", "update_post_id", "content_format"
+    )
+    TIMESTAMPS = ("scheduled_publish_time", "created_at", "updated_at", "completed_at", "next_attempt_at")
+
+    __slots__ = (
+        "id", "user_id", "connection_id", "title", "_content", "content_type", "status",
+        "wordpress_post_id", "_tags", "_categories", "featured_image_url", "publish_immediately",
+        "_scheduled_publish_time", "seo_title", "seo_description", "_created_at", "_updated_at",
+        "_completed_at", "error_message", "retry_count", "max_retries", "_next_attempt_at",
+        "batch_id", "idempotency_key", "update_post_id", "content_format"
+    )
+
+    tags = _Labels()
+    categories = _Labels()
+    scheduled_publish_time = _Timestamp()
+    created_at = _Timestamp()
+    updated_at = _Timestamp()
+    completed_at = _Timestamp()
+    next_attempt_at = _Timestamp()
+
+    def __init__(
+        self,
+        id: str,
+        user_id: str,
+        connection_id: str,
+        title: str,
+        content: str,
+        content_type: ContentType,
+        status: WorkflowStatus,
+        wordpress_post_id: Optional[int] = None,
+        tags: Optional[List[str]] = None,
+        categories: Optional[List[str]] = None,
+        featured_image_url: Optional[str] = None,
+        publish_immediately: bool = False,
+        scheduled_publish_time: Optional[datetime] = None,
+        seo_title: Optional[str] = None,
+        seo_description: Optional[str] = None,
+        created_at: Optional[datetime] = None,
+        updated_at: Optional[datetime] = None,
+        completed_at: Optional[datetime] = None,
+        error_message: Optional[str] = None,
+        retry_count: int = 0,
+        max_retries: int = 3,
+        next_attempt_at: Optional[datetime] = None,
+        batch_id: Optional[str] = None,
+        idempotency_key: Optional[str] = None,
+        update_post_id: Optional[int] = None,
+        content_format: ContentFormat = ContentFormat.HTML
+    ):
+        now = datetime.utcnow()
+        self.id = id
+        # Many workflows share a user and connection; keep one copy of each ID
+        self.user_id = sys.intern(user_id)
+        self.connection_id = sys.intern(connection_id)
+        self.title = title
+        self.content = content
+        self.content_type = ContentType(content_type)
+        self.status = WorkflowStatus(status)
+        self.wordpress_post_id = wordpress_post_id
+        self.tags = tags
+        self.categories = categories
+        self.featured_image_url = featured_image_url
+        self.publish_immediately = publish_immediately
+        self.scheduled_publish_time = scheduled_publish_time
+        self.seo_title = seo_title
+        self.seo_description = seo_description
+        self.created_at = created_at or now
+        self.updated_at = updated_at or now
+        self.completed_at = completed_at
+        self.error_message = error_message
+        self.retry_count = retry_count
+        self.max_retries = max_retries
+        self.next_attempt_at = next_attempt_at
+        self.batch_id = sys.intern(batch_id) if batch_id else None
+        self.idempotency_key = idempotency_key
+        # Existing WordPress post this workflow updates instead of creating a new one
+        self.update_post_id = update_post_id
+        self.content_format = ContentFormat(content_format)
+
+    @property
+    def content(self) -> str:
+        content = self._content
+        if isinstance(content, bytes):
+            return zlib.decompress(content).decode("utf-8")
+        return content
+
+    @content.setter
+    def content(self, value: str) -> None:
+        if len(value) >= WORKFLOW_COMPRESS_MIN_CHARS:
+            self._content = zlib.compress(value.encode("utf-8"), 1)
+        else:
+            self._content = value
+
+    def __repr__(self) -> str:
+        return f"ContentWorkflow(id={self.id!r}, status={self.status.value!r}, title={self.title!r})"
+
+    def to_response_dict(self) -> Dict[str, Any]:
+        """Build the WorkflowResponse payload without Pydantic validation.
+
+        Workflows are created and mutated only by the service, so their fields
+        are already well-typed; orjson serializes the datetimes and enums natively.
+        """
+        return {
+            "id": self.id,
+            "status": self.status,
+            "title": self.title,
+            "content_type": self.content_type,
+            "wordpress_post_id": self.wordpress_post_id,
+            "created_at": self.created_at,
+            "updated_at": self.updated_at,
+            "completed_at": self.completed_at,
+            "error_message": self.error_message,
+            "retry_count": self.retry_count
+        }
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Serialize every field to JSON-compatible values for the workflow store"""
+        data = {name: getattr(self, name) for name in self.FIELDS}
+        for key, value in data.items():
+            if isinstance(value, datetime):
+                data[key] = value.isoformat()
+            elif isinstance(value, Enum):
+                data[key] = value.value
+            elif isinstance(value, tuple):
+                data[key] = list(value)
+        return data
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "ContentWorkflow":
+        """Rebuild a workflow from to_dict() output, ignoring unknown keys"""
+        values = {key: value for key, value in data.items() if key in cls.FIELDS}
+        for key in cls.TIMESTAMPS:
+            if values.get(key):
+                values[key] = datetime.fromisoformat(values[key])
+        return cls(**values)
+
+
+@dataclass
+class WorkflowBatch:
+    """A group of workflows submitted together, tracked for aggregate progress"""
     id: str
     user_id: str
-    connection_id: str
-    title: str
-    content: str
-    content_type: ContentType
-    status: WorkflowStatus
-    wordpress_post_id: Optional[int] = None
-    tags: List[str] = None
-    categories: List[str] = None
-    featured_image_url: Optional[str] = None
-    publish_immediately: bool = False
-    scheduled_publish_time: Optional[datetime] = None
-    seo_title: Optional[str] = None
-    seo_description: Optional[str] = None
-    created_at: datetime = None
-    updated_at: datetime = None
-    completed_at: Optional[datetime] = None
-    error_message: Optional[str] = None
-    retry_count: int = 0
-    max_retries: int = 3
-
-    def __post_init__(self):
-        if self.created_at is None:
-            self.created_at = datetime.utcnow()
-        if self.updated_at is None:
-            self.updated_at = datetime.utcnow()
-        if self.tags is None:
-            self.tags = []
-        if self.categories is None:
-            self.categories = []
+    workflow_ids: List[str]
+    created_at: datetime
+
+
+def idempotency_key(user_id: str, connection_id: str, title: str, content: str) -> str:
+    """Default idempotency key: a digest of who is publishing what, and where"""
+    digest = hashlib.sha256()
+    for part in (user_id, connection_id, title, content):
+        digest.update(part.encode("utf-8"))
+        # Separator so ("ab", "c") and ("a", "bc") differ
+        digest.update(b"\x1f")
+    return digest.hexdigest()
+
+
+# What an update sends to clear a field that is no longer in the payload
+_EMPTY_POST_FIELDS = {"title": "", "content": "", "excerpt": "", "slug": "", "categories": [], "tags": []}
+
+
+def post_fingerprint(post_data: Dict[str, Any]) -> Dict[str, str]:
+    """Per-field digests of a cleaned WordPress post payload, for diffing against later edits"""
+    return {
+        field: hashlib.sha256(json.dumps(value, sort_keys=True).encode("utf-8")).hexdigest()
+        for field, value in post_data.items()
+    }
+
+
+def _to_naive_utc(value: Optional[datetime]) -> Optional[datetime]:
+    """Normalize a datetime to the naive UTC values used throughout the service"""
+    if value is not None and value.tzinfo is not None:
+        return value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
 
 class ContentAutomationService:
     """Service for managing automated content publishing workflows"""
     
-    def __init__(self):
+    def __init__(
+        self,
+        store: Optional[WorkflowStore] = None,
+        archive: Optional[WorkflowArchive] = None,
+        tag_engine: Optional[TagEngine] = None,
+        retry_policies: Optional[RetryPolicies] = None,
+        shared_queue: Optional[bool] = None,
+        publish_windows: Optional[PublishWindows] = None
+    ):
         self.logger = logging.getLogger(__name__)
+        self.store = store
+        # Compressed on-disk home of workflows evicted by retention
+        self.archive = archive
+        # Per-site TF-IDF tag suggestions, learning from every publish
+        self.tag_engine = tag_engine or TagEngine()
+        # Content analysis and rendered bodies, shared by retries, resubmissions and other sites
+        self.preprocess_cache = PreprocessCache()
+        # Backoff and retry limits, optionally per connection
+        self.retry_policies = retry_policies or RetryPolicies.from_json(WORKFLOW_RETRY_POLICIES)
         self.workflows: Dict[str, ContentWorkflow] = {}
-        self.active_tasks: Dict[str, asyncio.Task] = {}
+        # Per-user and per-status listings ordered by creation time
+        self.index = WorkflowIndex()
+        # Bounded worker pool that runs the actual publish attempts
+        self.executor = WorkflowExecutor(self.process_workflow)
+        # Single timer loop for scheduled publish times and retry delays
+        self.scheduler = WorkflowScheduler(self._on_due)
+        # Per-site quiet hours and rate limits; ready workflows are held and released in coalesced groups
+        self.publish_windows = publish_windows or PublishWindows.from_json(WORKFLOW_PUBLISH_WINDOWS)
+        self.pacer = PublishPacer(self.publish_windows, self._dispatch)
+        # Shared-queue mode: workflows wait in the store and any worker process sharing it may claim them
+        if shared_queue is None:
+            shared_queue = WORKFLOW_SHARED_QUEUE
+        self.leases = WorkflowLeaseCoordinator(self.store, self.executor, self._adopt, self._lease_due) if shared_queue and store else None
+        # Batch submissions, the workflow IDs of batch jobs waiting in the executor, and the job each is waiting in
+        self.batches: Dict[str, WorkflowBatch] = {}
+        self._batch_jobs: Dict[str, List[str]] = {}
+        self._batch_job_of: Dict[str, str] = {}
+        # Live status feed for SSE subscribers
+        self.events = WorkflowEventBus()
+        # (user_id, idempotency key) -> workflow ID, for deduplicating submissions
+        self._idempotency: Dict[Tuple[str, str], str] = {}
+        # Periodic retention sweep, and a lock so restores never race an archive write
+        self._retention_task: Optional[asyncio.Task] = None
+        self._retention_lock = asyncio.Lock()
         
         # Content processing templates
         self.content_templates = {
@@ -112,7 +385,31 @@ class ContentAutomationService:
         }
     
     async def create_workflow(self, workflow_data: Dict[str, Any]) -> ContentWorkflow:
-        """Create a new content publishing workflow"""
+        """Create a new content publishing workflow, or return the existing one for a duplicate submission"""
+        workflow, _ = await self.create_or_get_workflow(workflow_data)
+        return workflow
+    
+    async def create_or_get_workflow(self, workflow_data: Dict[str, Any]) -> Tuple[ContentWorkflow, bool]:
+        """Create a workflow unless one with the same idempotency key exists
+
+        The key is workflow_data["idempotency_key"] when the client supplied
+        one, otherwise a digest of user, connection, title and content.
+        Updates get no default key: an edit may change any post field, and
+        the fingerprint diff already turns a true repeat into a no-op.
+        Returns the workflow and whether it was newly created. A cancelled
+        workflow does not block a resubmission.
+        """
+        key = workflow_data.get("idempotency_key")
+        if key is None and workflow_data.get("update_post_id") is None:
+            key = idempotency_key(
+                workflow_data["user_id"], workflow_data["connection_id"],
+                workflow_data["title"], workflow_data["content"]
+            )
+        existing = self.workflows.get(self._idempotency.get((workflow_data["user_id"], key))) if key else None
+        if existing and existing.status != WorkflowStatus.CANCELLED:
+            self.logger.info(f"Duplicate submission for workflow {existing.id}, returning existing workflow")
+            return existing, False
+        
         workflow_id = str(uuid.uuid4())
         
         workflow = ContentWorkflow(
@@ -127,15 +424,143 @@ class ContentAutomationService:
             categories=workflow_data.get("categories", []),
             featured_image_url=workflow_data.get("featured_image_url"),
             publish_immediately=workflow_data.get("publish_immediately", False),
-            scheduled_publish_time=workflow_data.get("scheduled_publish_time"),
+            scheduled_publish_time=_to_naive_utc(workflow_data.get("scheduled_publish_time")),
             seo_title=workflow_data.get("seo_title"),
-            seo_description=workflow_data.get("seo_description")
+            seo_description=workflow_data.get("seo_description"),
+            max_retries=self.retry_policies.for_connection(workflow_data["connection_id"]).max_retries,
+            batch_id=workflow_data.get("batch_id"),
+            idempotency_key=key,
+            update_post_id=workflow_data.get("update_post_id"),
+            content_format=ContentFormat(workflow_data.get("content_format", ContentFormat.HTML))
         )
         
         self.workflows[workflow_id] = workflow
+        self.index.add(workflow)
+        if key:
+            self._idempotency[(workflow.user_id, key)] = workflow_id
+        if self.store:
+            self.store.log_transition(workflow_id, None, workflow.status.value, "created")
+        self._publish_event(workflow, None, "created")
+        self._persist(workflow)
         self.logger.info(f"Created workflow {workflow_id} for user {workflow.user_id}")
         
-        return workflow
+        return workflow, True
+    
+    def _persist(self, workflow: ContentWorkflow) -> None:
+        """Queue the workflow's current state for the durable store"""
+        if self.store:
+            self.store.save(workflow)
+    
+    def _transition(self, workflow: ContentWorkflow, status: WorkflowStatus, detail: Optional[str] = None) -> None:
+        """Move a workflow to a new status, recording it in the transition log"""
+        previous = workflow.status
+        workflow.status = status
+        workflow.updated_at = datetime.utcnow()
+        self.index.move(workflow, previous.value)
+        if self.store:
+            self.store.log_transition(workflow.id, previous.value, status.value, detail)
+        self._publish_event(workflow, previous, detail)
+        self._persist(workflow)
+    
+    def _publish_event(self, workflow: ContentWorkflow, previous: Optional[WorkflowStatus], detail: Optional[str]) -> None:
+        """Announce a workflow's new status to event stream subscribers"""
+        self.events.publish(workflow.user_id, {
+            "type": "status",
+            "workflow_id": workflow.id,
+            "status": workflow.status,
+            "previous_status": previous,
+            "detail": detail,
+            "wordpress_post_id": workflow.wordpress_post_id,
+            "retry_count": workflow.retry_count,
+            "final": self.is_final(workflow)
+        })
+    
+    @staticmethod
+    def is_final(workflow: ContentWorkflow) -> bool:
+        """Whether the workflow will not change again without user action"""
+        if workflow.status == WorkflowStatus.FAILED:
+            return workflow.retry_count >= workflow.max_retries
+        return workflow.status in (WorkflowStatus.COMPLETED, WorkflowStatus.CANCELLED, WorkflowStatus.DEAD_LETTER)
+    
+    async def startup(self) -> None:
+        """Open the workflow store and recover interrupted and pending workflows"""
+        if not self.store or self.store.started:
+            return
+        await self.store.start()
+        await self.tag_engine.load()
+        self.executor.start()
+        self.scheduler.start()
+        self.pacer.start()
+        
+        for connection_id, settings in (await self.store.load_publish_windows()).items():
+            try:
+                self.publish_windows.set(connection_id, settings)
+            except (ValueError, TypeError) as e:
+                self.logger.error(f"Ignoring invalid publish window for connection {connection_id}: {str(e)}")
+        
+        for record in await self.store.load_all():
+            try:
+                workflow = ContentWorkflow.from_dict(record)
+            except Exception as e:
+                self.logger.error(f"Skipping unreadable stored workflow {record.get('id')}: {str(e)}")
+                continue
+            self.workflows[workflow.id] = workflow
+            self.index.add(workflow)
+            if workflow.idempotency_key:
+                self._idempotency[(workflow.user_id, workflow.idempotency_key)] = workflow.id
+            if workflow.batch_id:
+                self._track_batch(workflow)
+        
+        recovered = 0
+        for workflow in list(self.workflows.values()):
+            if workflow.status == WorkflowStatus.PROCESSING and self.leases:
+                # Possibly running in another worker; queue it in case it predates the shared queue,
+                # and whoever claims it once no live lease remains runs it again
+                self._offer(workflow, keep_existing=True)
+                recovered += 1
+                continue
+            if workflow.status == WorkflowStatus.PROCESSING:
+                # The attempt was cut short by a restart; run it again
+                self._transition(workflow, WorkflowStatus.PENDING, "recovered after restart")
+            elif workflow.status == WorkflowStatus.FAILED and workflow.retry_count >= workflow.max_retries:
+                # Exhausted before dead-lettering existed
+                self._transition(workflow, WorkflowStatus.DEAD_LETTER, "retries exhausted")
+            if workflow.status == WorkflowStatus.PENDING and self.leases:
+                self._offer(workflow, keep_existing=True)
+                recovered += 1
+            elif workflow.status == WorkflowStatus.PENDING:
+                await self.start_workflow(workflow.id, force=True)
+                recovered += 1
+        if self.leases:
+            self.leases.start()
+        
+        self.logger.info(f"Loaded {len(self.workflows)} workflows from store, re-armed {recovered}")
+        
+        if self.archive:
+            self._retention_task = asyncio.create_task(self._retention_loop(), name="workflow-retention")
+    
+    async def shutdown(self) -> None:
+        """Stop the workers and timers, then flush and close the workflow store"""
+        if self._retention_task:
+            self._retention_task.cancel()
+            try:
+                await self._retention_task
+            except asyncio.CancelledError:
+                pass
+            self._retention_task = None
+        await self.scheduler.stop()
+        # Held workflows stay pending in the store and are released again on next start
+        await self.pacer.stop()
+        if self.leases:
+            await self.leases.stop()
+        # Interrupted attempts stay "processing" in the store and are recovered on next start
+        await self.executor.stop()
+        if self.leases:
+            await self.leases.release_all()
+        if self.store:
+            await self.store.stop()
+        await self.tag_engine.save()
+        shutdown_pool()
     
     async def process_workflow(self, workflow_id: str) -> None:
         """Process a content publishing workflow"""
@@ -143,63 +568,211 @@ class ContentAutomationService:
             raise ValueError(f"Workflow {workflow_id} not found")
         
         workflow = self.workflows[workflow_id]
-        workflow.status = WorkflowStatus.PROCESSING
-        workflow.updated_at = datetime.utcnow()
+        if workflow.status != WorkflowStatus.PENDING:
+            # Cancelled (or otherwise moved on) while queued
+            return
+        self._begin_attempt(workflow)
+        started = time.perf_counter()
+        outcome = "failed"
         
         try:
             self.logger.info(f"Processing workflow {workflow_id}")
             
             # Step 1: Content preprocessing
-            processed_content = await self._preprocess_content(workflow)
-            
-            # Step 2: WordPress post creation/update
-            wordpress_result = await self._publish_to_wordpress(workflow, processed_content)
+            analysis, body = await self._analyze(workflow)
+            processed_content = await self._preprocess_content(workflow, analysis, body)
+            if self.leases:
+                # Last check before the side effect: another worker may have taken this attempt over
+                await self.leases.confirm(workflow_id)
             
-            # Step 3: Post-processing tasks
-            await self._post_process_workflow(workflow, wordpress_result)
+            # Step 2: WordPress post creation/update, unless an earlier attempt already got that far
+            wordpress_result = self._published_result(workflow) or await self._publish_to_wordpress(workflow, processed_content)
             
-            # Mark as completed
-            workflow.status = WorkflowStatus.COMPLETED
-            workflow.completed_at = datetime.utcnow()
-            workflow.wordpress_post_id = wordpress_result.get("id")
+            # Step 3: Post-processing and completion
+            await self._complete_workflow(workflow, wordpress_result, analysis)
+            outcome = "completed"
             
-            self.logger.info(f"Workflow {workflow_id} completed successfully. WordPress post ID: {workflow.wordpress_post_id}")
+        except LeaseLost as e:
+            outcome = "abandoned"
+            self.logger.warning(f"Abandoning workflow {workflow_id}: {str(e)}")
             
         except Exception as e:
-            workflow.status = WorkflowStatus.FAILED
-            workflow.error_message = str(e)
-            workflow.retry_count += 1
-            
-            self.logger.error(f"Workflow {workflow_id} failed: {str(e)}")
-            
-            # Schedule retry if under max retries
-            if workflow.retry_count < workflow.max_retries:
-                self.logger.info(f"Scheduling retry {workflow.retry_count}/{workflow.max_retries} for workflow {workflow_id}")
-                await self._schedule_retry(workflow)
+            await self._fail_workflow(workflow, e)
             
         finally:
             workflow.updated_at = datetime.utcnow()
-            # Remove from active tasks
-            if workflow_id in self.active_tasks:
-                del self.active_tasks[workflow_id]
+            self._persist(workflow)
+            workflow_processing_duration.labels(outcome).observe(time.perf_counter() - started)
+    
+    def _begin_attempt(self, workflow: ContentWorkflow) -> None:
+        """Mark a pending workflow as processing"""
+        workflow.next_attempt_at = None
+        self._transition(workflow, WorkflowStatus.PROCESSING)
+    
+    async def _complete_workflow(
+        self,
+        workflow: ContentWorkflow,
+        wordpress_result: Dict[str, Any],
+        analysis: ContentAnalysis
+    ) -> None:
+        """Record a successful publish"""
+        await self._post_process_workflow(workflow, wordpress_result)
+        # The site's tag statistics learn from what actually got published; an
+        # update is the same document, so it is not counted again
+        if workflow.update_post_id is None:
+            self.tag_engine.record(workflow.connection_id, analysis)
+        
+        # Mark as completed
+        workflow.completed_at = datetime.utcnow()
+        workflow.wordpress_post_id = wordpress_result.get("id")
+        # The body now lives in WordPress; keep only the metadata
+        workflow.content = ""
+        self._transition(workflow, WorkflowStatus.COMPLETED, f"wordpress post {workflow.wordpress_post_id}")
+        
+        self.logger.info(f"Workflow {workflow.id} completed successfully. WordPress post ID: {workflow.wordpress_post_id}")
+    
+    async def _fail_workflow(self, workflow: ContentWorkflow, error: Exception) -> None:
+        """Record a failed attempt, then retry it or move it to the dead-letter queue
+
+        Only transient errors (5xx, throttling, timeouts) are retried; a
+        rejected request such as a 4xx validation error is dead-lettered
+        straight away since repeating it cannot succeed.
+        """
+        workflow.error_message = str(error)
+        workflow.retry_count += 1
+        self.logger.error(f"Workflow {workflow.id} failed: {str(error)}")
+        
+        if not is_retryable(error):
+            self._dead_letter(workflow, f"not retryable: {error}")
+        elif workflow.retry_count >= workflow.max_retries:
+            self._dead_letter(workflow, f"retries exhausted: {error}")
+        else:
+            self._transition(workflow, WorkflowStatus.FAILED, str(error))
+            self.logger.info(f"Scheduling retry {workflow.retry_count}/{workflow.max_retries} for workflow {workflow.id}")
+            await self._schedule_retry(workflow, getattr(error, "retry_after", None))
+    
+    def _dead_letter(self, workflow: ContentWorkflow, reason: str) -> None:
+        """Park a workflow that will not be retried automatically"""
+        self._transition(workflow, WorkflowStatus.DEAD_LETTER, reason)
+        workflow_dead_letters.inc()
+        self.logger.warning(f"Workflow {workflow.id} moved to dead-letter queue: {reason}")
+    
+    async def _process_batch_job(self, job_id: str) -> None:
+        """Executor handler publishing one connection's share of a batch in WordPress batch writes"""
+        workflow_ids = self._batch_jobs.pop(job_id, [])
+        for workflow_id in workflow_ids:
+            self._batch_job_of.pop(workflow_id, None)
+        workflows = [
+            self.workflows[workflow_id]
+            for workflow_id in workflow_ids
+            if workflow_id in self.workflows and self.workflows[workflow_id].status == WorkflowStatus.PENDING
+        ]
+        if not workflows:
+            return
+        started = time.perf_counter()
+        self.logger.info(f"Processing batch job {job_id} with {len(workflows)} workflows")
+        
+        # Claim the whole group before the first await, so none can be rescheduled out from under the job
+        for workflow in workflows:
+            self._begin_attempt(workflow)
+        
+        prepared: List[Tuple[ContentWorkflow, ContentAnalysis, Dict[str, Any]]] = []
+        for workflow in workflows:
+            try:
+                analysis, body = await self._analyze(workflow)
+                prepared.append((workflow, analysis, await self._preprocess_content(workflow, analysis, body)))
+            except Exception as e:
+                await self._fail_workflow(workflow, e)
+        
+        # Workflows an earlier attempt already published skip the upstream write
+        outcomes: List[Tuple[ContentWorkflow, ContentAnalysis, Dict[str, Any]]] = []
+        to_publish = []
+        for workflow, analysis, content in prepared:
+            published = self._published_result(workflow)
+            if published:
+                outcomes.append((workflow, analysis, {'success': True, 'data': published}))
+            else:
+                to_publish.append((workflow, analysis, content))
+        
+        if to_publish:
+            from wordpress_client import wordpress_client as client
+            
+            first = to_publish[0][0]
+            results = await client.create_posts_batch(
+                first.user_id, first.connection_id, [content for _, _, content in to_publish]
+            )
+            for (workflow, analysis, content), result in zip(to_publish, results):
+                if result['success']:
+                    self._record_post(workflow, result['data'])
+                    self._save_fingerprint(workflow, result['data'].get('id'), post_fingerprint(client.clean_post_data(content)))
+                outcomes.append((workflow, analysis, result))
+            if self.store:
+                await self.store.flush()
+        
+        for workflow, analysis, result in outcomes:
+            if workflow.status != WorkflowStatus.PROCESSING:
+                # Cancelled while the batch was in flight
+                continue
+            try:
+                if not result['success']:
+                    raise PublishError.from_result(result)
+                await self._complete_workflow(workflow, result['data'], analysis)
+            except Exception as e:
+                await self._fail_workflow(workflow, e)
+        
+        elapsed = time.perf_counter() - started
+        for workflow in workflows:
+            workflow.updated_at = datetime.utcnow()
+            self._persist(workflow)
+            outcome = "completed" if workflow.status == WorkflowStatus.COMPLETED else "failed"
+            workflow_processing_duration.labels(outcome).observe(elapsed)
+    
+    async def _analyze(self, workflow: ContentWorkflow) -> Tuple[ContentAnalysis, str]:
+        """Analysis of the workflow's content and the body to publish, memoized by content hash
+
+        The key covers everything that shapes the output: the content, its
+        format, its template and the template options applied to the body.
+        Retries, resubmissions and the same post going to another site reuse
+        it. Markdown is rendered to HTML first; that rendering has its own
+        cache, shared across templates.
+        """
+        template = self.content_templates[workflow.content_type]
+        add_toc = template.get("add_table_of_contents", False)
+        key = (
+            hashlib.sha256(workflow.content.encode("utf-8")).digest(),
+            workflow.content_format.value,
+            workflow.content_type.value,
+            add_toc
+        )
+        content = workflow.content
+        markdown = workflow.content_format == ContentFormat.MARKDOWN
+        
+        async def compute() -> Tuple[Tuple[ContentAnalysis, str], int]:
+            html = await render_markdown_async(content) if markdown else content
+            analysis = await analyze_async(html)
+            body = analysis.with_table_of_contents() if add_toc else html
+            size = analysis.approximate_size() + (len(body) if body is not content else 0)
+            return (analysis, body), size
+        
+        return await self.preprocess_cache.get_or_compute(key, compute)
     
-    async def _preprocess_content(self, workflow: ContentWorkflow) -> Dict[str, Any]:
-        """Preprocess content based on content type"""
+    async def _preprocess_content(self, workflow: ContentWorkflow, analysis: ContentAnalysis, body: str) -> Dict[str, Any]:
+        """Build the WordPress post for a workflow from its (memoized) content analysis"""
         template = self.content_templates[workflow.content_type]
         
         processed = {
             "title": workflow.title,
-            "content": workflow.content,
+            "content": body,
             "status": "publish" if workflow.publish_immediately else "draft"
         }
         
         # Auto-generate excerpt if enabled
         if template.get("auto_excerpt", False):
-            processed["excerpt"] = self._generate_excerpt(workflow.content)
+            processed["excerpt"] = analysis.excerpt
         
         # Auto-generate tags if enabled and not provided
         if template.get("auto_tags", False) and not workflow.tags:
-            processed["tags"] = await self._auto_generate_tags(workflow.content)
+            processed["tags"] = self.tag_engine.suggest(workflow.connection_id, analysis)
         else:
             processed["tags"] = workflow.tags
         
@@ -207,10 +780,6 @@ class ContentAutomationService:
         categories = workflow.categories or template.get("default_categories", [])
         processed["categories"] = categories
         
-        # Add table of contents if specified
-        if template.get("add_table_of_contents", False):
-            processed["content"] = self._add_table_of_contents(workflow.content)
-        
         # SEO optimization
         if workflow.seo_title:
             processed["seo_title"] = workflow.seo_title
@@ -232,20 +801,92 @@ class ContentAutomationService:
         # Get WordPress credentials
         credentials = await oauth_pipeline.get_wordpress_credentials(workflow.user_id, workflow.connection_id)
         if not credentials:
-            raise Exception("WordPress credentials not found")
+            raise PublishError("WordPress credentials not found", retryable=False)
         
-        # Import WordPress client
-        from wordpress_client import WordPressAPIClient
-        client = WordPressAPIClient()
+        # Use the shared client so publishes reuse pooled connections
+        from wordpress_client import wordpress_client as client
+        
+        if workflow.update_post_id is not None:
+            return await self._update_wordpress_post(workflow, client, content)
         
         # Create WordPress post
         result = await client.create_post(workflow.user_id, workflow.connection_id, content)
         
         if not result['success']:
-            raise Exception(f"WordPress publishing failed: {result['message']}")
+            raise PublishError.from_result(result)
+        
+        # Make the post ID durable before anything else can fail, so a retry never posts twice
+        self._record_post(workflow, result['data'])
+        self._save_fingerprint(workflow, result['data'].get('id'), post_fingerprint(client.clean_post_data(content)))
+        if self.store:
+            await self.store.flush()
         
         return result['data']
     
+    async def _update_wordpress_post(self, workflow: ContentWorkflow, client, content: Dict[str, Any]) -> Dict[str, Any]:
+        """Send only the fields that changed since the post was last published, or nothing at all
+
+        Fields are compared by digest against the fingerprint saved on the
+        last publish. A post with no saved fingerprint gets the full payload.
+        """
+        post_id = workflow.update_post_id
+        fields = client.clean_post_data(content)
+        if not workflow.publish_immediately:
+            # Leave the live post's status alone rather than reverting it to draft
+            fields.pop("status", None)
+        fingerprint = post_fingerprint(fields)
+        previous = await self.store.get_post_fingerprint(workflow.connection_id, post_id) if self.store else None
+        
+        if previous is None:
+            changes = fields
+        else:
+            changes = {field: value for field, value in fields.items() if previous.get(field) != fingerprint[field]}
+            # Fields emptied since the last publish are cleared upstream
+            for field in previous.keys() - fields.keys():
+                if field in _EMPTY_POST_FIELDS:
+                    changes[field] = _EMPTY_POST_FIELDS[field]
+                elif field == "status":
+                    fingerprint[field] = previous[field]
+        
+        if not changes:
+            self.logger.info(f"Workflow {workflow.id} has no changes for post {post_id}, skipping upstream update")
+            result_data = {"id": post_id}
+        else:
+            self.logger.info(f"Updating post {post_id} for workflow {workflow.id}: {', '.join(sorted(changes))}")
+            result = await client.update_post(workflow.user_id, workflow.connection_id, post_id, changes)
+            if not result['success']:
+                raise PublishError.from_result(result)
+            result_data = result['data']
+        
+        self._record_post(workflow, result_data)
+        self._save_fingerprint(workflow, post_id, fingerprint)
+        if self.store:
+            await self.store.flush()
+        
+        return result_data
+    
+    def _record_post(self, workflow: ContentWorkflow, wordpress_result: Dict[str, Any]) -> None:
+        """Remember the post an upstream write created"""
+        workflow.wordpress_post_id = wordpress_result.get("id")
+        self._persist(workflow)
+    
+    def _save_fingerprint(self, workflow: ContentWorkflow, post_id: Optional[int], fingerprint: Dict[str, str]) -> None:
+        """Remember what was published to a post, so a later update can send only what changed"""
+        if self.store and post_id is not None:
+            self.store.save_post_fingerprint(workflow.connection_id, post_id, fingerprint)
+    
+    def _published_result(self, workflow: ContentWorkflow) -> Optional[Dict[str, Any]]:
+        """The post already created for this workflow or its idempotency key, if any"""
+        post_id = workflow.wordpress_post_id
+        if post_id is None and workflow.idempotency_key:
+            twin = self.workflows.get(self._idempotency.get((workflow.user_id, workflow.idempotency_key)))
+            if twin is not None:
+                post_id = twin.wordpress_post_id
+        if post_id is None:
+            return None
+        self.logger.info(f"Workflow {workflow.id} already published as post {post_id}, skipping upstream write")
+        return {"id": post_id}
+    
     async def _post_process_workflow(self, workflow: ContentWorkflow, wordpress_result: Dict[str, Any]) -> None:
         """Perform post-processing tasks after successful publication"""
         # Log successful publication
@@ -261,137 +902,377 @@ class ContentAutomationService:
         # For now, just log the completion
         self.logger.debug(f"Post-processing completed for workflow {workflow.id}")
     
-    async def _schedule_retry(self, workflow: ContentWorkflow) -> None:
+    async def _schedule_retry(self, workflow: ContentWorkflow, retry_after: Optional[float] = None) -> None:
         """Schedule a retry for a failed workflow"""
-        # Calculate retry delay (exponential backoff)
-        delay_seconds = min(300, 30 * (2 ** (workflow.retry_count - 1)))  # Max 5 minutes
-        
-        self.logger.info(f"Scheduling retry for workflow {workflow.id} in {delay_seconds} seconds")
+        # Jittered exponential backoff from the connection's policy, no sooner than the site asked
+        policy = self.retry_policies.for_connection(workflow.connection_id)
+        delay_seconds = policy.delay(workflow.retry_count, retry_after)
         
-        # Reset status to pending for retry
-        workflow.status = WorkflowStatus.PENDING
+        self.logger.info(f"Scheduling retry for workflow {workflow.id} in {delay_seconds:.1f} seconds")
         
-        # Schedule the retry
-        async def retry_task():
-            await asyncio.sleep(delay_seconds)
-            await self.process_workflow(workflow.id)
+        # Reset status to pending for retry; next_attempt_at lets a restart re-arm it
+        workflow.next_attempt_at = datetime.utcnow() + timedelta(seconds=delay_seconds)
+        self._transition(workflow, WorkflowStatus.PENDING, f"retry {workflow.retry_count} in {delay_seconds:.0f}s")
+        workflow_retries.inc()
         
-        task = asyncio.create_task(retry_task())
-        self.active_tasks[workflow.id] = task
+        # Schedule the retry; a leased attempt is requeued for it when its lease is released
+        if self.leases is None:
+            self.scheduler.schedule(workflow.id, workflow.next_attempt_at)
+        elif not self.leases.holds(workflow.id):
+            self._offer(workflow)
     
-    def _generate_excerpt(self, content: str, max_length: int = 160) -> str:
-        """Generate an excerpt from content"""
-        # Remove HTML tags and clean up
-        import re
-        clean_content = re.sub(r'<[^>]+>', '', content)
-        clean_content = re.sub(r'\s+', ' ', clean_content).strip()
-        
-        if len(clean_content) <= max_length:
-            return clean_content
-        
-        # Find the last complete sentence within the limit
-        excerpt = clean_content[:max_length]
-        last_period = excerpt.rfind('.')
-        if last_period > max_length * 0.7:  # If we find a period in the last 30%
-            excerpt = excerpt[:last_period + 1]
+    def _enqueue(self, workflow: ContentWorkflow, force: bool = False) -> None:
+        """Hand a ready workflow to the publish pacer, which feeds the executor within the site's publish window"""
+        if self.leases:
+            self._offer(workflow)
+            return
+        if not force and self.is_full():
+            workflow_queue_rejections.inc()
+            raise WorkflowQueueFull(f"Workflow queue is full ({self.executor.max_queue} queued)")
+        self.pacer.submit(workflow.connection_id, [workflow.id])
+    
+    def is_full(self) -> bool:
+        """Whether ready workflows waiting to run, including those held for their publish window, fill the queue"""
+        # A queued batch job counts once per workflow in it
+        backlog = self.executor.queued - len(self._batch_jobs) + len(self._batch_job_of) + self.pacer.held
+        return backlog >= self.executor.max_queue
+    
+    def _dispatch(self, connection_id: str, workflow_ids: List[str]) -> None:
+        """Pacer callback: queue a released group, sending its new posts as one WordPress batch write"""
+        workflows = [
+            self.workflows[workflow_id]
+            for workflow_id in workflow_ids
+            if workflow_id in self.workflows and self.workflows[workflow_id].status == WorkflowStatus.PENDING
+        ]
+        creates = [workflow for workflow in workflows if workflow.update_post_id is None]
+        for workflow in workflows:
+            # Updates are diffed and sent one post at a time
+            if workflow.update_post_id is not None or len(creates) == 1:
+                priority = PRIORITY_IMMEDIATE if workflow.publish_immediately else PRIORITY_DRAFT
+                self.executor.submit(workflow.id, connection_id, priority, force=True)
+        if len(creates) > 1:
+            job_id = f"batch:{uuid.uuid4()}:{connection_id}"
+            self._batch_jobs[job_id] = [workflow.id for workflow in creates]
+            for workflow in creates:
+                self._batch_job_of[workflow.id] = job_id
+            priority = PRIORITY_IMMEDIATE if any(w.publish_immediately for w in creates) else PRIORITY_DRAFT
+            self.executor.submit(job_id, connection_id, priority, force=True, handler=self._process_batch_job)
+    
+    def _unbatch(self, workflow_id: str) -> None:
+        """Take a workflow out of the batch job it is queued in, dropping the job once it is empty"""
+        job_id = self._batch_job_of.pop(workflow_id, None)
+        if job_id is None:
+            return
+        workflow_ids = self._batch_jobs[job_id]
+        workflow_ids.remove(workflow_id)
+        if not workflow_ids:
+            del self._batch_jobs[job_id]
+            self.executor.cancel(job_id)
+    
+    def _offer(self, workflow: ContentWorkflow, keep_existing: bool = False) -> None:
+        """Put a workflow on the shared queue, claimable once its publish or retry time has passed"""
+        self._persist(workflow)
+        priority = PRIORITY_IMMEDIATE if workflow.publish_immediately else PRIORITY_DRAFT
+        self.store.offer_lease(workflow.id, workflow.connection_id, priority, self._lease_due(workflow.id), keep_existing)
+        self.leases.wake()
+    
+    def _adopt(self, record: Dict[str, Any]) -> Optional[Tuple[str, int]]:
+        """Load a workflow claimed from the shared queue; returns where and how urgently to run it, or None to skip it"""
+        workflow = self._refresh(record)
+        if workflow.status == WorkflowStatus.PROCESSING:
+            # The previous holder's lease expired mid-attempt
+            self._transition(workflow, WorkflowStatus.PENDING, "reclaimed after lease expiry")
+        if workflow.status != WorkflowStatus.PENDING:
+            return None
+        if self.publish_windows.for_connection(workflow.connection_id).quiet_until(time.time()):
+            # Requeued for the end of the site's quiet hours when the lease is released
+            return None
+        priority = PRIORITY_IMMEDIATE if workflow.publish_immediately else PRIORITY_DRAFT
+        return workflow.connection_id, priority
+    
+    def _refresh(self, record: Dict[str, Any]) -> ContentWorkflow:
+        """Bring the in-memory copy of a workflow up to date with a snapshot written by another worker"""
+        latest = ContentWorkflow.from_dict(record)
+        workflow = self.workflows.get(latest.id)
+        if workflow is None:
+            workflow = self.workflows[latest.id] = latest
+            self.index.add(workflow)
+            if workflow.idempotency_key:
+                self._idempotency[(workflow.user_id, workflow.idempotency_key)] = workflow.id
+            if workflow.batch_id:
+                self._track_batch(workflow)
+            return workflow
+        previous = workflow.status
+        for name in ContentWorkflow.FIELDS:
+            setattr(workflow, name, getattr(latest, name))
+        if workflow.status != previous:
+            self.index.move(workflow, previous.value)
+        return workflow
+    
+    def _lease_due(self, workflow_id: str) -> Optional[float]:
+        """When a workflow should next be claimable from the shared queue (epoch seconds), or None once it is finished"""
+        workflow = self.workflows.get(workflow_id)
+        if workflow is None or workflow.status not in (WorkflowStatus.PENDING, WorkflowStatus.PROCESSING):
+            return None
+        due_at = workflow.next_attempt_at or workflow.scheduled_publish_time
+        if workflow.status == WorkflowStatus.PROCESSING or due_at is None:
+            due = time.time()
         else:
-            # Otherwise, cut at the last space
-            last_space = excerpt.rfind(' ')
-            if last_space > 0:
-                excerpt = excerpt[:last_space] + '...'
-        
-        return excerpt
-    
-    async def _auto_generate_tags(self, content: str, max_tags: int = 8) -> List[str]:
-        """Auto-generate tags from content"""
-        # This is a simple implementation. In production, you might want to use
-        # NLP libraries or AI services for better tag extraction
-        
-        import re
-        from collections import Counter
-        
-        # Extract words and filter common ones
-        words = re.findall(r'\b[a-zA-Z]{3,}\b', content.lower())
-        
-        # Common words to exclude
-        stop_words = {
-            'the', 'and', 'for', 'are', 'but', 'not', 'you', 'all', 'can', 'had', 
-            'her', 'was', 'one', 'our', 'out', 'day', 'get', 'has', 'him', 'his', 
-            'how', 'its', 'may', 'new', 'now', 'old', 'see', 'two', 'who', 'boy', 
-            'did', 'she', 'use', 'way', 'will', 'with', 'this', 'that', 'have',
-            'from', 'they', 'know', 'want', 'been', 'good', 'much', 'some', 'time',
-            'very', 'when', 'come', 'here', 'just', 'like', 'long', 'make', 'many',
-            'over', 'such', 'take', 'than', 'them', 'well', 'were'
-        }
-        
-        # Filter out stop words and count frequency
-        filtered_words = [word for word in words if word not in stop_words and len(word) > 3]
-        word_counts = Counter(filtered_words)
-        
-        # Get most common words as tags
-        tags = [word.capitalize() for word, _ in word_counts.most_common(max_tags)]
-        
-        return tags
+            due = (due_at - _EPOCH).total_seconds()
+        return self.publish_windows.for_connection(workflow.connection_id).quiet_until(due) or due
     
-    def _add_table_of_contents(self, content: str) -> str:
-        """Add a table of contents to content based on headings"""
-        import re
-        
-        # Find all headings (H1-H6)
-        headings = re.findall(r'<h([1-6])[^>]*>(.*?)</h[1-6]>', content, re.IGNORECASE)
-        
-        if len(headings) < 2:  # Only add TOC if there are at least 2 headings
-            return content
-        
-        # Generate table of contents
-        toc_html = '<div class="table-of-contents">\n<h3>Table of Contents</h3>\n<ul>\n'
+    def _on_due(self, workflow_id: str) -> None:
+        """Scheduler callback: feed a due workflow into the executor"""
+        workflow = self.workflows.get(workflow_id)
+        if workflow and workflow.status == WorkflowStatus.PENDING:
+            # Already accepted work, so it bypasses the queue limit
+            self._enqueue(workflow, force=True)
+    
+    async def create_batch(self, user_id: str, workflows_data: List[Dict[str, Any]]) -> Tuple[WorkflowBatch, List[str]]:
+        """Create and start a batch of workflows
+
+        Workflows due now are handed to the publish pacer per connection, so
+        each site receives its share through WordPress batch writes within its
+        publish window; scheduled ones are armed individually. The batch was
+        accepted as a unit, so its jobs bypass the queue limit.
         
-        for level, heading_text in headings:
-            # Create anchor from heading text
-            anchor = re.sub(r'[^a-zA-Z0-9\s]', '', heading_text).replace(' ', '-').lower()
-            toc_html += f'<li><a href="#{anchor}">{heading_text}</a></li>\n'
+        Returns the batch and the workflow ID for each submitted item, in
+        order; a duplicate item maps to the existing workflow.
+        """
+        batch_id = str(uuid.uuid4())
+        workflows = []
+        created = []
+        for workflow_data in workflows_data:
+            workflow, is_new = await self.create_or_get_workflow({**workflow_data, "user_id": user_id, "batch_id": batch_id})
+            workflows.append(workflow)
+            if is_new:
+                created.append(workflow)
+        workflow_ids = [workflow.id for workflow in workflows]
+        batch = WorkflowBatch(batch_id, user_id, list(dict.fromkeys(workflow_ids)), workflows[0].created_at)
+        self.batches[batch_id] = batch
         
-        toc_html += '</ul>\n</div>\n\n'
+        now = datetime.utcnow()
+        groups: Dict[str, List[str]] = {}
+        # Duplicates of earlier submissions are reported in the batch but not started again
+        for workflow in created:
+            if workflow.scheduled_publish_time and now < workflow.scheduled_publish_time:
+                await self.start_workflow(workflow.id, force=True)
+            elif self.leases:
+                # Shared-queue workers claim workflows individually
+                self._enqueue(workflow, force=True)
+            else:
+                groups.setdefault(workflow.connection_id, []).append(workflow.id)
         
-        # Add anchors to headings in content
-        def add_anchor(match):
-            level = match.group(1)
-            attrs = match.group(2) if match.group(2) else ''
-            heading_text = match.group(3)
-            anchor = re.sub(r'[^a-zA-Z0-9\s]', '', heading_text).replace(' ', '-').lower()
-            return f'<h{level}{attrs} id="{anchor}">{heading_text}</h{level}>'
+        for connection_id, workflow_ids in groups.items():
+            self.pacer.submit(connection_id, workflow_ids)
         
-        content_with_anchors = re.sub(
-            r'<h([1-6])([^>]*)>(.*?)</h[1-6]>', 
-            add_anchor, 
-            content, 
-            flags=re.IGNORECASE
-        )
+        self.logger.info(f"Created batch {batch_id} with {len(created)} new workflows for user {user_id}")
+        return batch, workflow_ids
+    
+    async def create_fanout(self, user_id: str, workflow_data: Dict[str, Any]) -> Tuple[WorkflowBatch, List[str]]:
+        """Publish one piece of content to several connections
+
+        Each connection gets its own workflow under a shared batch ID (the
+        fan-out ID), so every target runs concurrently and keeps its own
+        status, retries and dead-lettering; one site failing leaves the rest
+        published. The content is analyzed once and shared through the
+        preprocessing cache. A client idempotency key is scoped per target.
         
-        # Insert TOC after first paragraph or at the beginning
-        first_p = content_with_anchors.find('<p>')
-        if first_p != -1:
-            first_p_end = content_with_anchors.find('</p>', first_p) + 4
-            return content_with_anchors[:first_p_end] + '\n\n' + toc_html + content_with_anchors[first_p_end:]
-        else:
-            return toc_html + content_with_anchors
+        Returns the fan-out batch and the workflow ID for each distinct
+        connection, in order.
+        """
+        connection_ids = list(dict.fromkeys(workflow_data["connection_ids"]))
+        base = {key: value for key, value in workflow_data.items() if key != "connection_ids"}
+        targets = []
+        for connection_id in connection_ids:
+            target = {**base, "connection_id": connection_id}
+            if base.get("idempotency_key"):
+                target["idempotency_key"] = f"{base['idempotency_key']}:{connection_id}"
+            targets.append(target)
+        return await self.create_batch(user_id, targets)
+    
+    def _track_batch(self, workflow: ContentWorkflow) -> WorkflowBatch:
+        """Register a reloaded workflow with its batch, recreating the batch record on first sight"""
+        batch = self.batches.get(workflow.batch_id)
+        if batch is None:
+            batch = WorkflowBatch(workflow.batch_id, workflow.user_id, [], workflow.created_at)
+            self.batches[batch.id] = batch
+        batch.workflow_ids.append(workflow.id)
+        return batch
+    
+    def batch_progress(self, batch: WorkflowBatch) -> Dict[str, Any]:
+        """Aggregate status counts for a batch; archived workflows are counted as such"""
+        counts = {status.value: 0 for status in WorkflowStatus}
+        counts["archived"] = 0
+        for workflow_id in batch.workflow_ids:
+            workflow = self.workflows.get(workflow_id)
+            counts[workflow.status.value if workflow else "archived"] += 1
+        finished = sum(counts[status.value] for status in FINISHED_STATUSES) + counts["dead_letter"] + counts["archived"]
+        return {
+            "batch_id": batch.id,
+            "created_at": batch.created_at,
+            "total": len(batch.workflow_ids),
+            "counts": counts,
+            "done": finished == len(batch.workflow_ids)
+        }
+    
+    def fanout_progress(self, batch: WorkflowBatch) -> Dict[str, Any]:
+        """Batch progress plus each target's outcome, for fan-out workflows"""
+        targets = []
+        for workflow_id in batch.workflow_ids:
+            workflow = self.workflows.get(workflow_id)
+            if workflow is None:
+                targets.append({"workflow_id": workflow_id, "status": "archived"})
+                continue
+            targets.append({
+                "workflow_id": workflow_id,
+                "connection_id": workflow.connection_id,
+                "status": workflow.status,
+                "wordpress_post_id": workflow.wordpress_post_id,
+                "retry_count": workflow.retry_count,
+                "error_message": workflow.error_message
+            })
+        progress = self.batch_progress(batch)
+        return {"fanout_id": progress.pop("batch_id"), **progress, "targets": targets}
     
     async def get_workflow(self, workflow_id: str) -> Optional[ContentWorkflow]:
-        """Get workflow by ID"""
-        return self.workflows.get(workflow_id)
+        """Get workflow by ID, falling back to the archive for evicted workflows"""
+        workflow = self.workflows.get(workflow_id)
+        if workflow is not None and self.leases and not self.is_final(workflow) and not self.leases.holds(workflow_id):
+            # Another worker may be running it; read its latest state from the shared store
+            record = await self.store.load(workflow_id)
+            if record:
+                workflow = self._refresh(record)
+        if workflow is None and self.archive:
+            # Wait out a sweep that may be moving this workflow to the archive
+            async with self._retention_lock:
+                workflow = self.workflows.get(workflow_id)
+                if workflow is None:
+                    record = await self.archive.get(workflow_id)
+                    if record:
+                        workflow = ContentWorkflow.from_dict(record)
+        return workflow
     
-    async def list_workflows(self, user_id: str, status: Optional[WorkflowStatus] = None) -> List[ContentWorkflow]:
-        """List workflows for a user, optionally filtered by status"""
-        workflows = [w for w in self.workflows.values() if w.user_id == user_id]
-        
-        if status:
-            workflows = [w for w in workflows if w.status == status]
+    async def _restore(self, workflow_id: str) -> Optional[ContentWorkflow]:
+        """Bring an archived workflow back into memory so it can run again"""
+        async with self._retention_lock:
+            if workflow_id in self.workflows:
+                return self.workflows[workflow_id]
+            if not self.archive:
+                return None
+            record = await self.archive.get(workflow_id)
+            if not record:
+                return None
+            workflow = ContentWorkflow.from_dict(record)
+            self.workflows[workflow_id] = workflow
+            self.index.add(workflow)
+            if workflow.idempotency_key:
+                self._idempotency.setdefault((workflow.user_id, workflow.idempotency_key), workflow_id)
+            if self.store:
+                # Carry the archived transition log back into the store
+                for transition in record.get("transitions", []):
+                    self.store.log_transition(
+                        workflow_id, transition["from_status"], transition["to_status"], transition["detail"]
+                    )
+            self._persist(workflow)
+            await self.archive.remove(workflow_id)
+            self.logger.info(f"Restored workflow {workflow_id} from archive")
+            return workflow
+    
+    async def _retention_loop(self) -> None:
+        while True:
+            await asyncio.sleep(WORKFLOW_RETENTION_INTERVAL)
+            try:
+                await self.enforce_retention()
+            except Exception as e:
+                self.logger.error(f"Workflow retention sweep failed: {str(e)}")
+            # Checkpoint tag statistics on the same housekeeping cadence
+            await self.tag_engine.save()
+    
+    async def enforce_retention(self) -> int:
+        """Archive finished workflows past the age limit or beyond the per-user cap
+
+        Returns the number of workflows archived.
+        """
+        if not self.archive:
+            return 0
         
-        # Sort by creation time, newest first
-        workflows.sort(key=lambda w: w.created_at, reverse=True)
+        async with self._retention_lock:
+            cutoff = datetime.utcnow() - timedelta(days=WORKFLOW_RETENTION_DAYS)
+            finished = [status.value for status in FINISHED_STATUSES]
+            expired: List[ContentWorkflow] = []
+            for user_id in self.index.users():
+                keys = self.index.keys(user_id, finished)
+                # Oldest first, so the first `excess` keys are over the per-user cap
+                excess = len(keys) - WORKFLOW_RETENTION_PER_USER
+                for position, (_, workflow_id) in enumerate(keys):
+                    workflow = self.workflows[workflow_id]
+                    if position < excess or workflow.updated_at < cutoff:
+                        expired.append(workflow)
+            if not expired:
+                return 0
+            
+            # Detach from memory up front; the lock keeps lookups waiting until the archive has them
+            for workflow in expired:
+                del self.workflows[workflow.id]
+                self.index.remove(workflow)
+                if self._idempotency.get((workflow.user_id, workflow.idempotency_key)) == workflow.id:
+                    del self._idempotency[(workflow.user_id, workflow.idempotency_key)]
+            
+            workflow_ids = [workflow.id for workflow in expired]
+            transitions = await self.store.get_transitions_many(workflow_ids) if self.store else {}
+            records = []
+            for workflow in expired:
+                record = workflow.to_dict()
+                record["transitions"] = transitions.get(workflow.id, [])
+                records.append(record)
+            
+            # Archive before deleting so a crash in between leaves a duplicate, never a loss
+            await self.archive.append(records)
+            if self.store:
+                await self.store.delete(workflow_ids)
+            
+            # Forget batches none of whose workflows are left in memory
+            for batch_id in [
+                batch.id for batch in self.batches.values()
+                if not any(workflow_id in self.workflows for workflow_id in batch.workflow_ids)
+            ]:
+                del self.batches[batch_id]
         
+        self.logger.info(f"Archived {len(expired)} finished workflows")
+        return len(expired)
+    
+    async def list_workflows(self, user_id: str, status: Optional[WorkflowStatus] = None) -> List[ContentWorkflow]:
+        """List workflows for a user, optionally filtered by status"""
+        workflows, _ = await self.list_workflows_page(user_id, status)
         return workflows
     
+    async def list_workflows_page(
+        self,
+        user_id: str,
+        status: Optional[WorkflowStatus] = None,
+        limit: Optional[int] = None,
+        cursor: Optional[str] = None,
+        since: Optional[datetime] = None
+    ) -> Tuple[List[ContentWorkflow], Optional[str]]:
+        """List one page of a user's workflows, newest first
+
+        Returns the workflows and the cursor for the next page, or None on the
+        last page. Raises ValueError for a malformed cursor.
+        """
+        before = decode_cursor(cursor) if cursor else None
+        since_ts = _to_naive_utc(since).replace(tzinfo=timezone.utc).timestamp() if since else None
+        
+        workflow_ids, next_key = self.index.page(
+            user_id,
+            status.value if status else None,
+            limit=limit,
+            before=before,
+            since=since_ts
+        )
+        workflows = [self.workflows[workflow_id] for workflow_id in workflow_ids]
+        return workflows, encode_cursor(next_key) if next_key else None
+    
     async def cancel_workflow(self, workflow_id: str) -> bool:
         """Cancel a pending or processing workflow"""
         if workflow_id not in self.workflows:
@@ -400,21 +1281,30 @@ class ContentAutomationService:
         workflow = self.workflows[workflow_id]
         
         if workflow.status in [WorkflowStatus.PENDING, WorkflowStatus.PROCESSING]:
-            workflow.status = WorkflowStatus.CANCELLED
-            workflow.updated_at = datetime.utcnow()
+            # Cancelled workflows cannot be restarted, so the body is not needed
+            workflow.content = ""
+            self._transition(workflow, WorkflowStatus.CANCELLED)
             
-            # Cancel active task if exists
-            if workflow_id in self.active_tasks:
-                self.active_tasks[workflow_id].cancel()
-                del self.active_tasks[workflow_id]
+            # Cancel a pending timer, queued attempt or running attempt
+            self.scheduler.cancel(workflow_id)
+            self.pacer.discard(workflow_id)
+            self._unbatch(workflow_id)
+            self.executor.cancel(workflow_id)
+            if self.leases:
+                # Revokes the lease, so a worker running it elsewhere abandons the attempt
+                self.store.drop_lease(workflow_id)
             
             self.logger.info(f"Cancelled workflow {workflow_id}")
             return True
         
         return False
     
-    async def start_workflow(self, workflow_id: str) -> None:
-        """Start processing a workflow"""
+    async def start_workflow(self, workflow_id: str, force: bool = False) -> None:
+        """Start processing a workflow
+
+        Raises WorkflowQueueFull when the workflow is due now and the executor
+        queue is at capacity, unless force is set.
+        """
         if workflow_id not in self.workflows:
             raise ValueError(f"Workflow {workflow_id} not found")
         
@@ -423,36 +1313,128 @@ class ContentAutomationService:
         if workflow.status != WorkflowStatus.PENDING:
             raise ValueError(f"Workflow {workflow_id} is not in pending status")
         
-        # Check if scheduled publish time has passed
-        if workflow.scheduled_publish_time:
-            if datetime.utcnow() < workflow.scheduled_publish_time:
+        if self.leases:
+            # Due times are enforced by the shared queue itself
+            self._offer(workflow)
+            return
+        
+        # Check if the scheduled publish time (or a pending retry's due time) has passed
+        due_at = workflow.next_attempt_at or workflow.scheduled_publish_time
+        if due_at:
+            if datetime.utcnow() < due_at:
                 # Schedule for later
-                delay = (workflow.scheduled_publish_time - datetime.utcnow()).total_seconds()
-                
-                async def scheduled_task():
-                    await asyncio.sleep(delay)
-                    await self.process_workflow(workflow_id)
-                
-                task = asyncio.create_task(scheduled_task())
-                self.active_tasks[workflow_id] = task
+                self.scheduler.schedule(workflow_id, due_at)
                 
-                self.logger.info(f"Scheduled workflow {workflow_id} for {workflow.scheduled_publish_time}")
+                self.logger.info(f"Scheduled workflow {workflow_id} for {due_at}")
                 return
         
-        # Start immediate processing
-        task = asyncio.create_task(self.process_workflow(workflow_id))
-        self.active_tasks[workflow_id] = task
+        # Queue for immediate processing
+        self._enqueue(workflow, force=force)
+    
+    def get_publish_window(self, connection_id: str) -> PublishWindow:
+        """The publish window in effect for a connection"""
+        return self.publish_windows.for_connection(connection_id)
+    
+    async def set_publish_window(self, connection_id: str, settings: Optional[Dict[str, Any]]) -> PublishWindow:
+        """Apply a site owner's publish window settings, or revert to the configured window with None
+
+        Workflows already held for the connection are re-evaluated straight
+        away. Raises ValueError on invalid settings.
+        """
+        try:
+            window = self.publish_windows.set(connection_id, settings)
+        except TypeError as e:
+            raise ValueError(str(e))
+        if self.store:
+            await self.store.save_publish_window(connection_id, settings)
+        self.pacer.refresh(connection_id)
+        self.logger.info(f"Publish window for connection {connection_id} set to {window}")
+        return window
+    
+    async def reschedule_workflow(self, workflow_id: str, scheduled_publish_time: datetime) -> None:
+        """Move a pending workflow's publish time"""
+        workflow = self.workflows.get(workflow_id)
+        if workflow is None or workflow.status != WorkflowStatus.PENDING:
+            raise ValueError(f"Workflow {workflow_id} is not in pending status")
+        if self.executor.is_active(workflow_id):
+            raise ValueError(f"Workflow {workflow_id} is already queued for processing")
+        
+        workflow.scheduled_publish_time = _to_naive_utc(scheduled_publish_time)
+        # An explicit publish time supersedes a pending retry delay
+        workflow.next_attempt_at = None
+        workflow.updated_at = datetime.utcnow()
+        self._persist(workflow)
+        self.scheduler.cancel(workflow_id)
+        self.pacer.discard(workflow_id)
+        # A workflow released with others waits in a batch job rather than under its own ID
+        self._unbatch(workflow_id)
+        await self.start_workflow(workflow_id, force=True)
+    
+    async def retry_workflow(self, workflow_id: str) -> None:
+        """Reset a failed workflow and start it again"""
+        workflow = self.workflows.get(workflow_id) or await self._restore(workflow_id)
+        if workflow is None:
+            raise ValueError(f"Workflow {workflow_id} not found")
+        workflow.error_message = None
+        workflow.retry_count = 0
+        workflow.next_attempt_at = None
+        self._transition(workflow, WorkflowStatus.PENDING, "manual retry")
+        await self.start_workflow(workflow_id)
+    
+    async def replay_dead_letters(
+        self,
+        user_id: str,
+        workflow_ids: Optional[List[str]] = None,
+        spread_seconds: float = 0
+    ) -> List[str]:
+        """Move dead-lettered workflows back to pending and start them again
+
+        Replays the given workflows, or all of the user's dead letters when
+        workflow_ids is None; IDs that are not the user's dead letters are
+        ignored. With spread_seconds, each replay is delayed by a random
+        time up to that long so a recovered site is not hit all at once.
+        Returns the IDs replayed, oldest first when replaying everything.
+        """
+        if workflow_ids is None:
+            workflow_ids = [
+                workflow_id for _, workflow_id in self.index.keys(user_id, [WorkflowStatus.DEAD_LETTER.value])
+            ]
+        
+        now = datetime.utcnow()
+        replayed = []
+        for workflow_id in dict.fromkeys(workflow_ids):
+            workflow = self.workflows.get(workflow_id)
+            if workflow is None or workflow.user_id != user_id or workflow.status != WorkflowStatus.DEAD_LETTER:
+                continue
+            workflow.error_message = None
+            workflow.retry_count = 0
+            workflow.max_retries = self.retry_policies.for_connection(workflow.connection_id).max_retries
+            workflow.next_attempt_at = (
+                now + timedelta(seconds=random.uniform(0, spread_seconds)) if spread_seconds > 0 else None
+            )
+            self._transition(workflow, WorkflowStatus.PENDING, "replayed from dead-letter queue")
+            # Accepted as one request, like a batch, so replays bypass the queue limit
+            await self.start_workflow(workflow_id, force=True)
+            replayed.append(workflow_id)
+        
+        if replayed:
+            self.logger.info(f"Replayed {len(replayed)} dead-lettered workflows for user {user_id}")
+        return replayed
 
 
-# Global service instance
-content_automation = ContentAutomationService()
+# Global service instance, persisted to the pipeline data volume
+content_automation = ContentAutomationService(
+    WorkflowStore(os.getenv("CONTENT_WORKFLOW_DB", "/app/data/content_workflows.db")),
+    WorkflowArchive(os.getenv("CONTENT_WORKFLOW_ARCHIVE_DIR", "/app/data/workflow_archive")),
+    TagEngine(os.getenv("TAG_INDEX_DIR", "/app/data/tag_index"))
+)
 
 # Pydantic models for API requests/responses
-class CreateWorkflowRequest(BaseModel):
+class WorkflowContentRequest(BaseModel):
     title: str = Field(..., description="Content title")
     content: str = Field(..., description="Content body")
     content_type: ContentType = Field(ContentType.BLOG_POST, description="Type of content")
-    connection_id: str = Field(..., description="WordPress connection ID")
+    content_format: ContentFormat = Field(ContentFormat.HTML, description="Markup of the content body")
     tags: Optional[List[str]] = Field(None, description="Content tags")
     categories: Optional[List[str]] = Field(None, description="Content categories")
     featured_image_url: Optional[str] = Field(None, description="Featured image URL")
@@ -460,6 +1442,43 @@ class CreateWorkflowRequest(BaseModel):
     scheduled_publish_time: Optional[datetime] = Field(None, description="Scheduled publish time")
     seo_title: Optional[str] = Field(None, description="SEO title")
     seo_description: Optional[str] = Field(None, description="SEO description")
+    idempotency_key: Optional[str] = Field(None, max_length=255, description="Client-chosen deduplication key")
+
+class CreateWorkflowRequest(WorkflowContentRequest):
+    connection_id: str = Field(..., description="WordPress connection ID")
+    update_post_id: Optional[int] = Field(
+        None, ge=1, description="Existing WordPress post to update with only the fields that changed"
+    )
+
+class CreateFanoutWorkflowRequest(WorkflowContentRequest):
+    connection_ids: List[str] = Field(
+        ..., min_length=1, max_length=WORKFLOW_FANOUT_MAX, description="WordPress connections to publish to"
+    )
+
+class CreateWorkflowBatchRequest(BaseModel):
+    workflows: List[CreateWorkflowRequest] = Field(
+        ..., min_length=1, max_length=WORKFLOW_BATCH_MAX, description="Workflows to create"
+    )
+
+class ReplayDeadLettersRequest(BaseModel):
+    workflow_ids: Optional[List[str]] = Field(
+        None, max_length=WORKFLOW_BATCH_MAX, description="Dead-lettered workflows to replay; all of them when omitted"
+    )
+    spread_seconds: float = Field(0, ge=0, le=3600, description="Spread replays randomly over this many seconds")
+
+class RescheduleWorkflowRequest(BaseModel):
+    scheduled_publish_time: datetime = Field(..., description="New scheduled publish time")
+
+class PublishWindowRequest(BaseModel):
+    quiet_hours: Optional[str] = Field(
+        None, pattern=r"^\d{2}:\d{2}-\d{2}:\d{2}$", description="Local time range with no publishing, e.g. 22:00-07:00"
+    )
+    timezone: Optional[str] = Field(None, description="IANA timezone of quiet_hours")
+    max_posts: Optional[int] = Field(None, ge=0, description="Posts allowed per interval; 0 for no limit")
+    interval: Optional[float] = Field(None, gt=0, description="Rate limit interval in seconds")
+    coalesce_seconds: Optional[float] = Field(
+        None, ge=0, le=3600, description="How long a ready workflow waits for others to share a batch write"
+    )
 
 class WorkflowResponse(BaseModel):
     id: str
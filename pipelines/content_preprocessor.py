@@ -0,0 +1,279 @@
+"""
+Content Preprocessing Engine
+Single-pass HTML walker producing plain-text statistics, headings, excerpt and table of contents
+"""
+
+import asyncio
+import multiprocessing
+import os
+import re
+from collections import Counter, OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, Optional, Tuple
+
+from metrics import record_cache_lookup
+
+# Documents larger than this (in characters) are analyzed in a worker process
+PREPROCESS_OFFLOAD_CHARS = int(os.getenv("PREPROCESS_OFFLOAD_CHARS", str(256 * 1024)))
+PREPROCESS_POOL_WORKERS = int(os.getenv("PREPROCESS_POOL_WORKERS", "2"))
+# Approximate memory budget for memoized preprocessing results
+PREPROCESS_CACHE_MAX_BYTES = int(os.getenv("PREPROCESS_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+
+# One alternation walks the document left to right: element tags, other markup
+# (comments, doctype), then runs of text
+_TOKEN_RE = re.compile(r'<(/?)([a-zA-Z][a-zA-Z0-9]*)([^>]*)>|<[^>]+>|[^<]+|<')
+_WORD_RE = re.compile(r'\b[a-zA-Z]{3,}\b')
+_WHITESPACE_RE = re.compile(r'\s+')
+_ANCHOR_STRIP_RE = re.compile(r'[^a-zA-Z0-9\s]')
+
+_HEADING_TAGS = frozenset(f"h{level}" for level in range(1, 7))
+
+# Common words excluded from tag suggestions
+STOP_WORDS = frozenset({
+    'the', 'and', 'for', 'are', 'but', 'not', 'you', 'all', 'can', 'had',
+    'her', 'was', 'one', 'our', 'out', 'day', 'get', 'has', 'him', 'his',
+    'how', 'its', 'may', 'new', 'now', 'old', 'see', 'two', 'who', 'boy',
+    'did', 'she', 'use', 'way', 'will', 'with', 'this', 'that', 'have',
+    'from', 'they', 'know', 'want', 'been', 'good', 'much', 'some', 'time',
+    'very', 'when', 'come', 'here', 'just', 'like', 'long', 'make', 'many',
+    'over', 'such', 'take', 'than', 'them', 'well', 'were'
+})
+
+
+@dataclass
+class Heading:
+    """A heading element and where it sits in the source document"""
+    level: int
+    attrs: str
+    inner_html: str
+    anchor: str
+    start: int
+    end: int
+
+
+@dataclass
+class ContentAnalysis:
+    """Everything the publish path needs from one scan of a document"""
+    content: str
+    excerpt: str
+    headings: List[Heading] = field(default_factory=list)
+    word_counts: Counter = field(default_factory=Counter)
+    # Adjacent word pairs, unfiltered; consumers pick the pairs they care about
+    bigram_counts: Counter = field(default_factory=Counter)
+    # Offset just past the first paragraph's closing tag, where a TOC goes
+    toc_position: int = 0
+
+    def suggest_tags(self, max_tags: int = 8) -> List[str]:
+        """Most frequent non-stop words of more than three letters"""
+        candidates = Counter({
+            word: count for word, count in self.word_counts.items()
+            if len(word) > 3 and word not in STOP_WORDS
+        })
+        return [word.capitalize() for word, _ in candidates.most_common(max_tags)]
+
+    def approximate_size(self) -> int:
+        """Rough memory footprint in bytes, for cache accounting"""
+        return (
+            len(self.content) + len(self.excerpt)
+            + 100 * len(self.word_counts)
+            + 200 * len(self.bigram_counts)
+            + sum(200 + len(h.attrs) + 2 * len(h.inner_html) for h in self.headings)
+        )
+
+    def with_table_of_contents(self) -> str:
+        """The content with heading anchors and a table of contents, when it has at least two headings"""
+        if len(self.headings) < 2:
+            return self.content
+
+        toc_html = '<div class="table-of-contents">\n<h3>Table of Contents</h3>\n<ul>\n'
+        toc_html += ''.join(f'<li><a href="#{h.anchor}">{h.inner_html}</a></li>\n' for h in self.headings)
+        toc_html += '</ul>\n</div>\n\n'
+
+        # Stitch the output from source slices in one pass over the heading spans
+        parts: List[str] = []
+        position = 0
+        toc_pending = True
+        for heading in self.headings + [None]:
+            if toc_pending and (heading is None or self.toc_position <= heading.start):
+                # A paragraph end inside a heading moves the TOC to just after it
+                toc_at = max(self.toc_position, position)
+                parts.append(self.content[position:toc_at])
+                parts.append('\n\n' + toc_html if toc_at else toc_html)
+                position = toc_at
+                toc_pending = False
+            if heading is None:
+                break
+            parts.append(self.content[position:heading.start])
+            parts.append(
+                f'<h{heading.level}{heading.attrs} id="{heading.anchor}">{heading.inner_html}</h{heading.level}>'
+            )
+            position = heading.end
+        parts.append(self.content[position:])
+        return ''.join(parts)
+
+
+def _anchor(inner_html: str) -> str:
+    return _ANCHOR_STRIP_RE.sub('', inner_html).replace(' ', '-').lower()
+
+
+def _excerpt(clean_prefix: str, truncated: bool, max_length: int) -> str:
+    if not truncated:
+        return clean_prefix
+
+    # Find the last complete sentence within the limit
+    excerpt = clean_prefix[:max_length]
+    last_period = excerpt.rfind('.')
+    if last_period > max_length * 0.7:  # If we find a period in the last 30%
+        return excerpt[:last_period + 1]
+    # Otherwise, cut at the last space
+    last_space = excerpt.rfind(' ')
+    if last_space > 0:
+        return excerpt[:last_space] + '...'
+    return excerpt
+
+
+def analyze(content: str, excerpt_length: int = 160) -> ContentAnalysis:
+    """Scan a document once, collecting headings, word counts and the excerpt"""
+    analysis = ContentAnalysis(content=content, excerpt='')
+    text_parts: List[str] = []
+
+    # Whitespace-collapsed text, kept only until it is long enough for the excerpt
+    excerpt_text = ''
+    excerpt_done = False
+    heading_open = None
+    first_paragraph_open = False
+
+    for match in _TOKEN_RE.finditer(content):
+        closing, name, attrs = match.group(1, 2, 3)
+        if name is None:
+            text = match.group()
+            if text.startswith('<') and len(text) > 1:
+                # Comment, doctype or processing instruction
+                continue
+            text_parts.append(text)
+            if not excerpt_done:
+                collapsed = _WHITESPACE_RE.sub(' ', text)
+                if not excerpt_text or excerpt_text.endswith(' '):
+                    collapsed = collapsed.lstrip()
+                excerpt_text += collapsed
+                excerpt_done = len(excerpt_text.rstrip()) > excerpt_length
+            continue
+
+        name = name.lower()
+        if name in _HEADING_TAGS:
+            if not closing:
+                heading_open = (int(name[1]), attrs, match.start(), match.end())
+            elif heading_open is not None:
+                level, heading_attrs, start, inner_start = heading_open
+                inner_html = content[inner_start:match.start()]
+                analysis.headings.append(
+                    Heading(level, heading_attrs, inner_html, _anchor(inner_html), start, match.end())
+                )
+                heading_open = None
+        elif name == 'p' and not analysis.toc_position:
+            if not closing:
+                first_paragraph_open = True
+            elif first_paragraph_open:
+                analysis.toc_position = match.end()
+
+    # Counting once over the joined text beats a Counter update per text run
+    words = _WORD_RE.findall('\n'.join(text_parts).lower())
+    analysis.word_counts = Counter(words)
+    analysis.bigram_counts = Counter(zip(words, words[1:]))
+    excerpt_text = excerpt_text.rstrip()
+    analysis.excerpt = _excerpt(excerpt_text, len(excerpt_text) > excerpt_length, excerpt_length)
+    return analysis
+
+
+_pool: Optional[ProcessPoolExecutor] = None
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    if _pool is None:
+        # spawn rather than fork: the service process has live threads and sockets
+        _pool = ProcessPoolExecutor(
+            max_workers=PREPROCESS_POOL_WORKERS,
+            mp_context=multiprocessing.get_context("spawn")
+        )
+    return _pool
+
+
+async def run_in_pool(func: Callable[..., Any], *args: Any) -> Any:
+    """Run a picklable, module-level function in the preprocessing worker pool"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_get_pool(), func, *args)
+
+
+async def analyze_async(content: str, excerpt_length: int = 160) -> ContentAnalysis:
+    """analyze() that moves oversize documents to a worker process so the event loop keeps serving"""
+    if len(content) <= PREPROCESS_OFFLOAD_CHARS:
+        return analyze(content, excerpt_length)
+    return await run_in_pool(analyze, content, excerpt_length)
+
+
+def shutdown_pool() -> None:
+    """Stop the worker processes, if any were started"""
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+
+class PreprocessCache:
+    """Byte-bounded LRU of preprocessing results
+
+    Callers pick the key (e.g. content hash plus the options that shape the
+    output) and report each value's approximate size; least recently used
+    entries are evicted once the total exceeds max_bytes. Concurrent misses
+    for the same key share one computation. Lookups are counted under
+    record_cache_lookup("preprocess", ...).
+    """
+
+    def __init__(self, max_bytes: int = PREPROCESS_CACHE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._entries: "OrderedDict[Hashable, Tuple[Any, int]]" = OrderedDict()
+        self._inflight: Dict[Hashable, asyncio.Task] = {}
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    async def get_or_compute(self, key: Hashable, compute: Callable[[], Awaitable[Tuple[Any, int]]]) -> Any:
+        """Cached value for key, or the result of compute(), which returns (value, size_in_bytes)"""
+        entry = self._entries.get(key)
+        if entry is not None:
+            self._entries.move_to_end(key)
+            record_cache_lookup("preprocess", True)
+            return entry[0]
+
+        task = self._inflight.get(key)
+        record_cache_lookup("preprocess", task is not None)
+        if task is None:
+            task = asyncio.create_task(self._compute(key, compute))
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        # A cancelled caller must not cancel the computation others are waiting on
+        return await asyncio.shield(task)
+
+    async def _compute(self, key: Hashable, compute: Callable[[], Awaitable[Tuple[Any, int]]]) -> Any:
+        value, size = await compute()
+        self._put(key, value, size)
+        return value
+
+    def _put(self, key: Hashable, value: Any, size: int) -> None:
+        if size > self.max_bytes:
+            return
+        previous = self._entries.pop(key, None)
+        if previous is not None:
+            self.size -= previous[1]
+        self._entries[key] = (value, size)
+        self.size += size
+        while self.size > self.max_bytes:
+            _, (_, evicted_size) = self._entries.popitem(last=False)
+            self.size -= evicted_size
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self.size = 0
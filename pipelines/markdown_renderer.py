@@ -0,0 +1,478 @@
+"""
+Markdown Renderer
+Linear-pass Markdown to HTML for chat content: fenced code, lists, tables, blockquotes and nested emphasis
+"""
+
+import hashlib
+import html
+import os
+import re
+from collections import OrderedDict
+from typing import Iterator, List, Optional, Tuple
+
+from content_preprocessor import PREPROCESS_OFFLOAD_CHARS, run_in_pool
+from metrics import record_cache_lookup
+
+# Approximate memory budget for rendered documents kept by content hash
+MARKDOWN_CACHE_MAX_BYTES = int(os.getenv("MARKDOWN_CACHE_MAX_BYTES", str(32 * 1024 * 1024)))
+
+_FENCE_OPEN_RE = re.compile(r'^( *)(`{3,}|~{3,})(.*)$')
+_HEADING_RE = re.compile(r'^ {0,3}(#{1,6})(?:[ \t]+(.*?))?(?:[ \t]+#+)?[ \t]*$')
+_RULE_RE = re.compile(r'^ {0,3}([-*_])(?:[ \t]*\1){2,}[ \t]*$')
+_QUOTE_RE = re.compile(r'^ {0,3}> ?(.*)$')
+_LIST_RE = re.compile(r'^( *)([-*+]|\d{1,9}[.)])( +|$)(.*)$')
+_TABLE_DELIMITER_RE = re.compile(r'^ *\|? *:?-+:? *(?:\| *:?-+:? *)*\|? *$')
+_CELL_SPLIT_RE = re.compile(r'(?<!\\)\|')
+_SAFE_URL_RE = re.compile(r'^(?:https?:|mailto:|ftp:|/|#|\.|[^:]*$)', re.IGNORECASE)
+
+_INLINE_RE = re.compile(r'''
+    # Cheap first-character test so plain text is skipped without trying every branch
+    (?=[`!\[<h\\ *_~])
+    (?:
+    (?P<code>(?P<ticks>`+)(?P<code_body>[^`](?:.*?[^`])?)(?P=ticks)(?!`))
+  | (?P<image>!\[(?P<alt>[^\]\n]*)\]\((?P<src>[^()\s]+)(?:[ ]+"(?P<image_title>[^"\n]*)")?\))
+  | (?P<link>\[(?P<text>(?:[^\[\]\n]|\[[^\[\]\n]*\])*)\]\((?P<href>[^()\s]*(?:\([^()\s]*\)[^()\s]*)*)(?:[ ]+"(?P<title>[^"\n]*)")?\))
+  | (?P<autolink><(?P<url>(?:https?|mailto):[^\s<>]+)>)
+  | (?P<bare>https?://[^\s<>()]*[^\s<>().,;:!?'"*_~])
+  | (?P<escape>\\(?P<escaped>[!-/:-@\[-`{-~]))
+  | (?P<hard_break>(?:[ ]{2,}|\\)\n)
+  | (?P<delimiter>\*+|_+|~~+)
+    )
+''', re.VERBOSE | re.DOTALL)
+
+_EMPHASIS_TAGS = {1: "em", 2: "strong"}
+
+
+def _escape(text: str) -> str:
+    return html.escape(text, quote=False)
+
+
+def _attribute(value: str) -> str:
+    return html.escape(value, quote=True)
+
+
+def _safe_url(url: str) -> str:
+    """The URL, or "#" for schemes such as javascript: that must not reach a page"""
+    return _attribute(url if _SAFE_URL_RE.match(url) else "#")
+
+
+class _Delimiter:
+    """A run of *, _ or ~ that may open or close emphasis; matched tags attach to the run itself"""
+    __slots__ = ("char", "count", "can_open", "can_close", "open_tags", "close_tags")
+
+    def __init__(self, char: str, count: int, can_open: bool, can_close: bool):
+        self.char = char
+        self.count = count
+        self.can_open = can_open
+        self.can_close = can_close
+        self.open_tags: List[str] = []
+        self.close_tags: List[str] = []
+
+    def __str__(self) -> str:
+        # Matched characters are the ones nearest the emphasized text
+        return "".join(self.close_tags) + self.char * self.count + "".join(self.open_tags)
+
+
+def _flanking(before: str, after: str) -> Tuple[bool, bool]:
+    """(left-flanking, right-flanking) for a delimiter run between two characters"""
+    before_space, after_space = before.isspace(), after.isspace()
+    before_punct = not before_space and not before.isalnum()
+    after_punct = not after_space and not after.isalnum()
+    left = not after_space and (not after_punct or before_space or before_punct)
+    right = not before_space and (not before_punct or after_space or after_punct)
+    return left, right
+
+
+def render_inline(text: str) -> str:
+    """Inline Markdown to HTML in one left-to-right scan
+
+    Emphasis uses a delimiter stack: each closing run is matched against the
+    nearest compatible opener, and tags are attached to the runs themselves
+    rather than by re-slicing the output, so nesting costs no extra passes.
+    """
+    nodes: List[object] = []
+    stack: List[_Delimiter] = []
+    # Per delimiter character, the stack depth below which no opener can match
+    bottom = {"*": 0, "_": 0, "~": 0}
+    position = 0
+
+    for match in _INLINE_RE.finditer(text):
+        start, end = match.span()
+        if start > position:
+            nodes.append(_escape(text[position:start]))
+        position = end
+        kind = match.lastgroup
+
+        if kind == "delimiter":
+            run = match.group()
+            char = run[0]
+            before = text[start - 1] if start > 0 else " "
+            after = text[end] if end < len(text) else " "
+            left, right = _flanking(before, after)
+            if char == "_":
+                can_open = left and (not right or not before.isalnum())
+                can_close = right and (not left or not after.isalnum())
+            else:
+                can_open, can_close = left, right
+            delimiter = _Delimiter(char, len(run), can_open, can_close)
+            nodes.append(delimiter)
+
+            if can_close:
+                index = len(stack) - 1
+                while delimiter.count and index >= bottom[char]:
+                    opener = stack[index]
+                    if opener.char != char or not opener.can_open:
+                        index -= 1
+                        continue
+                    if char == "~":
+                        use, tag = 2, "del"
+                    else:
+                        use = 2 if delimiter.count >= 2 and opener.count >= 2 else 1
+                        tag = _EMPHASIS_TAGS[use]
+                    opener.count -= use
+                    delimiter.count -= use
+                    opener.open_tags.insert(0, f"<{tag}>")
+                    delimiter.close_tags.append(f"</{tag}>")
+                    # Runs between the pair can no longer match anything
+                    del stack[index + 1:]
+                    if opener.count < (2 if char == "~" else 1):
+                        del stack[index]
+                    index = len(stack) - 1
+                    for key in bottom:
+                        bottom[key] = min(bottom[key], len(stack))
+                if delimiter.count:
+                    bottom[char] = len(stack)
+            if can_open and delimiter.count >= (2 if char == "~" else 1):
+                stack.append(delimiter)
+        elif kind == "code":
+            body = match.group("code_body")
+            if body.startswith(" ") and body.endswith(" ") and body.strip():
+                body = body[1:-1]
+            nodes.append(f"<code>{_escape(body)}</code>")
+        elif kind == "image":
+            title = match.group("image_title")
+            title_attribute = f' title="{_attribute(title)}"' if title else ""
+            nodes.append(
+                f'<img src="{_safe_url(match.group("src"))}" alt="{_attribute(match.group("alt"))}"{title_attribute} />'
+            )
+        elif kind == "link":
+            title = match.group("title")
+            title_attribute = f' title="{_attribute(title)}"' if title else ""
+            nodes.append(
+                f'<a href="{_safe_url(match.group("href"))}"{title_attribute}>{render_inline(match.group("text"))}</a>'
+            )
+        elif kind == "autolink" or kind == "bare":
+            url = match.group("url") if kind == "autolink" else match.group()
+            nodes.append(f'<a href="{_safe_url(url)}">{_escape(url)}</a>')
+        elif kind == "escape":
+            nodes.append(_escape(match.group("escaped")))
+        elif kind == "hard_break":
+            nodes.append("<br />\n")
+
+    if position < len(text):
+        nodes.append(_escape(text[position:]))
+    return "".join(str(node) for node in nodes)
+
+
+def _indent(line: str) -> int:
+    return len(line) - len(line.lstrip(" "))
+
+
+def _starts_block(line: str) -> bool:
+    """Whether a line would begin a new block rather than continue a paragraph"""
+    return bool(
+        _FENCE_OPEN_RE.match(line) or _HEADING_RE.match(line) or _RULE_RE.match(line)
+        or _QUOTE_RE.match(line) or _LIST_RE.match(line)
+    )
+
+
+def _split_row(line: str) -> List[str]:
+    row = line.strip()
+    if row.startswith("|"):
+        row = row[1:]
+    if row.endswith("|") and not row.endswith("\\|"):
+        row = row[:-1]
+    return [cell.strip().replace("\\|", "|") for cell in _CELL_SPLIT_RE.split(row)]
+
+
+def _paragraph(lines: List[str], tight: bool) -> str:
+    text = render_inline("\n".join(line.lstrip(" ") for line in lines).rstrip())
+    return f"{text}\n" if tight else f"<p>{text}</p>\n"
+
+
+def _fenced_code(lines: List[str], i: int, match) -> Tuple[int, str]:
+    indent, fence, info = len(match.group(1)), match.group(2), match.group(3).strip()
+    closing = re.compile(rf'^ *{re.escape(fence[0])}{{{len(fence)},}} *$')
+    body = []
+    i += 1
+    while i < len(lines) and not closing.match(lines[i]):
+        line = lines[i]
+        body.append(line[min(indent, _indent(line)):])
+        i += 1
+    language = info.split()[0] if info else ""
+    class_attribute = f' class="language-{_attribute(language)}"' if language else ""
+    code = _escape("\n".join(body) + "\n") if body else ""
+    return i + 1, f"<pre><code{class_attribute}>{code}</code></pre>\n"
+
+
+def _table(lines: List[str], i: int) -> Tuple[int, str]:
+    header = _split_row(lines[i])
+    aligns = []
+    for cell in _split_row(lines[i + 1]):
+        if cell.startswith(":") and cell.endswith(":"):
+            aligns.append(' style="text-align: center"')
+        elif cell.endswith(":"):
+            aligns.append(' style="text-align: right"')
+        elif cell.startswith(":"):
+            aligns.append(' style="text-align: left"')
+        else:
+            aligns.append("")
+
+    parts = ["<table>\n<thead>\n<tr>\n"]
+    parts.extend(f"<th{align}>{render_inline(cell)}</th>\n" for cell, align in zip(header, aligns))
+    parts.append("</tr>\n</thead>\n")
+    i += 2
+    body_started = False
+    while i < len(lines) and lines[i].strip() and "|" in lines[i] and not _starts_block(lines[i]):
+        if not body_started:
+            parts.append("<tbody>\n")
+            body_started = True
+        cells = _split_row(lines[i])
+        cells = (cells + [""] * len(header))[:len(header)]
+        parts.append("<tr>\n")
+        parts.extend(f"<td{align}>{render_inline(cell)}</td>\n" for cell, align in zip(cells, aligns))
+        parts.append("</tr>\n")
+        i += 1
+    if body_started:
+        parts.append("</tbody>\n")
+    parts.append("</table>\n")
+    return i, "".join(parts)
+
+
+def _list(lines: List[str], i: int) -> Tuple[int, str]:
+    """Collect one list's items by indentation, rendering each item's lines as nested blocks"""
+    first = _LIST_RE.match(lines[i])
+    marker = first.group(2)
+    ordered = marker[0].isdigit()
+    # A different bullet or ordered delimiter starts a new list
+    kind = marker[-1]
+    items: List[List[str]] = []
+    loose = False
+    pending_blank = False
+    content_indent = 0
+    # Blank lines inside an item's fenced code do not make the list loose
+    fence: Optional[str] = None
+
+    while i < len(lines):
+        line = lines[i]
+        if not line.strip() and fence:
+            items[-1].append("")
+            i += 1
+            continue
+        if not line.strip():
+            following = i + 1
+            while following < len(lines) and not lines[following].strip():
+                following += 1
+            if following == len(lines):
+                break
+            next_line = lines[following]
+            next_item = _LIST_RE.match(next_line)
+            if _indent(next_line) >= content_indent or (next_item and next_item.group(2)[-1] == kind):
+                items[-1].extend([""] * (following - i))
+                pending_blank = True
+                i = following
+                continue
+            break
+
+        if items and _indent(line) >= content_indent:
+            inner = line[content_indent:]
+            # Only a blank line between the item's own blocks loosens it, not one inside a nested list
+            loose = loose or (pending_blank and _indent(inner) == 0)
+            opening = _FENCE_OPEN_RE.match(inner)
+            if fence and inner.strip().startswith(fence):
+                fence = None
+            elif opening and not fence:
+                fence = opening.group(2)
+            items[-1].append(inner)
+        else:
+            item = _LIST_RE.match(line)
+            if item and item.group(2)[-1] == kind and not _RULE_RE.match(line):
+                spacing = len(item.group(3))
+                content_indent = len(item.group(1)) + len(item.group(2)) + (spacing if 1 <= spacing <= 4 else 1)
+                items.append([item.group(4)])
+                loose = loose or (pending_blank and len(items) > 1)
+            elif items and not pending_blank and not _starts_block(line):
+                # Lazy continuation of the item's paragraph
+                items[-1].append(line.strip())
+            else:
+                break
+        pending_blank = False
+        i += 1
+
+    tag = "ol" if ordered else "ul"
+    start = int(marker[:-1]) if ordered else 1
+    start_attribute = f' start="{start}"' if start != 1 else ""
+    parts = [f"<{tag}{start_attribute}>\n"]
+    for item_lines in items:
+        while item_lines and not item_lines[-1].strip():
+            item_lines.pop()
+        inner = "".join(iter_html_lines(item_lines, tight=not loose))
+        parts.append(f"<li>{inner.rstrip()}</li>\n" if not loose else f"<li>\n{inner}</li>\n")
+    parts.append(f"</{tag}>\n")
+    return i, "".join(parts)
+
+
+def iter_html_lines(lines: List[str], tight: bool = False) -> Iterator[str]:
+    """Render block-level Markdown, yielding each block's HTML as soon as it is complete
+
+    Every line is examined once per nesting level it sits in, so the cost is
+    linear in the document size for any realistic nesting depth. Within a
+    tight list item, paragraphs are emitted without <p> tags.
+    """
+    paragraph: List[str] = []
+    i = 0
+    while i < len(lines):
+        line = lines[i]
+        if not line.strip():
+            if paragraph:
+                yield _paragraph(paragraph, tight)
+                paragraph = []
+            i += 1
+            continue
+
+        fence = _FENCE_OPEN_RE.match(line)
+        if fence and not (fence.group(2)[0] == "`" and "`" in fence.group(3)):
+            if paragraph:
+                yield _paragraph(paragraph, tight)
+                paragraph = []
+            i, block = _fenced_code(lines, i, fence)
+            yield block
+            continue
+
+        heading = _HEADING_RE.match(line)
+        if heading:
+            if paragraph:
+                yield _paragraph(paragraph, tight)
+                paragraph = []
+            level = len(heading.group(1))
+            yield f"<h{level}>{render_inline(heading.group(2) or '')}</h{level}>\n"
+            i += 1
+            continue
+
+        if _RULE_RE.match(line):
+            if paragraph:
+                yield _paragraph(paragraph, tight)
+                paragraph = []
+            yield "<hr />\n"
+            i += 1
+            continue
+
+        if _QUOTE_RE.match(line):
+            if paragraph:
+                yield _paragraph(paragraph, tight)
+                paragraph = []
+            quoted = []
+            while i < len(lines):
+                quote = _QUOTE_RE.match(lines[i])
+                if quote:
+                    quoted.append(quote.group(1))
+                elif lines[i].strip() and quoted and quoted[-1].strip() and not _starts_block(lines[i]):
+                    # Lazy continuation of a quoted paragraph
+                    quoted.append(lines[i])
+                else:
+                    break
+                i += 1
+            yield "<blockquote>\n" + "".join(iter_html_lines(quoted)) + "</blockquote>\n"
+            continue
+
+        item = _LIST_RE.match(line)
+        # Only an empty-free item, or an ordered list starting at 1, may interrupt a paragraph
+        if item and item.group(4).strip() and (
+            not paragraph or not item.group(2)[0].isdigit() or item.group(2)[:-1] == "1"
+        ):
+            if paragraph:
+                yield _paragraph(paragraph, tight)
+                paragraph = []
+            i, block = _list(lines, i)
+            yield block
+            continue
+
+        if (
+            not paragraph and "|" in line and i + 1 < len(lines)
+            and _TABLE_DELIMITER_RE.match(lines[i + 1])
+            and len(_split_row(line)) == len(_split_row(lines[i + 1]))
+        ):
+            i, block = _table(lines, i)
+            yield block
+            continue
+
+        if not paragraph and _indent(line) >= 4:
+            code = []
+            while i < len(lines) and (not lines[i].strip() or _indent(lines[i]) >= 4):
+                code.append(lines[i][4:])
+                i += 1
+            while code and not code[-1].strip():
+                code.pop()
+            yield f"<pre><code>{_escape(chr(10).join(code) + chr(10))}</code></pre>\n"
+            continue
+
+        paragraph.append(line)
+        i += 1
+
+    if paragraph:
+        yield _paragraph(paragraph, tight)
+
+
+def iter_html(markdown: str) -> Iterator[str]:
+    """Stream a Markdown document as HTML, one top-level block at a time"""
+    return iter_html_lines(markdown.expandtabs(4).splitlines())
+
+
+def render(markdown: str) -> str:
+    """Render a Markdown document to HTML (uncached)"""
+    return "".join(iter_html(markdown))
+
+
+_cache: "OrderedDict[bytes, str]" = OrderedDict()
+_cache_size = 0
+
+
+def _cache_put(key: bytes, rendered: str) -> None:
+    global _cache_size
+    size = len(rendered) + 100
+    if size > MARKDOWN_CACHE_MAX_BYTES or key in _cache:
+        return
+    _cache[key] = rendered
+    _cache_size += size
+    while _cache_size > MARKDOWN_CACHE_MAX_BYTES:
+        _, evicted = _cache.popitem(last=False)
+        _cache_size -= len(evicted) + 100
+
+
+def _cached(markdown: str) -> Tuple[bytes, Optional[str]]:
+    key = hashlib.sha256(markdown.encode("utf-8")).digest()
+    rendered = _cache.get(key)
+    if rendered is not None:
+        _cache.move_to_end(key)
+    record_cache_lookup("markdown", rendered is not None)
+    return key, rendered
+
+
+def render_markdown(markdown: str) -> str:
+    """render() with output cached by content hash in a byte-bounded LRU"""
+    key, rendered = _cached(markdown)
+    if rendered is None:
+        rendered = render(markdown)
+        _cache_put(key, rendered)
+    return rendered
+
+
+async def render_markdown_async(markdown: str) -> str:
+    """render_markdown() that renders oversize documents in the preprocessing worker pool"""
+    if len(markdown) <= PREPROCESS_OFFLOAD_CHARS:
+        return render_markdown(markdown)
+    key, rendered = _cached(markdown)
+    if rendered is None:
+        rendered = await run_in_pool(render, markdown)
+        _cache_put(key, rendered)
+    return rendered
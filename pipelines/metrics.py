@@ -0,0 +1,379 @@
+"""
+Lightweight Prometheus Metrics
+Counters, gauges and histograms rendered in the Prometheus text exposition format
+"""
+
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+# Latency buckets in seconds, from sub-millisecond SQLite reads up to slow upstream calls
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def _format_labels(names: Tuple[str, ...], values: Tuple[str, ...], extra: str = "") -> str:
+    """Render a label set as {a="x",b="y"}"""
+    parts = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class _Metric:
+    """Base class for labelled metrics
+
+    Children are keyed by the tuple of label values and created on first use.
+    All updates are plain attribute arithmetic on the event loop thread, so the
+    hot path costs one dict lookup and one addition.
+    """
+
+    metric_type = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[Tuple[str, ...], object] = {}
+
+    def labels(self, *values: str, **kwargs: str):
+        """Get the child metric for a label set"""
+        if kwargs:
+            values = tuple(str(kwargs[name]) for name in self.labelnames)
+        else:
+            values = tuple(str(v) for v in values)
+        child = self._children.get(values)
+        if child is None:
+            child = self._new_child()
+            self._children[values] = child
+        return child
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.metric_type}"]
+        for values, child in self._children.items():
+            lines.extend(self._render_child(values, child))
+        return lines
+
+    def _render_child(self, values: Tuple[str, ...], child) -> List[str]:
+        return [f"{self.name}{_format_labels(self.labelnames, values)} {_format_value(child.value)}"]
+
+
+class _CounterChild:
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0.0
+
+    def inc(self, amount: float = 1.0) -> None:
+        self.value += amount
+
+
+class Counter(_Metric):
+    """Monotonically increasing counter"""
+
+    metric_type = "counter"
+
+    def _new_child(self):
+        return _CounterChild()
+
+    def inc(self, amount: float = 1.0) -> None:
+        """Increment the unlabelled counter"""
+        self.labels().inc(amount)
+
+
+class _GaugeChild:
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0.0
+
+    def set(self, value: float) -> None:
+        self.value = value
+
+    def inc(self, amount: float = 1.0) -> None:
+        self.value += amount
+
+    def dec(self, amount: float = 1.0) -> None:
+        self.value -= amount
+
+
+class Gauge(_Metric):
+    """Gauge that can be set directly or sampled from a callback at scrape time"""
+
+    metric_type = "gauge"
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._callbacks: Dict[Tuple[str, ...], Callable[[], float]] = {}
+
+    def _new_child(self):
+        return _GaugeChild()
+
+    def set(self, value: float) -> None:
+        self.labels().set(value)
+
+    def set_function(self, fn: Callable[[], float], *values: str) -> None:
+        """Sample the gauge from fn() on every scrape instead of on every update"""
+        self._callbacks[tuple(str(v) for v in values)] = fn
+
+    def render(self) -> List[str]:
+        for values, fn in self._callbacks.items():
+            self.labels(*values).set(fn())
+        return super().render()
+
+
+class _HistogramChild:
+    __slots__ = ("upper_bounds", "bucket_counts", "sum", "count")
+
+    def __init__(self, upper_bounds: Tuple[float, ...]):
+        self.upper_bounds = upper_bounds
+        self.bucket_counts = [0] * (len(upper_bounds) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        # Non-cumulative per-bucket counts; cumulated only when rendering
+        self.bucket_counts[bisect_left(self.upper_bounds, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    @contextmanager
+    def time(self) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start)
+
+
+class Histogram(_Metric):
+    """Histogram with fixed upper bounds"""
+
+    metric_type = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = (), buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.upper_bounds = tuple(sorted(buckets))
+
+    def _new_child(self):
+        return _HistogramChild(self.upper_bounds)
+
+    def observe(self, value: float) -> None:
+        self.labels().observe(value)
+
+    def _render_child(self, values: Tuple[str, ...], child) -> List[str]:
+        lines = []
+        cumulative = 0
+        for bound, bucket_count in zip(self.upper_bounds + (float("inf"),), child.bucket_counts):
+            cumulative += bucket_count
+            le = f'le="{_format_value(bound)}"'
+            lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, values, le)} {cumulative}")
+        label_str = _format_labels(self.labelnames, values)
+        lines.append(f"{self.name}_sum{label_str} {_format_value(child.sum)}")
+        lines.append(f"{self.name}_count{label_str} {child.count}")
+        return lines
+
+
+class MetricsRegistry:
+    """Collection of metrics exposed by the /metrics endpoint"""
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+
+    def register(self, metric: _Metric) -> _Metric:
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric {metric.name} already registered")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()) -> Counter:
+        return self.register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()) -> Gauge:
+        return self.register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: Tuple[str, ...] = (), buckets: Tuple[float, ...] = DEFAULT_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def render(self) -> str:
+        """Render every registered metric in Prometheus text format"""
+        lines: List[str] = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+
+# HTTP surface
+http_request_duration = registry.histogram(
+    "pipeline_http_request_duration_seconds",
+    "Time spent handling HTTP requests by route",
+    ("method", "route", "status")
+)
+
+# Upstream calls: WordPress sites are labelled by host, Authentik as "authentik"
+upstream_request_duration = registry.histogram(
+    "pipeline_upstream_request_duration_seconds",
+    "Latency of upstream HTTP calls by target and status",
+    ("target", "status")
+)
+
+# Local storage
+sqlite_query_duration = registry.histogram(
+    "pipeline_sqlite_query_duration_seconds",
+    "Time spent in SQLite operations",
+    ("operation",)
+)
+
+# Content automation
+workflow_queue_depth = registry.gauge(
+    "pipeline_workflow_queue_depth",
+    "Workflow attempts queued in the executor, including those parked on a busy connection"
+)
+workflow_processing_duration = registry.histogram(
+    "pipeline_workflow_processing_seconds",
+    "Time to process a workflow attempt by outcome",
+    ("outcome",)
+)
+workflow_queue_wait = registry.histogram(
+    "pipeline_workflow_queue_wait_seconds",
+    "Time a workflow attempt waited in the executor queue before a worker picked it up"
+)
+workflow_queue_rejections = registry.counter(
+    "pipeline_workflow_queue_rejections_total",
+    "Workflow submissions rejected because the executor queue was full"
+)
+workflow_inflight = registry.gauge(
+    "pipeline_workflow_inflight",
+    "Workflow attempts currently running on executor workers"
+)
+workflow_scheduled = registry.gauge(
+    "pipeline_workflow_scheduled",
+    "Workflows waiting in the scheduler for a publish time or retry delay"
+)
+workflow_retries = registry.counter(
+    "pipeline_workflow_retries_total",
+    "Workflow retries scheduled after a failed attempt"
+)
+workflow_dead_letters = registry.counter(
+    "pipeline_workflow_dead_letters_total",
+    "Workflows moved to the dead-letter queue after exhausting retries or failing permanently"
+)
+workflow_leases_held = registry.gauge(
+    "pipeline_workflow_leases_held",
+    "Shared-queue workflow leases held by this worker process"
+)
+workflow_lease_reclaims = registry.counter(
+    "pipeline_workflow_lease_reclaims_total",
+    "Shared-queue workflows claimed after another worker's lease expired"
+)
+workflow_leases_lost = registry.counter(
+    "pipeline_workflow_leases_lost_total",
+    "Shared-queue attempts abandoned because their lease expired or was revoked"
+)
+workflow_window_held = registry.gauge(
+    "pipeline_workflow_window_held",
+    "Ready workflows held back by publish windows or waiting to be coalesced with others for the same site"
+)
+workflow_window_decisions = registry.counter(
+    "pipeline_workflow_window_decisions_total",
+    "Publish window decisions per connection release: released, or deferred for quiet_hours or rate_limited",
+    ("decision",)
+)
+
+# Caches
+cache_requests = registry.counter(
+    "pipeline_cache_requests_total",
+    "Cache lookups by cache name and result",
+    ("cache", "result")
+)
+cache_hit_ratio = registry.gauge(
+    "pipeline_cache_hit_ratio",
+    "Fraction of cache lookups served from cache",
+    ("cache",)
+)
+
+
+_ratio_caches = set()
+
+
+def record_cache_lookup(cache: str, hit: bool) -> None:
+    """Count a cache lookup; the hit ratio gauge is derived at scrape time"""
+    cache_requests.labels(cache, "hit" if hit else "miss").inc()
+    if cache not in _ratio_caches:
+        _ratio_caches.add(cache)
+        hits = cache_requests.labels(cache, "hit")
+        misses = cache_requests.labels(cache, "miss")
+        cache_hit_ratio.set_function(
+            lambda: hits.value / (hits.value + misses.value) if hits.value + misses.value else 0.0,
+            cache
+        )
+
+
+def observe_upstream(target: str, status_code: Optional[int], seconds: float) -> None:
+    """Record one upstream call; status is "error" when no response was received"""
+    upstream_request_duration.labels(target, status_code if status_code is not None else "error").observe(seconds)
+
+
+class MetricsMiddleware:
+    """ASGI middleware recording a latency histogram per route template
+
+    The route label uses the matched path template (e.g. /api/content/workflows/{workflow_id})
+    so per-ID paths do not explode label cardinality.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self._route_paths: Dict[object, str] = {}
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        status_holder = [500]
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status_holder[0] = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            http_request_duration.labels(
+                scope["method"], self._route_label(scope), status_holder[0]
+            ).observe(time.perf_counter() - start)
+
+    def _route_label(self, scope) -> str:
+        endpoint = scope.get("endpoint")
+        if endpoint is None:
+            return "unmatched"
+        path = self._route_paths.get(endpoint)
+        if path is None:
+            app = scope.get("app")
+            for route in getattr(app, "routes", []):
+                if getattr(route, "endpoint", None) is endpoint:
+                    path = route.path
+                    break
+            else:
+                path = "unmatched"
+            self._route_paths[endpoint] = path
+        return path
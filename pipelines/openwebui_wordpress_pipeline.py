@@ -5,7 +5,7 @@ This pipeline integrates directly with OpenWebUI to provide WordPress publishing
 
 import asyncio
 import logging
-from typing import Generator, Iterator, Dict, Any, List, Optional
+from typing import AsyncGenerator, Dict, Any, List, Optional
 from datetime import datetime
 import httpx
 import json
@@ -22,6 +22,10 @@ class Pipeline:
         self.pipeline_service_url = "http://wordpress-oauth-pipeline.admin-apps.svc.cluster.local:9099"
         self.logger = logging.getLogger(__name__)
         
+        # Pooled client shared by every chat, created on first use in the serving event loop
+        self._client: Optional[httpx.AsyncClient] = None
+        self._client_loop: Optional[asyncio.AbstractEventLoop] = None
+        
         # Pipeline settings
         self.valves = {
             "WORDPRESS_CONNECTION_ID": {
@@ -58,6 +62,11 @@ class Pipeline:
                 "type": "str",
                 "default": "Blog",
                 "description": "Default categories (comma-separated)"
+            },
+            "PROGRESS_TIMEOUT": {
+                "type": "int",
+                "default": 120,
+                "description": "Seconds to stream publishing progress in the chat before leaving the workflow running"
             }
         }
     
@@ -69,17 +78,56 @@ class Pipeline:
     async def on_shutdown(self):
         """Called when the pipeline shuts down"""
         self.logger.info(f"Shutting down {self.name}")
+        if self._client is not None and self._client_loop is asyncio.get_running_loop():
+            await self._client.aclose()
+            self._client = None
+        self._retire_client()
+    
+    def _valve(self, name: str) -> Any:
+        """Configured value of a valve, falling back to its declared default"""
+        valve = self.valves[name]
+        if isinstance(valve, dict):
+            return valve.get("value", valve.get("default"))
+        return valve
+    
+    def _get_client(self) -> httpx.AsyncClient:
+        """The shared pooled client for the automation service"""
+        loop = asyncio.get_running_loop()
+        if self._client is None or self._client_loop is not loop:
+            # Connections belong to the loop that opened them
+            self._retire_client()
+            self._client = httpx.AsyncClient(
+                base_url=self.pipeline_service_url,
+                timeout=httpx.Timeout(30.0, connect=5.0),
+                limits=httpx.Limits(max_connections=100, max_keepalive_connections=20)
+            )
+            self._client_loop = loop
+        return self._client
+    
+    def _retire_client(self) -> None:
+        """Drop the pooled client of another loop, closing it on that loop if it is still running"""
+        client, loop = self._client, self._client_loop
+        self._client = None
+        self._client_loop = None
+        if client is None:
+            return
+        if loop is not None and loop.is_running():
+            asyncio.run_coroutine_threadsafe(client.aclose(), loop)
+        else:
+            # A stopped loop can no longer run aclose(); its sockets are closed when the client is collected
+            self.logger.debug("Discarding HTTP client of a loop that is no longer running")
     
-    def pipe(
+    async def pipe(
         self, 
         user_message: str, 
         model_id: str, 
         messages: List[Dict], 
         body: Dict
-    ) -> Generator[str, None, None]:
+    ) -> AsyncGenerator[str, None]:
         """
         Main pipeline processing function
-        This intercepts the conversation flow to detect WordPress publishing intent
+        This intercepts the conversation flow to detect WordPress publishing intent,
+        streaming the workflow's progress into the chat while it runs
         """
         
         # Check if user wants to publish to WordPress
@@ -100,25 +148,21 @@ class Pipeline:
                 # Process WordPress publishing
                 yield f"🚀 **WordPress Publishing Pipeline Activated**\n\n"
                 yield f"**Title:** {title}\n"
-                yield f"**Content Type:** {self.valves['CONTENT_TYPE']}\n"
-                yield f"**Auto-publish:** {'Yes' if self.valves['AUTO_PUBLISH'] else 'No (Draft)'}\n\n"
+                yield f"**Content Type:** {self._valve('CONTENT_TYPE')}\n"
+                yield f"**Auto-publish:** {'Yes' if self._valve('AUTO_PUBLISH') else 'No (Draft)'}\n\n"
                 
                 # Start publishing workflow
-                workflow_result = asyncio.run(self._publish_to_wordpress(
+                user_auth_header = body.get("authorization", "")
+                workflow_result = await self._publish_to_wordpress(
                     title=title,
                     content=content,
-                    user_auth_header=body.get("authorization", "")
-                ))
+                    user_auth_header=user_auth_header
+                )
                 
                 if workflow_result["success"]:
-                    yield f"✅ **Publishing Workflow Created Successfully!**\n\n"
-                    yield f"**Workflow ID:** `{workflow_result['workflow_id']}`\n"
-                    yield f"**Status:** {workflow_result['status']}\n"
-                    
-                    if workflow_result.get('wordpress_post_id'):
-                        yield f"**WordPress Post ID:** {workflow_result['wordpress_post_id']}\n"
-                    
-                    yield f"\n💡 *You can check the publishing status using the workflow ID.*\n"
+                    yield f"**Workflow ID:** `{workflow_result['workflow_id']}`\n\n"
+                    async for line in self._stream_progress(workflow_result, user_auth_header):
+                        yield line
                 else:
                     yield f"❌ **Publishing Failed**\n\n"
                     yield f"**Error:** {workflow_result.get('error', 'Unknown error')}\n"
@@ -198,37 +242,37 @@ class Pipeline:
             workflow_data = {
                 "title": title,
                 "content": content,
-                "content_type": self.valves["CONTENT_TYPE"],
-                "connection_id": self.valves["WORDPRESS_CONNECTION_ID"],
-                "publish_immediately": self.valves["AUTO_PUBLISH"],
-                "categories": [cat.strip() for cat in self.valves["DEFAULT_CATEGORIES"].split(",")],
-                "tags": [] if self.valves["AUTO_GENERATE_TAGS"] else None
+                # Chat replies are Markdown; the service renders them to HTML
+                "content_format": "markdown",
+                "content_type": self._valve("CONTENT_TYPE"),
+                "connection_id": self._valve("WORDPRESS_CONNECTION_ID"),
+                "publish_immediately": self._valve("AUTO_PUBLISH"),
+                "categories": [cat.strip() for cat in self._valve("DEFAULT_CATEGORIES").split(",")],
+                "tags": [] if self._valve("AUTO_GENERATE_TAGS") else None
             }
             
             # Make request to our pipeline service
-            async with httpx.AsyncClient() as client:
-                response = await client.post(
-                    f"{self.pipeline_service_url}/api/content/workflows",
-                    json=workflow_data,
-                    headers={"Authorization": user_auth_header},
-                    timeout=30.0
-                )
+            response = await self._get_client().post(
+                "/api/content/workflows",
+                json=workflow_data,
+                headers={"Authorization": user_auth_header}
+            )
+            
+            if response.status_code == 200:
+                result = response.json()
+                return {
+                    "success": True,
+                    "workflow_id": result["id"],
+                    "status": result["status"],
+                    "wordpress_post_id": result.get("wordpress_post_id")
+                }
+            else:
+                error_detail = response.json().get("detail", "Unknown error")
+                return {
+                    "success": False,
+                    "error": f"HTTP {response.status_code}: {error_detail}"
+                }
                 
-                if response.status_code == 200:
-                    result = response.json()
-                    return {
-                        "success": True,
-                        "workflow_id": result["id"],
-                        "status": result["status"],
-                        "wordpress_post_id": result.get("wordpress_post_id")
-                    }
-                else:
-                    error_detail = response.json().get("detail", "Unknown error")
-                    return {
-                        "success": False,
-                        "error": f"HTTP {response.status_code}: {error_detail}"
-                    }
-                    
         except httpx.TimeoutException:
             return {
                 "success": False,
@@ -239,35 +283,77 @@ class Pipeline:
                 "success": False,
                 "error": f"Publishing error: {str(e)}"
             }
+
+    async def _stream_progress(self, workflow_result: Dict[str, Any], user_auth_header: str) -> AsyncGenerator[str, None]:
+        """Chat lines for each status change of a new workflow, until it finishes or PROGRESS_TIMEOUT runs out"""
+        workflow_id = workflow_result["workflow_id"]
+        last_line = self._progress_line(workflow_result)
+        if last_line:
+            yield last_line
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + float(self._valve("PROGRESS_TIMEOUT"))
+        events = self._workflow_events(workflow_id, user_auth_header)
+        try:
+            while True:
+                try:
+                    event = await asyncio.wait_for(events.__anext__(), deadline - loop.time())
+                except StopAsyncIteration:
+                    return
+                except asyncio.TimeoutError:
+                    yield f"\n⏱️ *Still in progress; check the status later using the workflow ID.*\n"
+                    return
+                line = self._progress_line(event)
+                # The opening snapshot may repeat the status the workflow was created with
+                if line and line != last_line:
+                    yield line
+                    last_line = line
+                if event.get("final") or event.get("type") == "resync":
+                    return
+        except Exception as e:
+            self.logger.warning(f"Lost progress stream for workflow {workflow_id}: {str(e)}")
+            yield f"\n💡 *Progress updates stopped; check the status using the workflow ID.*\n"
+        finally:
+            await events.aclose()
     
-    def _format_content_for_wordpress(self, content: str) -> str:
-        """Format content for WordPress publishing"""
-        # Convert markdown to HTML if needed
-        import re
-        
-        # Convert markdown headers
-        content = re.sub(r'^### (.+)$', r'<h3>\1</h3>', content, flags=re.MULTILINE)
-        content = re.sub(r'^## (.+)$', r'<h2>\1</h2>', content, flags=re.MULTILINE)
-        content = re.sub(r'^# (.+)$', r'<h1>\1</h1>', content, flags=re.MULTILINE)
-        
-        # Convert markdown bold and italic
-        content = re.sub(r'\*\*(.+?)\*\*', r'<strong>\1</strong>', content)
-        content = re.sub(r'\*(.+?)\*', r'<em>\1</em>', content)
-        
-        # Convert markdown links
-        content = re.sub(r'\[(.+?)\]\((.+?)\)', r'<a href="\2">\1</a>', content)
-        
-        # Convert line breaks to paragraphs
-        paragraphs = content.split('\n\n')
-        formatted_paragraphs = []
-        
-        for para in paragraphs:
-            para = para.strip()
-            if para and not para.startswith('<'):
-                para = f'<p>{para}</p>'
-            formatted_paragraphs.append(para)
-        
-        return '\n\n'.join(formatted_paragraphs)
+    async def _workflow_events(self, workflow_id: str, user_auth_header: str) -> AsyncGenerator[Dict[str, Any], None]:
+        """Events from the service's server-sent event stream for one workflow"""
+        async with self._get_client().stream(
+            "GET",
+            f"/api/content/workflows/{workflow_id}/events",
+            headers={"Authorization": user_auth_header},
+            # The stream idles between status changes apart from keepalives
+            timeout=httpx.Timeout(30.0, connect=5.0, read=None)
+        ) as response:
+            if response.status_code != 200:
+                raise httpx.HTTPStatusError(
+                    f"HTTP {response.status_code}", request=response.request, response=response
+                )
+            async for line in response.aiter_lines():
+                if line.startswith("data:"):
+                    yield json.loads(line[5:])
+    
+    def _progress_line(self, event: Dict[str, Any]) -> Optional[str]:
+        """Chat line describing a workflow event, or None for events worth no line"""
+        if event.get("type") == "resync":
+            return f"\n💡 *Progress updates were interrupted; check the status using the workflow ID.*\n"
+        status = event.get("status")
+        detail = event.get("detail") or event.get("error_message")
+        if status == "pending":
+            if event.get("retry_count"):
+                return f"🔁 **Retrying:** {detail}\n"
+            return f"⏳ **Queued**\n"
+        if status == "processing":
+            return f"⚙️ **Preprocessing** and sending to WordPress...\n"
+        if status == "completed":
+            action = "Published" if self._valve("AUTO_PUBLISH") else "Saved as draft"
+            return f"✅ **{action}!** WordPress Post ID: {event.get('wordpress_post_id')}\n"
+        if status == "failed":
+            return f"⚠️ **Attempt failed:** {detail}\n"
+        if status == "dead_letter":
+            return f"❌ **Publishing Failed**\n\n**Error:** {detail}\n"
+        if status == "cancelled":
+            return f"🚫 **Publishing cancelled**\n"
+        return None
 
 # Create pipeline instance
 pipeline = Pipeline()
\ No newline at end of file
@@ -0,0 +1,253 @@
+"""
+Publish Windows
+Per-connection quiet hours and post rate limits, with ready workflows coalesced into batched writes
+"""
+
+import itertools
+import json
+import logging
+import os
+import time
+from collections import deque
+from dataclasses import asdict, dataclass, replace
+from datetime import datetime, timedelta
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+from metrics import workflow_window_held, workflow_window_decisions
+from workflow_scheduler import WorkflowScheduler
+
+# Default window; WORKFLOW_PUBLISH_WINDOWS may override it per connection ID, e.g.
+# {"wp_abc123": {"quiet_hours": "22:00-07:00", "timezone": "Europe/Berlin", "max_posts": 10, "interval": 3600}}
+WORKFLOW_COALESCE_SECONDS = float(os.getenv("WORKFLOW_COALESCE_SECONDS", "1"))
+WORKFLOW_COALESCE_MAX = int(os.getenv("WORKFLOW_COALESCE_MAX", "25"))
+WORKFLOW_PUBLISH_WINDOWS = os.getenv("WORKFLOW_PUBLISH_WINDOWS", "")
+
+
+def _parse_quiet_hours(quiet_hours: str) -> Tuple[int, int]:
+    """Start and end minute of the day for "HH:MM-HH:MM"; the range may wrap past midnight"""
+    try:
+        start, end = (datetime.strptime(part.strip(), "%H:%M") for part in quiet_hours.split("-"))
+    except ValueError:
+        raise ValueError(f"quiet_hours must look like 22:00-07:00, got {quiet_hours!r}")
+    return start.hour * 60 + start.minute, end.hour * 60 + end.minute
+
+
+@dataclass(frozen=True)
+class PublishWindow:
+    """When and how fast workflows may be released to one WordPress site
+
+    quiet_hours ("HH:MM-HH:MM" in timezone) holds every release until the
+    quiet period ends. max_posts (0 for no limit) caps workflows released per
+    sliding interval of seconds. Workflows that become ready within
+    coalesce_seconds of each other are released together, up to max_batch,
+    so new posts reach the site as one batch write.
+    """
+    quiet_hours: Optional[str] = None
+    timezone: str = "UTC"
+    max_posts: int = 0
+    interval: float = 3600
+    coalesce_seconds: float = WORKFLOW_COALESCE_SECONDS
+    max_batch: int = WORKFLOW_COALESCE_MAX
+
+    def __post_init__(self):
+        if self.quiet_hours:
+            _parse_quiet_hours(self.quiet_hours)
+        try:
+            ZoneInfo(self.timezone)
+        except (ZoneInfoNotFoundError, ValueError):
+            raise ValueError(f"Unknown timezone {self.timezone!r}")
+        if self.max_posts < 0 or self.interval <= 0 or self.coalesce_seconds < 0 or self.max_batch < 1:
+            raise ValueError("max_posts and coalesce_seconds must not be negative, interval and max_batch must be positive")
+
+    def quiet_until(self, now: float) -> Optional[float]:
+        """End of the quiet period containing now (epoch seconds), or None outside quiet hours"""
+        if not self.quiet_hours:
+            return None
+        start, end = _parse_quiet_hours(self.quiet_hours)
+        if start == end:
+            return None
+        local = datetime.fromtimestamp(now, ZoneInfo(self.timezone))
+        minute = local.hour * 60 + local.minute
+        if start < end:
+            if not start <= minute < end:
+                return None
+            days = 0
+        elif minute >= start:
+            days = 1
+        elif minute < end:
+            days = 0
+        else:
+            return None
+        # Wall-clock arithmetic, so the end is right across DST changes
+        ends = (local + timedelta(days=days)).replace(hour=end // 60, minute=end % 60, second=0, microsecond=0)
+        return ends.timestamp()
+
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+
+class PublishWindows:
+    """Default publish window plus per-connection overrides
+
+    Operator overrides come from WORKFLOW_PUBLISH_WINDOWS; a site's owner can
+    layer their own settings on top with set().
+    """
+
+    def __init__(self, default: Optional[PublishWindow] = None, overrides: Optional[Dict[str, PublishWindow]] = None):
+        self.default = default or PublishWindow()
+        self.overrides = overrides or {}
+        self.custom: Dict[str, PublishWindow] = {}
+
+    @classmethod
+    def from_json(cls, config: str) -> "PublishWindows":
+        """Parse {"default": {...}, "<connection_id>": {...}}; overrides inherit unspecified fields from the default"""
+        windows = cls()
+        if not config:
+            return windows
+        try:
+            raw = json.loads(config)
+            windows.default = replace(windows.default, **raw.pop("default", {}))
+            windows.overrides = {
+                connection_id: replace(windows.default, **values)
+                for connection_id, values in raw.items()
+            }
+        except (ValueError, TypeError, AttributeError) as e:
+            logging.getLogger(__name__).error(f"Ignoring invalid WORKFLOW_PUBLISH_WINDOWS: {str(e)}")
+        return windows
+
+    def for_connection(self, connection_id: str) -> PublishWindow:
+        return self.custom.get(connection_id) or self.overrides.get(connection_id, self.default)
+
+    def set(self, connection_id: str, values: Optional[Dict[str, Any]]) -> PublishWindow:
+        """Apply a site owner's settings over the operator's window for the connection, or clear them with None
+
+        Raises ValueError (or TypeError for unknown fields) on invalid settings.
+        """
+        if values is None:
+            self.custom.pop(connection_id, None)
+        else:
+            self.custom[connection_id] = replace(self.overrides.get(connection_id, self.default), **values)
+        return self.for_connection(connection_id)
+
+
+class PublishPacer:
+    """Holds ready workflows per connection and releases them in groups inside each site's publish window
+
+    A workflow that becomes ready for a site with no release in the last
+    coalesce_seconds goes straight out. Otherwise it is held until
+    coalesce_seconds after that release, and everything arriving meanwhile
+    joins the same group, which goes early once it reaches max_batch. A
+    single publish is therefore never delayed, while a burst reaches the
+    site as a few batch writes. A release during
+    quiet hours, or once max_posts were released in the last interval, is
+    re-armed for when the window opens again. Releases run on their own
+    scheduler keyed by connection ID, so held workflows cost no timers.
+    """
+
+    def __init__(self, windows: PublishWindows, dispatch: Callable[[str, List[str]], None]):
+        self.windows = windows
+        # dispatch(connection_id, workflow_ids) hands a released group to the executor
+        self.dispatch = dispatch
+        self.logger = logging.getLogger(__name__)
+        # Connection ID -> held workflow IDs in arrival order
+        self._held: Dict[str, Dict[str, None]] = {}
+        # Connection ID -> release times within the connection's rate interval
+        self._released: Dict[str, Deque[float]] = {}
+        # Connection ID -> time of its last release, for coalescing
+        self._last_release: Dict[str, float] = {}
+        # Connections whose armed release only waits out the coalescing delay
+        self._coalescing: set = set()
+        self._timer = WorkflowScheduler(self.release, gauge=None)
+
+        workflow_window_held.set_function(lambda: self.held)
+
+    @property
+    def held(self) -> int:
+        return sum(len(held) for held in self._held.values())
+
+    def __contains__(self, workflow_id: str) -> bool:
+        return any(workflow_id in held for held in self._held.values())
+
+    def start(self) -> None:
+        self._timer.start()
+
+    async def stop(self) -> None:
+        """Stop releasing; held workflows stay pending and are re-armed on next start"""
+        await self._timer.stop()
+
+    def submit(self, connection_id: str, workflow_ids: List[str]) -> None:
+        """Hold ready workflows for release to their site"""
+        held = self._held.setdefault(connection_id, {})
+        for workflow_id in workflow_ids:
+            held[workflow_id] = None
+        if connection_id in self._timer:
+            if connection_id in self._coalescing and len(held) >= self.windows.for_connection(connection_id).max_batch:
+                self._timer.cancel(connection_id)
+                self.release(connection_id)
+            return
+        window = self.windows.for_connection(connection_id)
+        due = self._last_release.get(connection_id, 0) + window.coalesce_seconds
+        if due > time.time() and len(held) < window.max_batch:
+            self._arm(connection_id, due, coalescing=True)
+        else:
+            self.release(connection_id)
+
+    def discard(self, workflow_id: str) -> bool:
+        """Stop holding a workflow, e.g. because it was cancelled or rescheduled"""
+        for connection_id, held in self._held.items():
+            if workflow_id in held:
+                del held[workflow_id]
+                if not held:
+                    del self._held[connection_id]
+                    self._coalescing.discard(connection_id)
+                    self._timer.cancel(connection_id)
+                return True
+        return False
+
+    def refresh(self, connection_id: str) -> None:
+        """Re-evaluate a connection's held workflows after its window changed"""
+        self._timer.cancel(connection_id)
+        if connection_id in self._held:
+            self.release(connection_id)
+
+    def release(self, connection_id: str) -> None:
+        """Release as many held workflows as the connection's window allows, re-arming for the rest"""
+        self._coalescing.discard(connection_id)
+        window = self.windows.for_connection(connection_id)
+        held = self._held.get(connection_id)
+        while held:
+            now = time.time()
+            opens = window.quiet_until(now)
+            if opens is not None:
+                self._arm(connection_id, opens)
+                workflow_window_decisions.labels("quiet_hours").inc()
+                return
+            count = min(len(held), window.max_batch)
+            if window.max_posts:
+                released = self._released.setdefault(connection_id, deque())
+                while released and released[0] <= now - window.interval:
+                    released.popleft()
+                if len(released) >= window.max_posts:
+                    self._arm(connection_id, released[0] + window.interval)
+                    workflow_window_decisions.labels("rate_limited").inc()
+                    return
+                count = min(count, window.max_posts - len(released))
+                released.extend([now] * count)
+            group = list(itertools.islice(held, count))
+            for workflow_id in group:
+                del held[workflow_id]
+            self._last_release[connection_id] = now
+            workflow_window_decisions.labels("released").inc()
+            try:
+                self.dispatch(connection_id, group)
+            except Exception as e:
+                self.logger.error(f"Releasing workflows for connection {connection_id} failed: {str(e)}")
+        self._held.pop(connection_id, None)
+        if not window.max_posts:
+            self._released.pop(connection_id, None)
+
+    def _arm(self, connection_id: str, due: float, coalescing: bool = False) -> None:
+        if coalescing:
+            self._coalescing.add(connection_id)
+        self._timer.schedule(connection_id, datetime.utcfromtimestamp(due))
@@ -0,0 +1,198 @@
+"""
+Per-Request Timing Breakdown
+Records named spans for each HTTP request, returns them as a Server-Timing header
+and samples slow requests to a rotating log
+"""
+
+import cProfile
+import io
+import json
+import logging
+import os
+import pstats
+import random
+import time
+from contextvars import ContextVar
+from datetime import datetime
+from logging.handlers import RotatingFileHandler
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from fastapi.responses import ORJSONResponse
+
+# Requests slower than this are written to the slow request log
+SLOW_REQUEST_THRESHOLD_MS = float(os.getenv("SLOW_REQUEST_THRESHOLD_MS", "1000"))
+SLOW_REQUEST_LOG = os.getenv("SLOW_REQUEST_LOG", "/app/data/slow_requests.log")
+SLOW_REQUEST_LOG_MAX_BYTES = int(os.getenv("SLOW_REQUEST_LOG_MAX_BYTES", str(5 * 1024 * 1024)))
+SLOW_REQUEST_LOG_BACKUPS = int(os.getenv("SLOW_REQUEST_LOG_BACKUPS", "3"))
+# Fraction of requests run under cProfile; the profile is kept only if the request turns out slow
+SLOW_REQUEST_PROFILE_RATE = float(os.getenv("SLOW_REQUEST_PROFILE_RATE", "0"))
+
+# Long-lived by design, so these are timed up to the response start rather than to the last byte
+_STREAMING_CONTENT_TYPES = (b"text/event-stream", b"application/x-ndjson")
+
+_current: ContextVar[Optional["RequestTimings"]] = ContextVar("request_timings", default=None)
+
+
+class RequestTimings:
+    """Accumulated span durations for one request"""
+
+    __slots__ = ("method", "path", "started", "durations", "counts", "finished")
+
+    def __init__(self, method: str, path: str):
+        self.method = method
+        self.path = path
+        self.started = time.perf_counter()
+        self.durations: Dict[str, float] = {}
+        self.counts: Dict[str, int] = {}
+        self.finished = False
+
+    def add(self, name: str, seconds: float) -> None:
+        # Background tasks spawned by the request inherit its context; ignore
+        # their spans once the response has gone out
+        if self.finished:
+            return
+        self.durations[name] = self.durations.get(name, 0.0) + seconds
+        self.counts[name] = self.counts.get(name, 0) + 1
+
+    def elapsed_ms(self) -> float:
+        return (time.perf_counter() - self.started) * 1000
+
+    def server_timing_header(self, total_ms: float) -> str:
+        """Format spans as a Server-Timing header value"""
+        parts = [f"{name};dur={seconds * 1000:.2f}" for name, seconds in self.durations.items()]
+        parts.append(f"total;dur={total_ms:.2f}")
+        return ", ".join(parts)
+
+    def breakdown(self, total_ms: float, status_code: int) -> Dict[str, object]:
+        return {
+            "timestamp": datetime.utcnow().isoformat(),
+            "method": self.method,
+            "path": self.path,
+            "status": status_code,
+            "total_ms": round(total_ms, 3),
+            "spans": {
+                name: {"ms": round(seconds * 1000, 3), "count": self.counts[name]}
+                for name, seconds in self.durations.items()
+            }
+        }
+
+
+class span:
+    """Time a block and attribute it to the current request
+
+    Usable as a context manager around sync or async code; a no-op outside
+    of a request.
+    """
+
+    __slots__ = ("name", "timings", "start")
+
+    def __init__(self, name: str):
+        self.name = name
+
+    def __enter__(self):
+        self.timings = _current.get()
+        if self.timings is not None:
+            self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if self.timings is not None:
+            self.timings.add(self.name, time.perf_counter() - self.start)
+        return False
+
+
+class TimedORJSONResponse(ORJSONResponse):
+    """ORJSONResponse whose encoding time is reported as the "encode" span"""
+
+    def render(self, content) -> bytes:
+        with span("encode"):
+            return super().render(content)
+
+
+def _slow_request_logger() -> logging.Logger:
+    slow_logger = logging.getLogger("slow_requests")
+    if not slow_logger.handlers:
+        try:
+            Path(SLOW_REQUEST_LOG).parent.mkdir(parents=True, exist_ok=True)
+            handler = RotatingFileHandler(
+                SLOW_REQUEST_LOG,
+                maxBytes=SLOW_REQUEST_LOG_MAX_BYTES,
+                backupCount=SLOW_REQUEST_LOG_BACKUPS
+            )
+            handler.setFormatter(logging.Formatter("%(message)s"))
+            slow_logger.addHandler(handler)
+            slow_logger.propagate = False
+        except OSError as e:
+            logging.getLogger(__name__).warning(f"Slow request log unavailable: {str(e)}")
+        slow_logger.setLevel(logging.INFO)
+    return slow_logger
+
+
+def _profile_summary(profiler: cProfile.Profile, limit: int = 30) -> str:
+    stream = io.StringIO()
+    pstats.Stats(profiler, stream=stream).sort_stats("cumulative").print_stats(limit)
+    return stream.getvalue()
+
+
+class ServerTimingMiddleware:
+    """ASGI middleware adding a Server-Timing header and logging slow requests"""
+
+    def __init__(self, app, threshold_ms: float = SLOW_REQUEST_THRESHOLD_MS, profile_rate: float = SLOW_REQUEST_PROFILE_RATE):
+        self.app = app
+        self.threshold_ms = threshold_ms
+        self.profile_rate = profile_rate
+        self.slow_logger = _slow_request_logger()
+        self._profiling = False
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        timings = RequestTimings(scope["method"], scope["path"])
+        token = _current.set(timings)
+        status_holder: List[int] = [500]
+        # Set at the response start of a streaming response
+        stream_started_ms: List[Optional[float]] = [None]
+
+        # cProfile sees every coroutine on the loop thread, so only one
+        # request is profiled at a time and concurrent work shows up in it too
+        profiler = None
+        if self.profile_rate and not self._profiling and random.random() < self.profile_rate:
+            profiler = cProfile.Profile()
+            self._profiling = True
+            profiler.enable()
+
+        def stop_profiler():
+            if profiler is not None and self._profiling:
+                profiler.disable()
+                self._profiling = False
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status_holder[0] = message["status"]
+                headers = list(message.get("headers", []))
+                elapsed_ms = timings.elapsed_ms()
+                content_type = dict(headers).get(b"content-type", b"")
+                if content_type.startswith(_STREAMING_CONTENT_TYPES):
+                    stream_started_ms[0] = elapsed_ms
+                    # Free the profiler rather than holding it for the life of the stream
+                    stop_profiler()
+                headers.append((b"server-timing", timings.server_timing_header(elapsed_ms).encode("latin-1")))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            stop_profiler()
+            timings.finished = True
+            _current.reset(token)
+
+            total_ms = stream_started_ms[0] if stream_started_ms[0] is not None else timings.elapsed_ms()
+            if total_ms >= self.threshold_ms:
+                record = timings.breakdown(total_ms, status_holder[0])
+                if profiler is not None:
+                    record["profile"] = _profile_summary(profiler)
+                self.slow_logger.info(json.dumps(record))
@@ -0,0 +1,136 @@
+"""
+Workflow Retry Policy
+Error classification and jittered exponential backoff, configurable per WordPress connection
+"""
+
+import asyncio
+import json
+import logging
+import os
+import random
+from dataclasses import dataclass, replace
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Any, Dict, Optional
+
+import httpx
+
+# Default policy; WORKFLOW_RETRY_POLICIES may override it per connection ID, e.g.
+# {"wp_abc123": {"max_retries": 6, "max_delay": 1800}}
+WORKFLOW_MAX_RETRIES = int(os.getenv("WORKFLOW_MAX_RETRIES", "3"))
+WORKFLOW_RETRY_BASE_DELAY = float(os.getenv("WORKFLOW_RETRY_BASE_DELAY", "30"))
+WORKFLOW_RETRY_MAX_DELAY = float(os.getenv("WORKFLOW_RETRY_MAX_DELAY", "300"))
+WORKFLOW_RETRY_POLICIES = os.getenv("WORKFLOW_RETRY_POLICIES", "")
+
+# Client errors that mean "try again later" rather than "this request is wrong"
+RETRYABLE_CLIENT_STATUSES = frozenset({408, 425, 429})
+
+
+class PublishError(Exception):
+    """A failed upstream write, carrying what is needed to decide whether to retry it"""
+
+    def __init__(self, message: str, status_code: Optional[int] = None, retry_after: Optional[float] = None, retryable: Optional[bool] = None):
+        super().__init__(message)
+        self.status_code = status_code
+        self.retry_after = retry_after
+        self.retryable = is_retryable_status(status_code) if retryable is None else retryable
+
+    @classmethod
+    def from_result(cls, result: Dict[str, Any]) -> "PublishError":
+        """Build from a failed WordPress client result dict
+
+        A failure with no upstream status is only retried when the request
+        never got a response (timeouts, connection errors); local failures
+        such as missing credentials are permanent.
+        """
+        status_code = result.get('status_code')
+        return cls(
+            f"WordPress publishing failed: {result['message']}",
+            status_code=status_code,
+            retry_after=parse_retry_after(result.get('retry_after')),
+            retryable=bool(result.get('transport_error')) if status_code is None else None
+        )
+
+
+def is_retryable_status(status_code: Optional[int]) -> bool:
+    """5xx, throttling and no response at all (timeouts, connection errors) are worth retrying; other 4xx are not"""
+    if status_code is None or status_code >= 500:
+        return True
+    return status_code in RETRYABLE_CLIENT_STATUSES
+
+
+def is_retryable(error: Exception) -> bool:
+    """Classify a failed attempt; data errors are permanent, other unknown errors are retried as before"""
+    if isinstance(error, PublishError):
+        return error.retryable
+    if isinstance(error, httpx.HTTPStatusError):
+        return is_retryable_status(error.response.status_code)
+    if isinstance(error, (httpx.TransportError, asyncio.TimeoutError)):
+        return True
+    return not isinstance(error, (ValueError, KeyError, TypeError))
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Seconds to wait from a Retry-After header, given as seconds or an HTTP date"""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=timezone.utc)
+    return max(0.0, (when - datetime.now(timezone.utc)).total_seconds())
+
+
+@dataclass(frozen=True)
+class RetryPolicy:
+    """Exponential backoff with full jitter
+
+    The n-th retry waits a uniformly random time in [0, min(max_delay,
+    base_delay * 2^(n-1))], so workflows that failed together against a site
+    spread out instead of retrying in lockstep once it recovers. A server's
+    Retry-After is honoured as a lower bound.
+    """
+    max_retries: int = WORKFLOW_MAX_RETRIES
+    base_delay: float = WORKFLOW_RETRY_BASE_DELAY
+    max_delay: float = WORKFLOW_RETRY_MAX_DELAY
+
+    def delay(self, retry_count: int, retry_after: Optional[float] = None, rng: random.Random = random) -> float:
+        ceiling = min(self.max_delay, self.base_delay * (2 ** max(0, retry_count - 1)))
+        delay = rng.uniform(0, ceiling)
+        if retry_after is not None:
+            delay = max(delay, retry_after)
+        return delay
+
+
+class RetryPolicies:
+    """Default retry policy plus per-connection overrides"""
+
+    def __init__(self, default: Optional[RetryPolicy] = None, overrides: Optional[Dict[str, RetryPolicy]] = None):
+        self.default = default or RetryPolicy()
+        self.overrides = overrides or {}
+
+    @classmethod
+    def from_json(cls, config: str) -> "RetryPolicies":
+        """Parse {"default": {...}, "<connection_id>": {...}}; overrides inherit unspecified fields from the default"""
+        policies = cls()
+        if not config:
+            return policies
+        try:
+            raw = json.loads(config)
+            policies.default = replace(policies.default, **raw.pop("default", {}))
+            policies.overrides = {
+                connection_id: replace(policies.default, **values)
+                for connection_id, values in raw.items()
+            }
+        except (ValueError, TypeError, AttributeError) as e:
+            logging.getLogger(__name__).error(f"Ignoring invalid WORKFLOW_RETRY_POLICIES: {str(e)}")
+        return policies
+
+    def for_connection(self, connection_id: str) -> RetryPolicy:
+        return self.overrides.get(connection_id, self.default)
@@ -0,0 +1,180 @@
+"""
+Tag Suggestion Engine
+Per-site TF-IDF scoring of words and bigrams against an incremental document-frequency index
+"""
+
+import asyncio
+import json
+import logging
+import os
+import re
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from content_preprocessor import STOP_WORDS, ContentAnalysis
+
+# Terms beyond this many per site are not tracked (they score as unseen)
+TAG_INDEX_MAX_TERMS = int(os.getenv("TAG_INDEX_MAX_TERMS", "500000"))
+# A bigram must occur this often in a post to be suggested
+TAG_MIN_BIGRAM_COUNT = int(os.getenv("TAG_MIN_BIGRAM_COUNT", "2"))
+
+_SAFE_NAME_RE = re.compile(r'[^A-Za-z0-9_.-]')
+
+
+def _is_candidate(word: str) -> bool:
+    return len(word) > 3 and word not in STOP_WORDS
+
+
+def candidate_terms(analysis: ContentAnalysis) -> Dict[str, int]:
+    """Term counts for a post: qualifying words, plus repeated bigrams of qualifying words"""
+    terms = {word: count for word, count in analysis.word_counts.items() if _is_candidate(word)}
+    for (first, second), count in analysis.bigram_counts.items():
+        if count >= TAG_MIN_BIGRAM_COUNT and first != second and _is_candidate(first) and _is_candidate(second):
+            terms[f"{first} {second}"] = count
+    return terms
+
+
+class SiteTermIndex:
+    """Document frequencies for one site
+
+    Terms map to dense integer IDs so frequencies live in one NumPy array;
+    lookups for a post are a single fancy-indexing gather, independent of how
+    many documents the index has seen.
+    """
+
+    def __init__(self):
+        self.vocabulary: Dict[str, int] = {}
+        self.document_frequency = np.zeros(1024, dtype=np.int32)
+        self.documents = 0
+
+    def _ids(self, terms: List[str], grow: bool) -> np.ndarray:
+        vocabulary = self.vocabulary
+        if grow:
+            for term in terms:
+                if term not in vocabulary and len(vocabulary) < TAG_INDEX_MAX_TERMS:
+                    vocabulary[term] = len(vocabulary)
+            if len(vocabulary) > len(self.document_frequency):
+                grown = np.zeros(max(len(vocabulary), 2 * len(self.document_frequency)), dtype=np.int32)
+                grown[:len(self.document_frequency)] = self.document_frequency
+                self.document_frequency = grown
+        return np.fromiter((vocabulary.get(term, -1) for term in terms), dtype=np.int64, count=len(terms))
+
+    def add(self, terms: List[str]) -> None:
+        """Count a published document's distinct terms"""
+        ids = self._ids(terms, grow=True)
+        # Terms are distinct, so a plain scatter-add is safe
+        self.document_frequency[ids[ids >= 0]] += 1
+        self.documents += 1
+
+    def frequencies(self, terms: List[str]) -> np.ndarray:
+        """Document frequency of each term (0 for unseen terms)"""
+        ids = self._ids(terms, grow=False)
+        return np.where(ids >= 0, self.document_frequency[np.maximum(ids, 0)], 0)
+
+
+class TagEngine:
+    """Suggests tags per site by TF-IDF and learns from every published post"""
+
+    def __init__(self, directory: Optional[str] = None):
+        self.directory = Path(directory) if directory else None
+        self.logger = logging.getLogger(__name__)
+        self.sites: Dict[str, SiteTermIndex] = {}
+
+    def suggest(self, site: str, analysis: ContentAnalysis, max_tags: int = 8) -> List[str]:
+        """Top-scoring terms of a post, scored against the site's published corpus"""
+        term_counts = candidate_terms(analysis)
+        if not term_counts:
+            return []
+        terms = list(term_counts)
+        tf = np.fromiter(term_counts.values(), dtype=np.float64, count=len(terms))
+
+        index = self.sites.get(site)
+        documents = index.documents if index else 0
+        df = index.frequencies(terms) if index else np.zeros(len(terms))
+        # Sublinear tf and smoothed idf; with an empty index this is plain frequency ranking
+        scores = (1.0 + np.log(tf)) * (np.log((1.0 + documents) / (1.0 + df)) + 1.0)
+
+        shortlist = min(len(terms), max_tags * 3)
+        top = np.argpartition(-scores, shortlist - 1)[:shortlist]
+        top = top[np.argsort(-scores[top], kind="stable")]
+
+        # A bigram and its own words are near-duplicates; keep whichever ranks first
+        tags: List[str] = []
+        covered = set()
+        for position in top:
+            term = terms[position]
+            parts = term.split(" ")
+            if term in covered or (len(parts) == 2 and all(part in covered for part in parts)):
+                continue
+            tags.append(term.title())
+            covered.add(term)
+            covered.update(parts)
+            if len(tags) == max_tags:
+                break
+        return tags
+
+    def record(self, site: str, analysis: ContentAnalysis) -> None:
+        """Add a published post to the site's document-frequency index"""
+        index = self.sites.get(site)
+        if index is None:
+            index = self.sites[site] = SiteTermIndex()
+        index.add(list(candidate_terms(analysis)))
+
+    def _path(self, site: str) -> Path:
+        return self.directory / f"{_SAFE_NAME_RE.sub('_', site)}.npz"
+
+    async def load(self) -> None:
+        """Load saved site indexes"""
+        if self.directory is None or not self.directory.exists():
+            return
+
+        def _load() -> Dict[str, SiteTermIndex]:
+            # Left behind by a save that never reached its rename
+            for path in self.directory.glob("*.npz.tmp"):
+                path.unlink(missing_ok=True)
+            sites = {}
+            for path in self.directory.glob("*.npz"):
+                try:
+                    with np.load(path) as data:
+                        index = SiteTermIndex()
+                        meta = json.loads(str(data["meta"]))
+                        index.vocabulary = {term: i for i, term in enumerate(meta["terms"])}
+                        index.documents = meta["documents"]
+                        index.document_frequency = data["document_frequency"].copy()
+                        sites[meta["site"]] = index
+                except Exception as e:
+                    self.logger.error(f"Skipping unreadable tag index {path.name}: {str(e)}")
+            return sites
+
+        try:
+            self.sites.update(await asyncio.to_thread(_load))
+            self.logger.info(f"Loaded tag indexes for {len(self.sites)} sites")
+        except Exception as e:
+            self.logger.error(f"Failed to load tag indexes: {str(e)}")
+
+    async def save(self) -> None:
+        """Write every site index to disk"""
+        if self.directory is None or not self.sites:
+            return
+        snapshot: List[Tuple[str, List[str], int, np.ndarray]] = [
+            (site, list(index.vocabulary), index.documents, index.document_frequency[:len(index.vocabulary)].copy())
+            for site, index in self.sites.items()
+        ]
+
+        def _save() -> None:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            for site, terms, documents, document_frequency in snapshot:
+                path = self._path(site)
+                # Outside load()'s *.npz glob; written through a file object so numpy keeps the name
+                temporary = path.with_suffix(".npz.tmp")
+                meta = json.dumps({"site": site, "terms": terms, "documents": documents})
+                with open(temporary, "wb") as f:
+                    np.savez_compressed(f, meta=np.array(meta), document_frequency=document_frequency)
+                temporary.replace(path)
+
+        try:
+            await asyncio.to_thread(_save)
+        except Exception as e:
+            self.logger.error(f"Failed to save tag indexes: {str(e)}")
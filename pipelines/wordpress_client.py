@@ -5,21 +5,54 @@ Handles WordPress API operations using stored Application Passwords
 
 import asyncio
 import logging
-from typing import Optional, Dict, Any, List
+import os
+import time
+from typing import Optional, Dict, Any, List, AsyncIterator, Tuple
 from datetime import datetime
 import httpx
 import base64
-from urllib.parse import urljoin
+from urllib.parse import urljoin, urlparse
+
+from metrics import observe_upstream, record_cache_lookup
+from request_timing import span
 
 # Import will be resolved at runtime to avoid circular import
 
+# Bulk connection testing
+CONNECTION_TEST_CONCURRENCY = int(os.getenv("CONNECTION_TEST_CONCURRENCY", "8"))
+CONNECTION_TEST_CACHE_TTL = float(os.getenv("CONNECTION_TEST_CACHE_TTL", "30"))
+
+# WordPress rejects batch requests with more than 25 sub-requests by default
+WORDPRESS_BATCH_MAX_REQUESTS = int(os.getenv("WORDPRESS_BATCH_MAX_REQUESTS", "25"))
+
 
 class WordPressAPIClient:
     """WordPress REST API Client with Application Password authentication"""
     
+    # Upstream headers relayed to the client by the streaming proxy
+    PASSTHROUGH_HEADERS = ('x-wp-total', 'x-wp-totalpages', 'link', 'last-modified', 'etag')
+    
     def __init__(self):
         self.logger = logging.getLogger(__name__)
         self.timeout = 30
+        self._http_client: Optional[httpx.AsyncClient] = None
+        
+        # Recent connection test results keyed by (user_id, connection_id),
+        # plus tests currently in flight so concurrent pollers share one call
+        self._test_cache: Dict[Tuple[str, str], Tuple[float, Dict[str, Any]]] = {}
+        self._test_inflight: Dict[Tuple[str, str], asyncio.Task] = {}
+    
+    def _get_http_client(self) -> httpx.AsyncClient:
+        """Get the shared pooled HTTP client, creating it on first use"""
+        if self._http_client is None or self._http_client.is_closed:
+            self._http_client = httpx.AsyncClient(timeout=self.timeout)
+        return self._http_client
+    
+    async def close(self) -> None:
+        """Close the shared HTTP client"""
+        if self._http_client is not None:
+            await self._http_client.aclose()
+            self._http_client = None
     
     async def get_credentials(self, user_id: str, connection_id: str) -> Optional[Dict[str, Any]]:
         """Get WordPress credentials for a user connection"""
@@ -27,27 +60,59 @@ class WordPressAPIClient:
         from wordpress_oauth import pipeline as oauth_pipeline
         return await oauth_pipeline.get_wordpress_credentials(user_id, connection_id)
     
+    async def _build_request_headers(self, credentials: Dict[str, Any]) -> Dict[str, str]:
+        """Build authenticated request headers"""
+        # Create Basic Auth header with Application Password
+        # WordPress expects: username:application_password
+        # We'll extract username from the site or use a default approach
+        username = await self._get_wordpress_username(credentials)
+        auth_string = f"{username}:{credentials['application_password']}"
+        auth_bytes = auth_string.encode('ascii')
+        auth_header = base64.b64encode(auth_bytes).decode('ascii')
+        
+        return {
+            'Authorization': f'Basic {auth_header}',
+            'Content-Type': 'application/json',
+            'User-Agent': 'OpenWebUI-WordPress-Connector/1.0'
+        }
+    
+    def _error_result(self, response: httpx.Response) -> Dict[str, Any]:
+        """Build a failure result from an upstream error response"""
+        error_data = {}
+        try:
+            error_data = response.json()
+        except:
+            error_data = {'message': response.text}
+        
+        return {
+            'success': False,
+            'error': error_data,
+            'status_code': response.status_code,
+            'retry_after': response.headers.get('retry-after'),
+            'message': error_data.get('message', f'HTTP {response.status_code}')
+        }
+    
+    def _passthrough_headers(self, response: httpx.Response) -> Dict[str, str]:
+        """Pick the upstream pagination/caching headers worth relaying"""
+        return {
+            name: response.headers[name]
+            for name in self.PASSTHROUGH_HEADERS
+            if name in response.headers
+        }
+    
     async def make_request(self, method: str, endpoint: str, credentials: Dict[str, Any], data: Optional[Dict] = None) -> Dict[str, Any]:
         """Make authenticated request to WordPress REST API"""
+        target = urlparse(credentials.get('site_url', '')).netloc
+        start = time.perf_counter()
+        status_code = None
+        
         try:
             site_url = credentials['site_url'].rstrip('/')
             api_url = urljoin(site_url, f'/wp-json/wp/v2/{endpoint.lstrip("/")}')
+            headers = await self._build_request_headers(credentials)
             
-            # Create Basic Auth header with Application Password
-            # WordPress expects: username:application_password
-            # We'll extract username from the site or use a default approach
-            username = await self._get_wordpress_username(credentials)
-            auth_string = f"{username}:{credentials['application_password']}"
-            auth_bytes = auth_string.encode('ascii')
-            auth_header = base64.b64encode(auth_bytes).decode('ascii')
-            
-            headers = {
-                'Authorization': f'Basic {auth_header}',
-                'Content-Type': 'application/json',
-                'User-Agent': 'OpenWebUI-WordPress-Connector/1.0'
-            }
-            
-            async with httpx.AsyncClient(timeout=self.timeout) as client:
+            client = self._get_http_client()
+            with span("upstream"):
                 if method.upper() == 'GET':
                     response = await client.get(api_url, headers=headers, params=data)
                 elif method.upper() == 'POST':
@@ -58,32 +123,76 @@ class WordPressAPIClient:
                     response = await client.delete(api_url, headers=headers)
                 else:
                     raise ValueError(f"Unsupported HTTP method: {method}")
-                
-                if response.status_code in [200, 201]:
-                    return {
-                        'success': True,
-                        'data': response.json(),
-                        'status_code': response.status_code
-                    }
-                else:
-                    error_data = {}
-                    try:
-                        error_data = response.json()
-                    except:
-                        error_data = {'message': response.text}
-                    
-                    return {
-                        'success': False,
-                        'error': error_data,
-                        'status_code': response.status_code,
-                        'message': error_data.get('message', f'HTTP {response.status_code}')
-                    }
+            status_code = response.status_code
+            observe_upstream(target, status_code, time.perf_counter() - start)
+            
+            if response.status_code in [200, 201]:
+                return {
+                    'success': True,
+                    'status_code': response.status_code,
+                    'data': response.json(),
+                    'headers': self._passthrough_headers(response)
+                }
+            else:
+                return self._error_result(response)
                     
         except Exception as e:
+            if status_code is None:
+                observe_upstream(target, None, time.perf_counter() - start)
             self.logger.error(f"WordPress API request failed: {str(e)}")
             return {
                 'success': False,
                 'error': str(e),
+                'transport_error': isinstance(e, httpx.TransportError),
+                'message': f'Request failed: {str(e)}'
+            }
+    
+    async def stream_request(self, endpoint: str, credentials: Dict[str, Any], params: Optional[Dict] = None) -> Dict[str, Any]:
+        """Open an authenticated GET whose body is streamed rather than buffered
+
+        On success the result carries 'stream' (an async byte iterator),
+        'headers' (the pagination headers to relay) and 'close' (a coroutine
+        function releasing the upstream connection, which the caller must run
+        once the body has been forwarded). Error responses are read in full and
+        returned like make_request failures.
+        """
+        target = urlparse(credentials.get('site_url', '')).netloc
+        start = time.perf_counter()
+        status_code = None
+        
+        try:
+            site_url = credentials['site_url'].rstrip('/')
+            api_url = urljoin(site_url, f'/wp-json/wp/v2/{endpoint.lstrip("/")}')
+            headers = await self._build_request_headers(credentials)
+            
+            client = self._get_http_client()
+            with span("upstream"):
+                request = client.build_request('GET', api_url, headers=headers, params=params)
+                response = await client.send(request, stream=True)
+            status_code = response.status_code
+            observe_upstream(target, status_code, time.perf_counter() - start)
+            
+            if response.status_code != 200:
+                await response.aread()
+                await response.aclose()
+                return self._error_result(response)
+            
+            return {
+                'success': True,
+                'status_code': response.status_code,
+                'headers': self._passthrough_headers(response),
+                'stream': response.aiter_bytes(),
+                'close': response.aclose
+            }
+            
+        except Exception as e:
+            if status_code is None:
+                observe_upstream(target, None, time.perf_counter() - start)
+            self.logger.error(f"WordPress API stream request failed: {str(e)}")
+            return {
+                'success': False,
+                'error': str(e),
+                'transport_error': isinstance(e, httpx.TransportError),
                 'message': f'Request failed: {str(e)}'
             }
     
@@ -102,8 +211,11 @@ class WordPressAPIClient:
             self.logger.warning(f"Could not determine WordPress username: {str(e)}")
             return 'admin'
     
-    async def get_posts(self, user_id: str, connection_id: str, params: Optional[Dict] = None) -> Dict[str, Any]:
-        """Get WordPress posts"""
+    async def get_posts(self, user_id: str, connection_id: str, params: Optional[Dict] = None, stream: bool = False) -> Dict[str, Any]:
+        """Get WordPress posts
+
+        stream=True returns a stream_request result for proxying the body as it arrives.
+        """
         credentials = await self.get_credentials(user_id, connection_id)
         if not credentials:
             return {'success': False, 'message': 'No credentials found'}
@@ -118,6 +230,9 @@ class WordPressAPIClient:
         if params:
             query_params.update(params)
         
+        if stream:
+            return await self.stream_request('posts', credentials, query_params)
+        
         return await self.make_request('GET', 'posts', credentials, query_params)
     
     async def get_post(self, user_id: str, connection_id: str, post_id: int) -> Dict[str, Any]:
@@ -134,7 +249,10 @@ class WordPressAPIClient:
         if not credentials:
             return {'success': False, 'message': 'No credentials found'}
         
-        # Sanitize and validate post data
+        return await self.make_request('POST', 'posts', credentials, self.clean_post_data(post_data))
+    
+    def clean_post_data(self, post_data: Dict[str, Any]) -> Dict[str, Any]:
+        """Sanitize post data for creation, dropping empty fields"""
         clean_data = {
             'title': post_data.get('title', ''),
             'content': post_data.get('content', ''),
@@ -146,9 +264,95 @@ class WordPressAPIClient:
         }
         
         # Remove empty fields
-        clean_data = {k: v for k, v in clean_data.items() if v}
+        return {k: v for k, v in clean_data.items() if v}
+    
+    async def create_posts_batch(self, user_id: str, connection_id: str, posts_data: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Create several posts through the WordPress batch API (WordPress 5.6+)
+
+        Posts are sent in chunks of WORDPRESS_BATCH_MAX_REQUESTS, one upstream
+        request per chunk. Returns one result per post, in order, shaped like
+        create_post()'s. Sites without the batch route fall back to one
+        create_post() per post.
+        """
+        credentials = await self.get_credentials(user_id, connection_id)
+        if not credentials:
+            return [{'success': False, 'message': 'No credentials found'} for _ in posts_data]
+        
+        results: List[Dict[str, Any]] = []
+        for start in range(0, len(posts_data), WORDPRESS_BATCH_MAX_REQUESTS):
+            chunk = posts_data[start:start + WORDPRESS_BATCH_MAX_REQUESTS]
+            chunk_results = await self._send_batch(credentials, chunk)
+            if chunk_results is None:
+                # No batch support on this site
+                chunk_results = [
+                    await self.make_request('POST', 'posts', credentials, self.clean_post_data(post))
+                    for post in chunk
+                ]
+            results.extend(chunk_results)
+        return results
+    
+    async def _send_batch(self, credentials: Dict[str, Any], posts_data: List[Dict[str, Any]]) -> Optional[List[Dict[str, Any]]]:
+        """POST one chunk to /wp-json/batch/v1; None when the site has no batch route or does not answer like one"""
+        target = urlparse(credentials.get('site_url', '')).netloc
+        start = time.perf_counter()
+        status_code = None
         
-        return await self.make_request('POST', 'posts', credentials, clean_data)
+        try:
+            site_url = credentials['site_url'].rstrip('/')
+            headers = await self._build_request_headers(credentials)
+            body = {
+                'validation': 'normal',
+                'requests': [
+                    {'method': 'POST', 'path': '/wp/v2/posts', 'body': self.clean_post_data(post)}
+                    for post in posts_data
+                ]
+            }
+            
+            client = self._get_http_client()
+            with span("upstream"):
+                response = await client.post(urljoin(site_url, '/wp-json/batch/v1'), headers=headers, json=body)
+            status_code = response.status_code
+            observe_upstream(target, status_code, time.perf_counter() - start)
+            
+            if response.status_code == 404:
+                return None
+            if not 200 <= response.status_code < 300:
+                error = self._error_result(response)
+                return [error for _ in posts_data]
+            
+            try:
+                responses = response.json().get('responses')
+            except (ValueError, AttributeError):
+                responses = None
+            if not isinstance(responses, list):
+                # Answered by something other than the batch API, e.g. a catch-all route
+                self.logger.warning(f"{target} answered the batch route with HTTP {response.status_code} but no responses, creating posts one by one")
+                return None
+            
+            results = []
+            for item in responses:
+                item_status = item.get('status', 0)
+                item_body = item.get('body') or {}
+                if item_status in [200, 201]:
+                    results.append({'success': True, 'status_code': item_status, 'data': item_body})
+                else:
+                    results.append({
+                        'success': False,
+                        'error': item_body,
+                        'status_code': item_status,
+                        'message': item_body.get('message', f'HTTP {item_status}') if isinstance(item_body, dict) else f'HTTP {item_status}'
+                    })
+            # A short response (e.g. failed validation) leaves the remainder unanswered
+            missing = {'success': False, 'message': 'No response for batch item'}
+            results.extend(missing for _ in range(len(posts_data) - len(results)))
+            return results
+        
+        except Exception as e:
+            if status_code is None:
+                observe_upstream(target, None, time.perf_counter() - start)
+            self.logger.error(f"WordPress batch request failed: {str(e)}")
+            failed = {'success': False, 'error': str(e), 'transport_error': isinstance(e, httpx.TransportError), 'message': f'Request failed: {str(e)}'}
+            return [failed for _ in posts_data]
     
     async def update_post(self, user_id: str, connection_id: str, post_id: int, post_data: Dict[str, Any]) -> Dict[str, Any]:
         """Update an existing WordPress post"""
@@ -251,35 +455,47 @@ class WordPressAPIClient:
         if not credentials:
             return {'success': False, 'message': 'No credentials found'}
         
+        return await self._fetch_site_info(credentials)
+    
+    async def _fetch_site_info(self, credentials: Dict[str, Any]) -> Dict[str, Any]:
+        """Get WordPress site information using already resolved credentials"""
         # Get site info from the root endpoint
         try:
             site_url = credentials['site_url'].rstrip('/')
             api_url = urljoin(site_url, '/wp-json/')
             
-            async with httpx.AsyncClient(timeout=self.timeout) as client:
+            target = urlparse(site_url).netloc
+            start = time.perf_counter()
+            
+            client = self._get_http_client()
+            try:
                 response = await client.get(api_url)
-                
-                if response.status_code == 200:
-                    data = response.json()
-                    return {
-                        'success': True,
-                        'data': {
-                            'name': data.get('name', ''),
-                            'description': data.get('description', ''),
-                            'url': data.get('url', ''),
-                            'home': data.get('home', ''),
-                            'gmt_offset': data.get('gmt_offset', 0),
-                            'timezone_string': data.get('timezone_string', ''),
-                            'namespaces': data.get('namespaces', []),
-                            'site_logo': data.get('site_logo', 0),
-                            'site_icon': data.get('site_icon', 0)
-                        }
-                    }
-                else:
-                    return {
-                        'success': False,
-                        'message': f'Failed to get site info: HTTP {response.status_code}'
+            except Exception:
+                observe_upstream(target, None, time.perf_counter() - start)
+                raise
+            observe_upstream(target, response.status_code, time.perf_counter() - start)
+            
+            if response.status_code == 200:
+                data = response.json()
+                return {
+                    'success': True,
+                    'data': {
+                        'name': data.get('name', ''),
+                        'description': data.get('description', ''),
+                        'url': data.get('url', ''),
+                        'home': data.get('home', ''),
+                        'gmt_offset': data.get('gmt_offset', 0),
+                        'timezone_string': data.get('timezone_string', ''),
+                        'namespaces': data.get('namespaces', []),
+                        'site_logo': data.get('site_logo', 0),
+                        'site_icon': data.get('site_icon', 0)
                     }
+                }
+            else:
+                return {
+                    'success': False,
+                    'message': f'Failed to get site info: HTTP {response.status_code}'
+                }
                     
         except Exception as e:
             self.logger.error(f"Failed to get WordPress site info: {str(e)}")
@@ -296,7 +512,7 @@ class WordPressAPIClient:
             return {'success': False, 'message': 'No credentials found'}
         
         # Test by getting site info
-        result = await self.get_site_info(user_id, connection_id)
+        result = await self._fetch_site_info(credentials)
         
         if result['success']:
             return {
@@ -310,6 +526,65 @@ class WordPressAPIClient:
                 'message': f'WordPress connection test failed: {result.get("message", "Unknown error")}'
             }
 
+    
+    async def _cached_test_connection(self, user_id: str, connection_id: str) -> Dict[str, Any]:
+        """Test a connection, reusing a result younger than the cache TTL"""
+        key = (user_id, connection_id)
+        now = time.monotonic()
+        
+        cached = self._test_cache.get(key)
+        if cached and cached[0] > now:
+            record_cache_lookup("connection_test", True)
+            return {**cached[1], 'cached': True}
+        record_cache_lookup("connection_test", False)
+        
+        task = self._test_inflight.get(key)
+        if task is None:
+            task = asyncio.create_task(self.test_connection(user_id, connection_id))
+            self._test_inflight[key] = task
+            task.add_done_callback(lambda _: self._test_inflight.pop(key, None))
+        result = await asyncio.shield(task)
+        
+        entry = {
+            'connection_id': connection_id,
+            'checked_at': datetime.utcnow().isoformat(),
+            **result
+        }
+        self._test_cache[key] = (time.monotonic() + CONNECTION_TEST_CACHE_TTL, entry)
+        if len(self._test_cache) > 1024:
+            expired = [k for k, (expires, _) in self._test_cache.items() if expires <= now]
+            for k in expired:
+                del self._test_cache[k]
+        
+        return {**entry, 'cached': False}
+    
+    async def test_connections(self, user_id: str, connection_ids: List[str], concurrency: int = CONNECTION_TEST_CONCURRENCY) -> AsyncIterator[Dict[str, Any]]:
+        """Test several connections concurrently, yielding each result as it finishes"""
+        semaphore = asyncio.Semaphore(max(1, concurrency))
+        
+        async def run(connection_id: str) -> Dict[str, Any]:
+            async with semaphore:
+                try:
+                    return await self._cached_test_connection(user_id, connection_id)
+                except Exception as e:
+                    self.logger.error(f"Connection test for {connection_id} failed: {str(e)}")
+                    return {
+                        'connection_id': connection_id,
+                        'success': False,
+                        'message': f'WordPress connection test failed: {str(e)}',
+                        'cached': False
+                    }
+        
+        # dict.fromkeys drops duplicate IDs while keeping request order
+        tasks = [asyncio.create_task(run(cid)) for cid in dict.fromkeys(connection_ids)]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                yield await next_done
+        finally:
+            # Client went away mid-stream: stop the remaining tests
+            for task in tasks:
+                task.cancel()
+
 
 # Initialize WordPress API client
 wordpress_client = WordPressAPIClient()
\ No newline at end of file
@@ -7,17 +7,24 @@ import os
 import json
 import logging
 import asyncio
+import time
 from typing import Optional, Dict, Any, List
 from datetime import datetime, timedelta
 from cryptography.fernet import Fernet
 import httpx
+import orjson
 import sqlite3
 from pathlib import Path
 
 from pydantic import BaseModel, Field
-from fastapi import FastAPI, HTTPException, Depends, status
+from fastapi import FastAPI, HTTPException, Depends, Header, Query, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from starlette.background import BackgroundTask
+
+from metrics import MetricsMiddleware, registry as metrics_registry, sqlite_query_duration, observe_upstream
+from request_timing import ServerTimingMiddleware, TimedORJSONResponse, span
 
 
 class Pipeline:
@@ -59,7 +66,7 @@ class Pipeline:
     
     def _init_database(self):
         """Initialize SQLite database for storing WordPress connections"""
-        with sqlite3.connect(self.db_path) as conn:
+        with sqlite_query_duration.labels("init").time(), sqlite3.connect(self.db_path) as conn:
             conn.execute("""
                 CREATE TABLE IF NOT EXISTS wordpress_connections (
                     id TEXT PRIMARY KEY,
@@ -76,12 +83,16 @@ class Pipeline:
     
     async def verify_authentik_token(self, token: str) -> Optional[Dict[str, Any]]:
         """Verify token with Authentik and return user info"""
+        start = time.perf_counter()
+        status_code = None
         try:
             async with httpx.AsyncClient() as client:
                 response = await client.get(
                     f"{self.authentik_url}/application/o/userinfo/",
                     headers={"Authorization": f"Bearer {token}"}
                 )
+                status_code = response.status_code
+                observe_upstream("authentik", status_code, time.perf_counter() - start)
                 
                 if response.status_code == 200:
                     return response.json()
@@ -89,6 +100,8 @@ class Pipeline:
                     self.logger.error(f"Authentik token verification failed: {response.status_code}")
                     return None
         except Exception as e:
+            if status_code is None:
+                observe_upstream("authentik", None, time.perf_counter() - start)
             self.logger.error(f"Error verifying Authentik token: {str(e)}")
             return None
     
@@ -104,7 +117,7 @@ class Pipeline:
             connection_id = f"wp_{user_info['sub']}_{hash(connection_data['site_url'])}"
             
             # Store in database
-            with sqlite3.connect(self.db_path) as conn:
+            with sqlite_query_duration.labels("register_connection").time(), sqlite3.connect(self.db_path) as conn:
                 conn.execute("""
                     INSERT OR REPLACE INTO wordpress_connections 
                     (id, user_id, site_url, site_name, encrypted_token, created_at, is_active)
@@ -138,7 +151,7 @@ class Pipeline:
     async def get_wordpress_connections(self, user_id: str) -> List[Dict[str, Any]]:
         """Get all WordPress connections for a user"""
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with sqlite_query_duration.labels("list_connections").time(), sqlite3.connect(self.db_path) as conn:
                 cursor = conn.execute("""
                     SELECT id, site_url, site_name, created_at, last_used, is_active
                     FROM wordpress_connections
@@ -165,29 +178,32 @@ class Pipeline:
     async def get_wordpress_credentials(self, user_id: str, connection_id: str) -> Optional[Dict[str, Any]]:
         """Get decrypted WordPress credentials for API calls"""
         try:
-            with sqlite3.connect(self.db_path) as conn:
-                cursor = conn.execute("""
-                    SELECT site_url, encrypted_token
-                    FROM wordpress_connections
-                    WHERE id = ? AND user_id = ? AND is_active = 1
-                """, (connection_id, user_id))
-                
-                row = cursor.fetchone()
+            with sqlite_query_duration.labels("get_credentials").time(), sqlite3.connect(self.db_path) as conn:
+                with span("sqlite"):
+                    cursor = conn.execute("""
+                        SELECT site_url, encrypted_token
+                        FROM wordpress_connections
+                        WHERE id = ? AND user_id = ? AND is_active = 1
+                    """, (connection_id, user_id))
+                    
+                    row = cursor.fetchone()
                 if not row:
                     return None
                 
                 # Decrypt the password
-                decrypted_password = self.cipher_suite.decrypt(
-                    row[1].encode()
-                ).decode()
+                with span("decrypt"):
+                    decrypted_password = self.cipher_suite.decrypt(
+                        row[1].encode()
+                    ).decode()
                 
                 # Update last_used timestamp
-                conn.execute("""
-                    UPDATE wordpress_connections
-                    SET last_used = ?
-                    WHERE id = ?
-                """, (datetime.utcnow().isoformat(), connection_id))
-                conn.commit()
+                with span("sqlite"):
+                    conn.execute("""
+                        UPDATE wordpress_connections
+                        SET last_used = ?
+                        WHERE id = ?
+                    """, (datetime.utcnow().isoformat(), connection_id))
+                    conn.commit()
                 
                 return {
                     "site_url": row[0],
@@ -201,7 +217,7 @@ class Pipeline:
     async def delete_wordpress_connection(self, user_id: str, connection_id: str) -> bool:
         """Delete a WordPress connection"""
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with sqlite_query_duration.labels("delete_connection").time(), sqlite3.connect(self.db_path) as conn:
                 cursor = conn.execute("""
                     UPDATE wordpress_connections
                     SET is_active = 0
@@ -236,7 +252,11 @@ class WordPressConnectionsResponse(BaseModel):
 pipeline = Pipeline()
 
 # FastAPI app for custom endpoints
-app = FastAPI(title="WordPress OAuth2 Pipeline", version="1.0.0")
+app = FastAPI(
+    title="WordPress OAuth2 Pipeline",
+    version="1.0.0",
+    default_response_class=TimedORJSONResponse
+)
 
 # Add CORS middleware
 app.add_middleware(
@@ -247,13 +267,20 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Per-route latency histograms for /metrics
+app.add_middleware(MetricsMiddleware)
+
+# Server-Timing breakdown and slow request sampling
+app.add_middleware(ServerTimingMiddleware)
+
 # Security
 security = HTTPBearer()
 
 
 async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)):
     """Get current user from Authentik token"""
-    user_info = await pipeline.verify_authentik_token(credentials.credentials)
+    with span("auth"):
+        user_info = await pipeline.verify_authentik_token(credentials.credentials)
     if not user_info:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -322,20 +349,36 @@ async def health_check():
     return {"status": "healthy", "pipeline": pipeline.name, "version": pipeline.version}
 
 
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Prometheus metrics endpoint"""
+    return PlainTextResponse(metrics_registry.render(), media_type="text/plain; version=0.0.4")
+
+
 # Required OpenWebUI Pipeline methods
 async def on_startup():
     """Called when the pipeline starts"""
     global wordpress_client
     # Import here to avoid circular imports
-    from wordpress_client import WordPressAPIClient
-    wordpress_client = WordPressAPIClient()
+    from wordpress_client import wordpress_client as shared_client
+    wordpress_client = shared_client
     pipeline.logger.info(f"Starting {pipeline.name} v{pipeline.version}")
+    # Reload persisted workflows and re-arm anything a restart interrupted
+    await content_automation.startup()
     return pipeline
 
 
 async def on_shutdown():
     """Called when the pipeline shuts down"""
     pipeline.logger.info(f"Shutting down {pipeline.name}")
+    await content_automation.shutdown()
+    if wordpress_client is not None:
+        await wordpress_client.close()
+
+
+# Run the pipeline hooks when served standalone by uvicorn as well
+app.add_event_handler("startup", on_startup)
+app.add_event_handler("shutdown", on_shutdown)
 
 
 # Import WordPress API client  
@@ -349,17 +392,45 @@ async def get_posts(
     per_page: int = 10,
     page: int = 1,
     status: str = "publish",
+    summary: bool = False,
     current_user: Dict[str, Any] = Depends(get_current_user)
 ):
-    """Get WordPress posts"""
+    """Get WordPress posts
+
+    The upstream body is streamed straight through with its pagination
+    headers. Only summary=true, which reduces each post to a compact entry,
+    requires parsing it.
+    """
     params = {
         'per_page': per_page,
         'page': page,
         'status': status
     }
-    result = await wordpress_client.get_posts(current_user["sub"], connection_id, params)
+    
+    if summary:
+        result = await wordpress_client.get_posts(current_user["sub"], connection_id, params)
+        if not result['success']:
+            raise HTTPException(status_code=400, detail=result['message'])
+        posts = [
+            {
+                'id': post.get('id'),
+                'title': (post.get('title') or {}).get('rendered', ''),
+                'status': post.get('status'),
+                'date': post.get('date'),
+                'link': post.get('link')
+            }
+            for post in result['data']
+        ]
+        return TimedORJSONResponse(posts, headers=result['headers'])
+    
+    result = await wordpress_client.get_posts(current_user["sub"], connection_id, params, stream=True)
     if result['success']:
-        return result['data']
+        return StreamingResponse(
+            result['stream'],
+            media_type="application/json",
+            headers=result['headers'],
+            background=BackgroundTask(result['close'])
+        )
     else:
         raise HTTPException(status_code=400, detail=result['message'])
 
@@ -404,6 +475,27 @@ async def delete_post(
     else:
         raise HTTPException(status_code=400, detail=result['message'])
 
+@app.get("/api/wordpress/test")
+async def test_wordpress_connections(
+    connection_id: Optional[List[str]] = Query(None, description="Connections to test; defaults to all of the user's connections"),
+    current_user: Dict[str, Any] = Depends(get_current_user)
+):
+    """Test several WordPress connections concurrently
+
+    Results are streamed as newline-delimited JSON, one line per connection
+    in completion order. Results younger than CONNECTION_TEST_CACHE_TTL are
+    served from cache and flagged with "cached": true.
+    """
+    if connection_id is None:
+        connections = await pipeline.get_wordpress_connections(current_user["sub"])
+        connection_id = [c["id"] for c in connections]
+    
+    async def results():
+        async for result in wordpress_client.test_connections(current_user["sub"], connection_id):
+            yield orjson.dumps(result) + b"\n"
+    
+    return StreamingResponse(results(), media_type="application/x-ndjson")
+
 @app.get("/api/wordpress/test/{connection_id}")
 async def test_wordpress_connection(
     connection_id: str,
@@ -420,62 +512,302 @@ async def test_wordpress_connection(
 from content_automation import (
     content_automation, 
     CreateWorkflowRequest, 
+    CreateWorkflowBatchRequest,
+    CreateFanoutWorkflowRequest,
+    ReplayDeadLettersRequest,
+    RescheduleWorkflowRequest,
+    PublishWindowRequest,
     WorkflowResponse,
     ContentType,
-    WorkflowStatus
+    WorkflowStatus,
+    WorkflowQueueFull
 )
 
+
+def _queue_full_error() -> HTTPException:
+    """503 telling clients to back off while the workflow queue drains"""
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail="Workflow queue is full, please retry later",
+        headers={"Retry-After": "5"}
+    )
+
 # Content Automation Endpoints
 @app.post("/api/content/workflows", response_model=WorkflowResponse)
 async def create_content_workflow(
     workflow_request: CreateWorkflowRequest,
+    idempotency_key: Optional[str] = Header(None, max_length=255),
     current_user: Dict[str, Any] = Depends(get_current_user)
 ):
-    """Create a new content publishing workflow"""
+    """Create a new content publishing workflow
+
+    A resubmission with the same Idempotency-Key header (or, without one,
+    the same connection, title and content) returns the existing workflow
+    with an Idempotent-Replayed: true header instead of creating another.
+    """
+    # Apply backpressure before accepting work we cannot queue
+    if content_automation.is_full():
+        raise _queue_full_error()
+    
     workflow_data = workflow_request.dict()
     workflow_data["user_id"] = current_user["sub"]
+    if idempotency_key:
+        workflow_data["idempotency_key"] = idempotency_key
     
-    workflow = await content_automation.create_workflow(workflow_data)
+    workflow, created = await content_automation.create_or_get_workflow(workflow_data)
+    if not created:
+        return TimedORJSONResponse(workflow.to_response_dict(), headers={"Idempotent-Replayed": "true"})
     
-    # Start the workflow immediately if not scheduled
-    if not workflow.scheduled_publish_time:
+    # Start the workflow; scheduled workflows are armed for their publish time
+    try:
         await content_automation.start_workflow(workflow.id)
+    except WorkflowQueueFull:
+        await content_automation.cancel_workflow(workflow.id)
+        raise _queue_full_error()
     
-    return WorkflowResponse(
-        id=workflow.id,
-        status=workflow.status,
-        title=workflow.title,
-        content_type=workflow.content_type,
-        wordpress_post_id=workflow.wordpress_post_id,
-        created_at=workflow.created_at,
-        updated_at=workflow.updated_at,
-        completed_at=workflow.completed_at,
-        error_message=workflow.error_message,
-        retry_count=workflow.retry_count
+    return TimedORJSONResponse(workflow.to_response_dict())
+
+@app.post("/api/content/workflows/batch", status_code=202)
+async def create_content_workflow_batch(
+    batch_request: CreateWorkflowBatchRequest,
+    current_user: Dict[str, Any] = Depends(get_current_user)
+):
+    """Create many content workflows in one request
+
+    Returns the workflow IDs straight away; poll the batch ID for progress.
+    """
+    if content_automation.is_full():
+        raise _queue_full_error()
+    
+    # Check every referenced connection against one lookup rather than per workflow
+    connections = await pipeline.get_wordpress_connections(current_user["sub"])
+    known = {c["id"] for c in connections}
+    unknown = sorted({w.connection_id for w in batch_request.workflows} - known)
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown WordPress connections: {', '.join(unknown)}")
+    
+    batch, workflow_ids = await content_automation.create_batch(
+        current_user["sub"], [w.dict() for w in batch_request.workflows]
+    )
+    
+    return TimedORJSONResponse(
+        {"batch_id": batch.id, "workflow_ids": workflow_ids, "total": len(batch.workflow_ids)},
+        status_code=202
     )
 
+@app.post("/api/content/workflows/fanout", status_code=202)
+async def create_content_workflow_fanout(
+    fanout_request: CreateFanoutWorkflowRequest,
+    current_user: Dict[str, Any] = Depends(get_current_user)
+):
+    """Publish one piece of content to several WordPress connections at once
+
+    Returns the fan-out ID and one workflow per connection straight away;
+    poll the fan-out ID for per-site results.
+    """
+    if content_automation.is_full():
+        raise _queue_full_error()
+    
+    connections = await pipeline.get_wordpress_connections(current_user["sub"])
+    known = {c["id"] for c in connections}
+    unknown = sorted(set(fanout_request.connection_ids) - known)
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown WordPress connections: {', '.join(unknown)}")
+    
+    batch, _ = await content_automation.create_fanout(current_user["sub"], fanout_request.dict())
+    
+    return TimedORJSONResponse(content_automation.fanout_progress(batch), status_code=202)
+
+@app.get("/api/content/workflows/fanout/{fanout_id}")
+async def get_content_workflow_fanout(
+    fanout_id: str,
+    current_user: Dict[str, Any] = Depends(get_current_user)
+):
+    """Get per-site results for a fan-out workflow"""
+    batch = content_automation.batches.get(fanout_id)
+    
+    if not batch:
+        raise HTTPException(status_code=404, detail="Fan-out not found")
+    
+    if batch.user_id != current_user["sub"]:
+        raise HTTPException(status_code=403, detail="Access denied")
+    
+    return TimedORJSONResponse(content_automation.fanout_progress(batch))
+
+@app.get("/api/content/workflows/batches/{batch_id}")
+async def get_content_workflow_batch(
+    batch_id: str,
+    current_user: Dict[str, Any] = Depends(get_current_user)
+):
+    """Get aggregate progress for a batch of workflows"""
+    batch = content_automation.batches.get(batch_id)
+    
+    if not batch:
+        raise HTTPException(status_code=404, detail="Batch not found")
+    
+    if batch.user_id != current_user["sub"]:
+        raise HTTPException(status_code=403, detail="Access denied")
+    
+    return TimedORJSONResponse(content_automation.batch_progress(batch))
+
 @app.get("/api/content/workflows", response_model=List[WorkflowResponse])
 async def list_content_workflows(
     status: Optional[WorkflowStatus] = None,
+    limit: int = Query(100, ge=1, le=500, description="Maximum workflows to return"),
+    cursor: Optional[str] = Query(None, description="X-Next-Cursor value from the previous page"),
+    since: Optional[datetime] = Query(None, description="Only workflows created at or after this time"),
     current_user: Dict[str, Any] = Depends(get_current_user)
 ):
-    """List content workflows for the current user"""
-    workflows = await content_automation.list_workflows(current_user["sub"], status)
-    
-    return [
-        WorkflowResponse(
-            id=w.id,
-            status=w.status,
-            title=w.title,
-            content_type=w.content_type,
-            wordpress_post_id=w.wordpress_post_id,
-            created_at=w.created_at,
-            updated_at=w.updated_at,
-            completed_at=w.completed_at,
-            error_message=w.error_message,
-            retry_count=w.retry_count
-        ) for w in workflows
-    ]
+    """List content workflows for the current user, newest first
+
+    When more workflows remain, the X-Next-Cursor response header carries
+    the cursor for the next page.
+    """
+    try:
+        workflows, next_cursor = await content_automation.list_workflows_page(
+            current_user["sub"], status, limit=limit, cursor=cursor, since=since
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    # Workflows are trusted internal objects, so skip per-item model validation
+    headers = {"X-Next-Cursor": next_cursor} if next_cursor else None
+    return TimedORJSONResponse([w.to_response_dict() for w in workflows], headers=headers)
+
+@app.get("/api/content/workflows/dead-letters", response_model=List[WorkflowResponse])
+async def list_dead_lettered_workflows(
+    limit: int = Query(100, ge=1, le=500, description="Maximum workflows to return"),
+    cursor: Optional[str] = Query(None, description="X-Next-Cursor value from the previous page"),
+    current_user: Dict[str, Any] = Depends(get_current_user)
+):
+    """List the current user's dead-lettered workflows, newest first
+
+    Each workflow's error_message holds the error that put it there.
+    """
+    try:
+        workflows, next_cursor = await content_automation.list_workflows_page(
+            current_user["sub"], WorkflowStatus.DEAD_LETTER, limit=limit, cursor=cursor
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    headers = {"X-Next-Cursor": next_cursor} if next_cursor else None
+    return TimedORJSONResponse([w.to_response_dict() for w in workflows], headers=headers)
+
+@app.post("/api/content/workflows/dead-letters/replay")
+async def replay_dead_lettered_workflows(
+    replay_request: ReplayDeadLettersRequest,
+    current_user: Dict[str, Any] = Depends(get_current_user)
+):
+    """Replay dead-lettered workflows in bulk: the listed ones, or all of them"""
+    if content_automation.is_full():
+        raise _queue_full_error()
+    
+    replayed = await content_automation.replay_dead_letters(
+        current_user["sub"], replay_request.workflow_ids, replay_request.spread_seconds
+    )
+    
+    return {"success": True, "message": f"Replayed {len(replayed)} workflows", "workflow_ids": replayed}
+
+# Comment lines keep idle SSE connections open through proxies
+WORKFLOW_EVENT_KEEPALIVE = float(os.getenv("WORKFLOW_EVENT_KEEPALIVE", "15"))
+
+def _sse_frame(event: Dict[str, Any]) -> bytes:
+    """Encode one event as a server-sent event frame"""
+    if "event_id" not in event:
+        return b"event: %s\ndata: %s\n\n" % (event["type"].encode(), orjson.dumps(event))
+    return b"id: %d\nevent: %s\ndata: %s\n\n" % (event["event_id"], event["type"].encode(), orjson.dumps(event))
+
+def _last_event_id(header_value: Optional[str], query_value: Optional[int]) -> Optional[int]:
+    """Resume point from the Last-Event-ID header (sent by EventSource on reconnect) or the query"""
+    if header_value:
+        try:
+            return int(header_value)
+        except ValueError:
+            return None
+    return query_value
+
+async def _event_stream(events, first: Optional[Dict[str, Any]] = None, until_final: bool = False):
+    """Relay subscription events as SSE frames with periodic keepalives"""
+    pending = None
+    try:
+        if first is not None:
+            yield _sse_frame(first)
+            if until_final and first.get("final"):
+                return
+        while True:
+            if pending is None:
+                pending = asyncio.ensure_future(events.__anext__())
+            # Wait without cancelling the read, which would close the subscription
+            done, _ = await asyncio.wait({pending}, timeout=WORKFLOW_EVENT_KEEPALIVE)
+            if not done:
+                yield b": keepalive\n\n"
+                continue
+            try:
+                event = pending.result()
+            except StopAsyncIteration:
+                return
+            pending = None
+            yield _sse_frame(event)
+            if event["type"] == "resync" or (until_final and event.get("final")):
+                return
+    finally:
+        if pending is not None:
+            pending.cancel()
+        events.close()
+
+_SSE_HEADERS = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+
+@app.get("/api/content/workflows/events")
+async def stream_content_workflow_events(
+    last_event_id: Optional[int] = Query(None, description="Replay events after this ID"),
+    last_event_id_header: Optional[str] = Header(None, alias="Last-Event-ID"),
+    current_user: Dict[str, Any] = Depends(get_current_user)
+):
+    """Server-sent events for all of the current user's workflows
+
+    Authentication happens once per connection. Reconnecting with
+    Last-Event-ID replays buffered events; a "resync" event means some were
+    missed and state should be refetched.
+    """
+    events = content_automation.events.subscribe(
+        current_user["sub"], last_event_id=_last_event_id(last_event_id_header, last_event_id)
+    )
+    return StreamingResponse(_event_stream(events), media_type="text/event-stream", headers=_SSE_HEADERS)
+
+@app.get("/api/content/workflows/{workflow_id}/events")
+async def stream_content_workflow(
+    workflow_id: str,
+    last_event_id: Optional[int] = Query(None, description="Replay events after this ID"),
+    last_event_id_header: Optional[str] = Header(None, alias="Last-Event-ID"),
+    current_user: Dict[str, Any] = Depends(get_current_user)
+):
+    """Server-sent events for one workflow
+
+    Starts with a "snapshot" event of the current state (or, when resuming
+    with Last-Event-ID, the missed events) and ends once the workflow
+    reaches a final state.
+    """
+    workflow = await content_automation.get_workflow(workflow_id)
+    
+    if not workflow:
+        raise HTTPException(status_code=404, detail="Workflow not found")
+    
+    if workflow.user_id != current_user["sub"]:
+        raise HTTPException(status_code=403, detail="Access denied")
+    
+    # Subscribe before reading the snapshot so no transition falls between them
+    resume_from = _last_event_id(last_event_id_header, last_event_id)
+    events = content_automation.events.subscribe(current_user["sub"], workflow_id, resume_from)
+    final = content_automation.is_final(workflow)
+    snapshot = None
+    if resume_from is None or (final and not events.replaying):
+        snapshot = {"type": "snapshot", **workflow.to_response_dict(), "final": final}
+    return StreamingResponse(
+        _event_stream(events, first=snapshot, until_final=True),
+        media_type="text/event-stream",
+        headers=_SSE_HEADERS
+    )
 
 @app.get("/api/content/workflows/{workflow_id}", response_model=WorkflowResponse)
 async def get_content_workflow(
@@ -491,18 +823,7 @@ async def get_content_workflow(
     if workflow.user_id != current_user["sub"]:
         raise HTTPException(status_code=403, detail="Access denied")
     
-    return WorkflowResponse(
-        id=workflow.id,
-        status=workflow.status,
-        title=workflow.title,
-        content_type=workflow.content_type,
-        wordpress_post_id=workflow.wordpress_post_id,
-        created_at=workflow.created_at,
-        updated_at=workflow.updated_at,
-        completed_at=workflow.completed_at,
-        error_message=workflow.error_message,
-        retry_count=workflow.retry_count
-    )
+    return TimedORJSONResponse(workflow.to_response_dict())
 
 @app.post("/api/content/workflows/{workflow_id}/cancel")
 async def cancel_content_workflow(
@@ -525,12 +846,34 @@ async def cancel_content_workflow(
     else:
         raise HTTPException(status_code=400, detail="Cannot cancel workflow in current status")
 
+@app.post("/api/content/workflows/{workflow_id}/reschedule")
+async def reschedule_content_workflow(
+    workflow_id: str,
+    reschedule_request: RescheduleWorkflowRequest,
+    current_user: Dict[str, Any] = Depends(get_current_user)
+):
+    """Move the publish time of a pending workflow"""
+    workflow = await content_automation.get_workflow(workflow_id)
+    
+    if not workflow:
+        raise HTTPException(status_code=404, detail="Workflow not found")
+    
+    if workflow.user_id != current_user["sub"]:
+        raise HTTPException(status_code=403, detail="Access denied")
+    
+    try:
+        await content_automation.reschedule_workflow(workflow_id, reschedule_request.scheduled_publish_time)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    return {"success": True, "message": "Workflow rescheduled successfully"}
+
 @app.post("/api/content/workflows/{workflow_id}/retry")
 async def retry_content_workflow(
     workflow_id: str,
     current_user: Dict[str, Any] = Depends(get_current_user)
 ):
-    """Retry a failed content workflow"""
+    """Retry a failed or dead-lettered content workflow"""
     workflow = await content_automation.get_workflow(workflow_id)
     
     if not workflow:
@@ -539,20 +882,56 @@ async def retry_content_workflow(
     if workflow.user_id != current_user["sub"]:
         raise HTTPException(status_code=403, detail="Access denied")
     
-    if workflow.status != WorkflowStatus.FAILED:
+    if workflow.status not in (WorkflowStatus.FAILED, WorkflowStatus.DEAD_LETTER):
         raise HTTPException(status_code=400, detail="Only failed workflows can be retried")
     
-    # Reset workflow for retry
-    workflow.status = WorkflowStatus.PENDING
-    workflow.error_message = None
-    workflow.retry_count = 0
-    workflow.updated_at = datetime.utcnow()
+    if content_automation.is_full():
+        raise _queue_full_error()
     
-    # Start the workflow
-    await content_automation.start_workflow(workflow_id)
+    # Reset and restart the workflow
+    await content_automation.retry_workflow(workflow_id)
     
     return {"success": True, "message": "Workflow retry initiated"}
 
+async def _require_connection(user_id: str, connection_id: str) -> None:
+    """404 unless the connection belongs to the user"""
+    connections = await pipeline.get_wordpress_connections(user_id)
+    if connection_id not in {c["id"] for c in connections}:
+        raise HTTPException(status_code=404, detail="Connection not found")
+
+@app.get("/api/content/connections/{connection_id}/publish-window")
+async def get_publish_window(
+    connection_id: str,
+    current_user: Dict[str, Any] = Depends(get_current_user)
+):
+    """Get the quiet hours, rate limit and coalescing delay applied to a connection"""
+    await _require_connection(current_user["sub"], connection_id)
+    return content_automation.get_publish_window(connection_id).to_dict()
+
+@app.put("/api/content/connections/{connection_id}/publish-window")
+async def set_publish_window(
+    connection_id: str,
+    window_request: PublishWindowRequest,
+    current_user: Dict[str, Any] = Depends(get_current_user)
+):
+    """Set the publish window for a connection; omitted fields keep the configured defaults"""
+    await _require_connection(current_user["sub"], connection_id)
+    try:
+        window = await content_automation.set_publish_window(connection_id, window_request.dict(exclude_unset=True))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return window.to_dict()
+
+@app.delete("/api/content/connections/{connection_id}/publish-window")
+async def delete_publish_window(
+    connection_id: str,
+    current_user: Dict[str, Any] = Depends(get_current_user)
+):
+    """Revert a connection to the configured publish window"""
+    await _require_connection(current_user["sub"], connection_id)
+    window = await content_automation.set_publish_window(connection_id, None)
+    return window.to_dict()
+
 @app.get("/api/content/templates")
 async def get_content_templates():
     """Get available content templates and their configurations"""
@@ -0,0 +1,110 @@
+"""
+Workflow Archive
+Compressed on-disk segments for workflows evicted by the retention policy
+"""
+
+import asyncio
+import gzip
+import json
+import logging
+import sqlite3
+import threading
+import uuid
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from metrics import sqlite_query_duration
+
+# Segments are capped so a fetch by ID never has to decompress a huge file
+ARCHIVE_SEGMENT_MAX_RECORDS = 2000
+
+
+class WorkflowArchive:
+    """Append-only gzip JSONL segments plus a SQLite index of workflow ID to segment
+
+    Each retention sweep writes new segment files; nothing is rewritten in
+    place. Fetching by ID looks up the segment in the index and scans that one
+    segment.
+    """
+
+    def __init__(self, directory: str):
+        self.directory = Path(directory)
+        self.logger = logging.getLogger(__name__)
+        self._conn: Optional[sqlite3.Connection] = None
+        # The index connection is shared by worker threads
+        self._lock = threading.Lock()
+
+    def _connection(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(self.directory / "index.db", check_same_thread=False)
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS archived_workflows (
+                    id TEXT PRIMARY KEY,
+                    user_id TEXT NOT NULL,
+                    segment TEXT NOT NULL,
+                    archived_at TEXT NOT NULL
+                )
+            """)
+            conn.commit()
+            self._conn = conn
+        return self._conn
+
+    async def append(self, records: List[Dict[str, Any]]) -> None:
+        """Write records (workflow to_dict() output) to new segments"""
+        if records:
+            await asyncio.to_thread(self._append, records)
+
+    def _append(self, records: List[Dict[str, Any]]) -> None:
+        archived_at = datetime.utcnow().isoformat()
+        with self._lock:
+            conn = self._connection()
+            for start in range(0, len(records), ARCHIVE_SEGMENT_MAX_RECORDS):
+                chunk = records[start:start + ARCHIVE_SEGMENT_MAX_RECORDS]
+                segment = f"segment-{datetime.utcnow():%Y%m%d%H%M%S}-{uuid.uuid4().hex[:8]}.jsonl.gz"
+                with gzip.open(self.directory / segment, "wt", encoding="utf-8") as f:
+                    for record in chunk:
+                        f.write(json.dumps(record))
+                        f.write("\n")
+                # Index only after the segment is fully on disk
+                with sqlite_query_duration.labels("archive_index").time(), conn:
+                    conn.executemany("""
+                        INSERT OR REPLACE INTO archived_workflows (id, user_id, segment, archived_at)
+                        VALUES (?, ?, ?, ?)
+                    """, [(r["id"], r["user_id"], segment, archived_at) for r in chunk])
+
+    async def get(self, workflow_id: str) -> Optional[Dict[str, Any]]:
+        """Fetch an archived workflow record by ID"""
+        return await asyncio.to_thread(self._get, workflow_id)
+
+    def _get(self, workflow_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            if not (self.directory / "index.db").exists():
+                return None
+            with sqlite_query_duration.labels("archive_lookup").time():
+                row = self._connection().execute(
+                    "SELECT segment FROM archived_workflows WHERE id = ?", (workflow_id,)
+                ).fetchone()
+        if not row:
+            return None
+
+        # JSON dumps the id first, so cheap prefix checks skip non-matching lines
+        needle = f'{{"id": {json.dumps(workflow_id)}'
+        try:
+            with gzip.open(self.directory / row[0], "rt", encoding="utf-8") as f:
+                for line in f:
+                    if line.startswith(needle):
+                        return json.loads(line)
+        except OSError as e:
+            self.logger.error(f"Failed to read archive segment {row[0]}: {str(e)}")
+        return None
+
+    async def remove(self, workflow_id: str) -> None:
+        """Drop a workflow from the index (e.g. when it is restored); the segment is left as is"""
+        def _remove():
+            with self._lock:
+                if (self.directory / "index.db").exists():
+                    with self._connection() as conn:
+                        conn.execute("DELETE FROM archived_workflows WHERE id = ?", (workflow_id,))
+        await asyncio.to_thread(_remove)
@@ -0,0 +1,141 @@
+"""
+Workflow Event Bus
+In-process pub/sub of workflow status transitions with per-user replay buffers
+"""
+
+import asyncio
+import itertools
+import logging
+import os
+import time
+from collections import deque
+from datetime import datetime
+from typing import Any, Deque, Dict, Optional, Set
+
+# Recent events kept per user for Last-Event-ID replay
+WORKFLOW_EVENT_BUFFER = int(os.getenv("WORKFLOW_EVENT_BUFFER", "256"))
+# Events a subscriber may fall behind by before it is disconnected to resync
+WORKFLOW_EVENT_SUBSCRIBER_QUEUE = int(os.getenv("WORKFLOW_EVENT_SUBSCRIBER_QUEUE", "1024"))
+
+
+class WorkflowSubscription:
+    """Async iterator over a subscriber's events: the replay backlog first, then live events
+
+    It is registered with the bus as soon as it is created, so events
+    published between a state read and the first iteration are not lost.
+    Cancelling a pending __anext__() is safe; close() unregisters it.
+    """
+
+    def __init__(self, bus: "WorkflowEventBus", user_id: str, workflow_id: Optional[str], last_event_id: Optional[int]):
+        self.bus = bus
+        self.user_id = user_id
+        self.workflow_id = workflow_id
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=WORKFLOW_EVENT_SUBSCRIBER_QUEUE)
+        self.lagged = False
+        self._closed = False
+        self._delivered = last_event_id or 0
+        self._backlog: Deque[Dict[str, Any]] = deque()
+
+        bus._subscribers.setdefault(user_id, set()).add(self)
+        if last_event_id is not None:
+            if last_event_id < bus._first_id or bus._evicted.get(user_id, 0) > last_event_id:
+                self._backlog.append({"type": "resync"})
+            self._backlog.extend(
+                event for event in bus._recent.get(user_id, ())
+                if event["event_id"] > last_event_id and self.wants(event)
+            )
+
+    @property
+    def replaying(self) -> bool:
+        """Whether buffered events are still waiting to be delivered"""
+        return bool(self._backlog)
+
+    def wants(self, event: Dict[str, Any]) -> bool:
+        return not self.workflow_id or event["workflow_id"] == self.workflow_id
+
+    def __aiter__(self) -> "WorkflowSubscription":
+        return self
+
+    async def __anext__(self) -> Dict[str, Any]:
+        while self._backlog:
+            event = self._backlog.popleft()
+            if "event_id" not in event:
+                return event
+            if event["event_id"] > self._delivered:
+                self._delivered = event["event_id"]
+                return event
+
+        while not self._closed:
+            if self.lagged and self.queue.empty():
+                # Events were dropped; the client has to refetch state
+                self.close()
+                return {"type": "resync"}
+            event = await self.queue.get()
+            if event["event_id"] > self._delivered:
+                self._delivered = event["event_id"]
+                return event
+        raise StopAsyncIteration
+
+    def close(self) -> None:
+        if self._closed:
+            return
+        self._closed = True
+        subscribers = self.bus._subscribers.get(self.user_id)
+        if subscribers is not None:
+            subscribers.discard(self)
+            if not subscribers:
+                del self.bus._subscribers[self.user_id]
+
+
+class WorkflowEventBus:
+    """Fans workflow transitions out to subscribers of a user or a single workflow
+
+    publish() never blocks the transition that triggered it: each subscriber
+    has a bounded queue, and one that falls too far behind is cut off and can
+    reconnect with its last event ID to catch up from the replay buffer.
+    """
+
+    def __init__(self, buffer_size: int = WORKFLOW_EVENT_BUFFER):
+        self.logger = logging.getLogger(__name__)
+        self.buffer_size = buffer_size
+        # Seeded from the clock so IDs keep increasing across restarts; an ID
+        # from before this process started can only be answered with a resync
+        self._first_id = int(time.time() * 1000)
+        self._sequence = itertools.count(self._first_id)
+        self._recent: Dict[str, Deque[Dict[str, Any]]] = {}
+        # Newest event ID per user that has already fallen out of the buffer
+        self._evicted: Dict[str, int] = {}
+        self._subscribers: Dict[str, Set[WorkflowSubscription]] = {}
+
+    def publish(self, user_id: str, event: Dict[str, Any]) -> Dict[str, Any]:
+        """Stamp an event with the next ID, buffer it and deliver it to live subscribers"""
+        event = {"event_id": next(self._sequence), "at": datetime.utcnow(), **event}
+        recent = self._recent.get(user_id)
+        if recent is None:
+            recent = self._recent[user_id] = deque(maxlen=self.buffer_size)
+        if len(recent) == recent.maxlen:
+            self._evicted[user_id] = recent[0]["event_id"]
+        recent.append(event)
+
+        for subscriber in self._subscribers.get(user_id, ()):
+            if subscriber.lagged or not subscriber.wants(event):
+                continue
+            try:
+                subscriber.queue.put_nowait(event)
+            except asyncio.QueueFull:
+                subscriber.lagged = True
+        return event
+
+    def subscribe(
+        self,
+        user_id: str,
+        workflow_id: Optional[str] = None,
+        last_event_id: Optional[int] = None
+    ) -> WorkflowSubscription:
+        """Subscribe to a user's (or one workflow's) events, replaying any buffered after last_event_id
+
+        The subscription yields a {"type": "resync"} marker when events were
+        missed, either because they already left the replay buffer or because
+        the subscriber fell behind, so the client knows to refetch state.
+        """
+        return WorkflowSubscription(self, user_id, workflow_id, last_event_id)
@@ -0,0 +1,199 @@
+"""
+Workflow Execution Engine
+Bounded worker pool with priorities, per-connection concurrency caps and backpressure
+"""
+
+import asyncio
+import heapq
+import itertools
+import logging
+import os
+import time
+from collections import deque
+from typing import Awaitable, Callable, Deque, Dict, List, Optional
+
+from metrics import (
+    workflow_queue_depth,
+    workflow_queue_wait,
+    workflow_queue_rejections,
+    workflow_inflight
+)
+
+WORKFLOW_WORKERS = int(os.getenv("WORKFLOW_WORKERS", "8"))
+WORKFLOW_QUEUE_MAX = int(os.getenv("WORKFLOW_QUEUE_MAX", "1000"))
+WORKFLOW_PER_CONNECTION_CONCURRENCY = int(os.getenv("WORKFLOW_PER_CONNECTION_CONCURRENCY", "2"))
+
+# Lower values run first
+PRIORITY_IMMEDIATE = 0
+PRIORITY_DRAFT = 1
+
+
+class WorkflowQueueFull(Exception):
+    """Raised when the executor queue is at capacity"""
+
+
+class _QueueEntry:
+    __slots__ = ("workflow_id", "connection_id", "priority", "handler", "enqueued_at", "cancelled")
+
+    def __init__(self, workflow_id: str, connection_id: str, priority: int, handler: Optional[Callable[[str], Awaitable[None]]]):
+        self.workflow_id = workflow_id
+        self.connection_id = connection_id
+        self.priority = priority
+        self.handler = handler
+        self.enqueued_at = time.perf_counter()
+        self.cancelled = False
+
+
+class WorkflowExecutor:
+    """Runs workflow attempts on a fixed number of workers
+
+    Queued entries are ordered by (priority, submission order). An entry whose
+    connection is already at its concurrency cap is parked on that connection
+    instead of occupying a worker, and moves back to the ready queue when one
+    of the connection's running attempts finishes.
+    """
+
+    def __init__(
+        self,
+        handler: Callable[[str], Awaitable[None]],
+        workers: int = WORKFLOW_WORKERS,
+        max_queue: int = WORKFLOW_QUEUE_MAX,
+        per_connection: int = WORKFLOW_PER_CONNECTION_CONCURRENCY
+    ):
+        self.handler = handler
+        self.worker_count = max(1, workers)
+        self.max_queue = max_queue
+        self.per_connection = max(1, per_connection)
+        self.logger = logging.getLogger(__name__)
+
+        self._ready: List = []
+        self._sequence = itertools.count()
+        self._parked: Dict[str, Deque[_QueueEntry]] = {}
+        self._queued: Dict[str, _QueueEntry] = {}
+        self._running: Dict[str, asyncio.Task] = {}
+        self._connection_running: Dict[str, int] = {}
+        self._has_ready = asyncio.Event()
+        self._workers: List[asyncio.Task] = []
+
+        workflow_queue_depth.set_function(lambda: len(self._queued))
+        workflow_inflight.set_function(lambda: len(self._running))
+
+    @property
+    def queued(self) -> int:
+        return len(self._queued)
+
+    @property
+    def running(self) -> int:
+        return len(self._running)
+
+    def is_active(self, workflow_id: str) -> bool:
+        """Whether the workflow is queued or running"""
+        return workflow_id in self._queued or workflow_id in self._running
+
+    def is_full(self) -> bool:
+        return len(self._queued) >= self.max_queue
+
+    def start(self) -> None:
+        """Start the worker tasks"""
+        if self._workers:
+            return
+        self._workers = [
+            asyncio.create_task(self._worker(i), name=f"workflow-worker-{i}")
+            for i in range(self.worker_count)
+        ]
+        self.logger.info(f"Started {self.worker_count} workflow workers")
+
+    async def stop(self) -> None:
+        """Stop the workers and cancel running attempts"""
+        for task in self._workers + list(self._running.values()):
+            task.cancel()
+        await asyncio.gather(*self._workers, *self._running.values(), return_exceptions=True)
+        self._workers = []
+
+    def submit(
+        self,
+        workflow_id: str,
+        connection_id: str,
+        priority: int = PRIORITY_DRAFT,
+        force: bool = False,
+        handler: Optional[Callable[[str], Awaitable[None]]] = None
+    ) -> None:
+        """Queue a workflow attempt
+
+        Raises WorkflowQueueFull when the queue is at capacity, unless force is
+        set; timers re-submitting already accepted work use force so it is
+        never dropped. handler overrides the default handler for this entry,
+        e.g. to run a group of workflows as one job keyed by a group ID.
+        """
+        if self.is_active(workflow_id):
+            return
+        if not force and self.is_full():
+            workflow_queue_rejections.inc()
+            raise WorkflowQueueFull(f"Workflow queue is full ({self.max_queue} queued)")
+
+        self.start()
+        entry = _QueueEntry(workflow_id, connection_id, priority, handler)
+        self._queued[workflow_id] = entry
+        self._push_ready(entry)
+
+    def cancel(self, workflow_id: str) -> bool:
+        """Drop a queued attempt or cancel a running one"""
+        entry = self._queued.pop(workflow_id, None)
+        if entry is not None:
+            # Lazily skipped when popped
+            entry.cancelled = True
+            return True
+        task = self._running.get(workflow_id)
+        if task is not None:
+            task.cancel()
+            return True
+        return False
+
+    def _push_ready(self, entry: _QueueEntry) -> None:
+        heapq.heappush(self._ready, (entry.priority, next(self._sequence), entry))
+        self._has_ready.set()
+
+    async def _next_entry(self) -> _QueueEntry:
+        while True:
+            while self._ready:
+                _, _, entry = heapq.heappop(self._ready)
+                if entry.cancelled:
+                    continue
+                if self._connection_running.get(entry.connection_id, 0) >= self.per_connection:
+                    self._parked.setdefault(entry.connection_id, deque()).append(entry)
+                    continue
+                return entry
+            self._has_ready.clear()
+            await self._has_ready.wait()
+
+    async def _worker(self, index: int) -> None:
+        while True:
+            entry = await self._next_entry()
+            self._queued.pop(entry.workflow_id, None)
+            workflow_queue_wait.observe(time.perf_counter() - entry.enqueued_at)
+
+            connection_id = entry.connection_id
+            self._connection_running[connection_id] = self._connection_running.get(connection_id, 0) + 1
+            task = asyncio.create_task((entry.handler or self.handler)(entry.workflow_id))
+            self._running[entry.workflow_id] = task
+            try:
+                # wait() rather than await so cancelling the attempt does not kill the worker
+                await asyncio.wait([task])
+                if not task.cancelled() and task.exception() is not None:
+                    self.logger.error(f"Workflow {entry.workflow_id} handler raised: {task.exception()}")
+            finally:
+                self._running.pop(entry.workflow_id, None)
+                self._connection_running[connection_id] -= 1
+                if not self._connection_running[connection_id]:
+                    del self._connection_running[connection_id]
+                self._unpark(connection_id)
+
+    def _unpark(self, connection_id: str) -> None:
+        parked = self._parked.get(connection_id)
+        while parked:
+            entry = parked.popleft()
+            if not entry.cancelled:
+                self._push_ready(entry)
+                break
+        if parked is not None and not parked:
+            del self._parked[connection_id]
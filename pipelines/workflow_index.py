@@ -0,0 +1,126 @@
+"""
+Workflow Secondary Indexes
+Per-user and per-user-status workflow IDs kept ordered by creation time for paginated listing
+"""
+
+import base64
+import heapq
+from bisect import bisect_left, insort
+from datetime import datetime, timezone
+from typing import Dict, Iterable, List, Optional, Tuple
+
+IndexKey = Tuple[float, str]
+
+
+def _epoch(value: datetime) -> float:
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.timestamp()
+
+
+def index_key(workflow) -> IndexKey:
+    """Sort key for a workflow: (created_at epoch seconds, id)"""
+    return (_epoch(workflow.created_at), workflow.id)
+
+
+def encode_cursor(key: IndexKey) -> str:
+    """Opaque pagination cursor for the last key of a page"""
+    return base64.urlsafe_b64encode(f"{key[0]!r}|{key[1]}".encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> IndexKey:
+    """Parse a cursor produced by encode_cursor; raises ValueError if malformed"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        created, workflow_id = base64.urlsafe_b64decode(padded.encode()).decode().split("|", 1)
+        return (float(created), workflow_id)
+    except Exception:
+        raise ValueError("Invalid cursor")
+
+
+class WorkflowIndex:
+    """Sorted (created_at, id) lists per user and per (user, status)
+
+    Keys are kept ascending so new workflows append at the end; pages are read
+    newest first by walking backwards from the cursor position, so a page
+    costs O(log n + limit) regardless of how many workflows a user has.
+    """
+
+    def __init__(self):
+        self._by_user: Dict[str, List[IndexKey]] = {}
+        self._by_status: Dict[Tuple[str, str], List[IndexKey]] = {}
+
+    def __len__(self) -> int:
+        return sum(len(keys) for keys in self._by_user.values())
+
+    def users(self) -> List[str]:
+        return list(self._by_user)
+
+    def keys(self, user_id: str, statuses: Iterable[str]) -> List[IndexKey]:
+        """A user's keys across several statuses, oldest first"""
+        return list(heapq.merge(*(self._by_status.get((user_id, status), []) for status in statuses)))
+
+    def add(self, workflow) -> None:
+        key = index_key(workflow)
+        self._insert(self._by_user.setdefault(workflow.user_id, []), key)
+        self._insert(self._by_status.setdefault((workflow.user_id, workflow.status.value), []), key)
+
+    def remove(self, workflow) -> None:
+        key = index_key(workflow)
+        self._delete(self._by_user, workflow.user_id, key)
+        self._delete(self._by_status, (workflow.user_id, workflow.status.value), key)
+
+    def move(self, workflow, previous_status: str) -> None:
+        """Re-file a workflow after a status change"""
+        if previous_status == workflow.status.value:
+            return
+        key = index_key(workflow)
+        self._delete(self._by_status, (workflow.user_id, previous_status), key)
+        self._insert(self._by_status.setdefault((workflow.user_id, workflow.status.value), []), key)
+
+    def page(
+        self,
+        user_id: str,
+        status: Optional[str] = None,
+        limit: Optional[int] = None,
+        before: Optional[IndexKey] = None,
+        since: Optional[float] = None
+    ) -> Tuple[List[str], Optional[IndexKey]]:
+        """Workflow IDs newest first, and the cursor key for the next page (None on the last page)
+
+        before excludes keys at or after the given key (the previous page's
+        cursor); since excludes workflows created before that epoch time.
+        """
+        keys = self._by_status.get((user_id, status), []) if status else self._by_user.get(user_id, [])
+        position = bisect_left(keys, before) if before is not None else len(keys)
+
+        workflow_ids: List[str] = []
+        last_key: Optional[IndexKey] = None
+        while position > 0 and (limit is None or len(workflow_ids) < limit):
+            position -= 1
+            key = keys[position]
+            if since is not None and key[0] < since:
+                return workflow_ids, None
+            workflow_ids.append(key[1])
+            last_key = key
+
+        has_more = position > 0 and (since is None or keys[position - 1][0] >= since)
+        return workflow_ids, last_key if has_more else None
+
+    @staticmethod
+    def _insert(keys: List[IndexKey], key: IndexKey) -> None:
+        if not keys or keys[-1] < key:
+            keys.append(key)
+        else:
+            insort(keys, key)
+
+    @staticmethod
+    def _delete(index: Dict, bucket, key: IndexKey) -> None:
+        keys = index.get(bucket)
+        if not keys:
+            return
+        position = bisect_left(keys, key)
+        if position < len(keys) and keys[position] == key:
+            del keys[position]
+        if not keys:
+            del index[bucket]
@@ -0,0 +1,184 @@
+"""
+Workflow Lease Coordinator
+Shared-queue mode: worker processes claim due workflows from the SQLite store under expiring, fenced leases
+"""
+
+import asyncio
+import logging
+import os
+import socket
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from metrics import workflow_lease_reclaims, workflow_leases_held, workflow_leases_lost
+from workflow_executor import WorkflowExecutor
+from workflow_store import WorkflowStore
+
+# Run workflows from the queue shared through CONTENT_WORKFLOW_DB rather than only in the process that created them
+WORKFLOW_SHARED_QUEUE = os.getenv("WORKFLOW_SHARED_QUEUE", "false").lower() in ("1", "true", "yes")
+# How long a claimed workflow stays leased to a worker without a heartbeat
+WORKFLOW_LEASE_SECONDS = float(os.getenv("WORKFLOW_LEASE_SECONDS", "30"))
+# How often a worker polls the shared queue for due workflows
+WORKFLOW_LEASE_POLL_INTERVAL = float(os.getenv("WORKFLOW_LEASE_POLL_INTERVAL", "0.5"))
+# Lease owner name; must be unique per worker process
+WORKFLOW_WORKER_ID = os.getenv("WORKFLOW_WORKER_ID") or f"{socket.gethostname()}:{os.getpid()}"
+
+
+class LeaseLost(Exception):
+    """Raised when a worker no longer holds the lease for the attempt it is running"""
+
+
+class WorkflowLeaseCoordinator:
+    """Claims workflows from the shared queue, keeps their leases alive and settles them
+
+    Each claim leases a due workflow to this worker for lease_seconds and
+    increments its fence token. One heartbeat task renews every held lease
+    at a third of the lease time. A lease that cannot be renewed, because it
+    expired and another worker claimed it or because the workflow was
+    cancelled, is dropped and its attempt cancelled, so each claim runs at
+    most once. A worker that dies simply stops renewing, and its workflows
+    are claimed again once their leases expire.
+
+    adopt(snapshot) loads a claimed workflow into memory and returns its
+    (connection ID, priority), or None if it should not run. due_at(workflow_id)
+    gives the epoch time to requeue a workflow at once its attempt ends, or
+    None when it is done.
+    """
+
+    def __init__(
+        self,
+        store: WorkflowStore,
+        executor: WorkflowExecutor,
+        adopt: Callable[[Dict[str, Any]], Optional[Tuple[str, int]]],
+        due_at: Callable[[str], Optional[float]],
+        owner: str = WORKFLOW_WORKER_ID,
+        lease_seconds: float = WORKFLOW_LEASE_SECONDS,
+        poll_interval: float = WORKFLOW_LEASE_POLL_INTERVAL
+    ):
+        self.store = store
+        self.executor = executor
+        self.adopt = adopt
+        self.due_at = due_at
+        self.owner = owner
+        self.lease_seconds = lease_seconds
+        self.poll_interval = poll_interval
+        self.logger = logging.getLogger(__name__)
+
+        # Workflow ID -> fence token of the lease this worker holds
+        self._held: Dict[str, int] = {}
+        self._wakeup = asyncio.Event()
+        self._tasks: List[asyncio.Task] = []
+        # Fences this worker's own snapshot writes against workflows leased elsewhere
+        store.lease_owner = owner
+
+        workflow_leases_held.set_function(lambda: len(self._held))
+
+    def holds(self, workflow_id: str) -> bool:
+        return workflow_id in self._held
+
+    def start(self) -> None:
+        """Start claiming from the shared queue and renewing held leases"""
+        if self._tasks:
+            return
+        self._tasks = [
+            asyncio.create_task(self._claim_loop(), name="workflow-lease-claim"),
+            asyncio.create_task(self._heartbeat_loop(), name="workflow-lease-heartbeat")
+        ]
+        self.logger.info(f"Claiming shared-queue workflows as {self.owner}")
+
+    async def stop(self) -> None:
+        """Stop claiming and renewing; held leases are settled by release_all()"""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def release_all(self) -> None:
+        """Hand back leases whose attempts never ran, so other workers need not wait for them to expire"""
+        for workflow_id in list(self._held):
+            await self._settle(workflow_id)
+
+    def wake(self) -> None:
+        """Claim now rather than at the next poll"""
+        self._wakeup.set()
+
+    async def claim(self) -> int:
+        """Lease as many due workflows as there are free workers and queue them on the executor"""
+        capacity = self.executor.worker_count - len(self._held)
+        claimed = await self.store.claim_leases(self.owner, capacity, self.lease_seconds)
+        for record, fence, reclaimed in claimed:
+            workflow_id = record["id"]
+            self._held[workflow_id] = fence
+            if reclaimed:
+                workflow_lease_reclaims.inc()
+                self.logger.info(f"Reclaimed workflow {workflow_id} after its lease expired")
+            try:
+                target = self.adopt(record)
+            except Exception as e:
+                self.logger.error(f"Skipping unreadable shared-queue workflow {workflow_id}: {str(e)}")
+                target = None
+            if target is None:
+                await self._settle(workflow_id)
+                continue
+            connection_id, priority = target
+            self.executor.submit(workflow_id, connection_id, priority, force=True, handler=self._run)
+        return len(claimed)
+
+    async def confirm(self, workflow_id: str) -> None:
+        """Renew the lease right before a side effect; raises LeaseLost if another worker has taken over"""
+        fence = self._held.get(workflow_id)
+        if fence is None or await self.store.renew_leases(self.owner, [(workflow_id, fence)], self.lease_seconds):
+            if self._held.pop(workflow_id, None) is not None:
+                workflow_leases_lost.inc()
+            raise LeaseLost(f"Lease on workflow {workflow_id} is no longer held by {self.owner}")
+
+    async def _run(self, workflow_id: str) -> None:
+        """Executor handler: one attempt under the lease, then release or requeue it"""
+        try:
+            await self.executor.handler(workflow_id)
+        finally:
+            await self._settle(workflow_id)
+
+    async def _settle(self, workflow_id: str) -> None:
+        fence = self._held.pop(workflow_id, None)
+        if fence is None:
+            # Lost while running; the new holder owns the outcome
+            return
+        try:
+            await self.store.release_lease(workflow_id, self.owner, fence, self.due_at(workflow_id))
+        except Exception as e:
+            # The lease expires on its own and the workflow is claimed again
+            self.logger.error(f"Failed to release lease on workflow {workflow_id}: {str(e)}")
+        self._wakeup.set()
+
+    def _lose(self, workflow_id: str, fence: int) -> None:
+        if self._held.get(workflow_id) != fence:
+            return
+        del self._held[workflow_id]
+        workflow_leases_lost.inc()
+        self.logger.warning(f"Lost lease on workflow {workflow_id}, abandoning its attempt")
+        self.executor.cancel(workflow_id)
+
+    async def _claim_loop(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            try:
+                await self.claim()
+            except Exception as e:
+                self.logger.error(f"Claiming shared-queue workflows failed: {str(e)}")
+
+    async def _heartbeat_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.lease_seconds / 3)
+            held = list(self._held.items())
+            try:
+                lost = await self.store.renew_leases(self.owner, held, self.lease_seconds)
+            except Exception as e:
+                self.logger.error(f"Renewing workflow leases failed: {str(e)}")
+                continue
+            fences = dict(held)
+            for workflow_id in lost:
+                self._lose(workflow_id, fences[workflow_id])
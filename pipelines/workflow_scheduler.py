@@ -0,0 +1,137 @@
+"""
+Workflow Scheduler
+Single timer loop over a min-heap of due times for scheduled publishes and retries
+"""
+
+import asyncio
+import heapq
+import itertools
+import logging
+import time
+from datetime import datetime, timezone
+from typing import Callable, Dict, List, Optional
+
+from metrics import Gauge, workflow_scheduled
+
+
+class _ScheduledEntry:
+    __slots__ = ("workflow_id", "due", "cancelled")
+
+    def __init__(self, workflow_id: str, due: float):
+        self.workflow_id = workflow_id
+        self.due = due
+        self.cancelled = False
+
+
+def _epoch(due_at: datetime) -> float:
+    """Epoch seconds for a naive UTC (or aware) datetime"""
+    if due_at.tzinfo is None:
+        due_at = due_at.replace(tzinfo=timezone.utc)
+    return due_at.timestamp()
+
+
+class WorkflowScheduler:
+    """Fires on_due(workflow_id) when a workflow's due time arrives
+
+    One background task sleeps until the earliest due time instead of one
+    parked coroutine per workflow. schedule() and reschedule are O(log n);
+    cancel() is O(1) and leaves a tombstone that is skipped when popped, with
+    the heap rebuilt once tombstones outnumber live entries.
+    """
+
+    COMPACT_THRESHOLD = 1024
+
+    def __init__(self, on_due: Callable[[str], None], gauge: Optional[Gauge] = workflow_scheduled):
+        self.on_due = on_due
+        self.logger = logging.getLogger(__name__)
+        self._heap: List = []
+        self._sequence = itertools.count()
+        self._entries: Dict[str, _ScheduledEntry] = {}
+        self._tombstones = 0
+        self._changed = asyncio.Event()
+        self._runner: Optional[asyncio.Task] = None
+
+        if gauge is not None:
+            gauge.set_function(lambda: len(self._entries))
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, workflow_id: str) -> bool:
+        return workflow_id in self._entries
+
+    def due_at(self, workflow_id: str) -> Optional[datetime]:
+        """When a scheduled workflow will fire, as naive UTC"""
+        entry = self._entries.get(workflow_id)
+        if entry is None:
+            return None
+        return datetime.fromtimestamp(entry.due, tz=timezone.utc).replace(tzinfo=None)
+
+    def start(self) -> None:
+        """Start the timer loop"""
+        if self._runner is None:
+            self._runner = asyncio.create_task(self._run(), name="workflow-scheduler")
+
+    async def stop(self) -> None:
+        """Stop the timer loop; scheduled entries are kept"""
+        if self._runner is None:
+            return
+        self._runner.cancel()
+        try:
+            await self._runner
+        except asyncio.CancelledError:
+            pass
+        self._runner = None
+
+    def schedule(self, workflow_id: str, due_at: datetime) -> None:
+        """Schedule a workflow, replacing any existing schedule for it"""
+        self.start()
+        self.cancel(workflow_id)
+        entry = _ScheduledEntry(workflow_id, _epoch(due_at))
+        self._entries[workflow_id] = entry
+        heapq.heappush(self._heap, (entry.due, next(self._sequence), entry))
+        # Only a new earliest deadline changes how long the loop should sleep
+        if self._heap[0][2] is entry:
+            self._changed.set()
+
+    def cancel(self, workflow_id: str) -> bool:
+        """Remove a workflow's schedule"""
+        entry = self._entries.pop(workflow_id, None)
+        if entry is None:
+            return False
+        entry.cancelled = True
+        self._tombstones += 1
+        if self._tombstones > self.COMPACT_THRESHOLD and self._tombstones > len(self._entries):
+            self._compact()
+        return True
+
+    def _compact(self) -> None:
+        self._heap = [item for item in self._heap if not item[2].cancelled]
+        heapq.heapify(self._heap)
+        self._tombstones = 0
+
+    def _pop_due(self, now: float) -> List[str]:
+        due: List[str] = []
+        while self._heap and (self._heap[0][2].cancelled or self._heap[0][0] <= now):
+            _, _, entry = heapq.heappop(self._heap)
+            if entry.cancelled:
+                self._tombstones -= 1
+                continue
+            del self._entries[entry.workflow_id]
+            due.append(entry.workflow_id)
+        return due
+
+    async def _run(self) -> None:
+        while True:
+            for workflow_id in self._pop_due(time.time()):
+                try:
+                    self.on_due(workflow_id)
+                except Exception as e:
+                    self.logger.error(f"Scheduler callback failed for workflow {workflow_id}: {str(e)}")
+
+            self._changed.clear()
+            timeout = max(0.0, self._heap[0][0] - time.time()) if self._heap else None
+            try:
+                await asyncio.wait_for(self._changed.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
@@ -0,0 +1,538 @@
+"""
+Durable Workflow Store
+Persists content workflows and their state transitions to SQLite with batched write-behind
+"""
+
+import asyncio
+import json
+import logging
+import os
+import sqlite3
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from metrics import sqlite_query_duration
+
+# Writes are coalesced for this long before being committed in one transaction
+WORKFLOW_STORE_FLUSH_INTERVAL = float(os.getenv("WORKFLOW_STORE_FLUSH_INTERVAL", "0.05"))
+# A flush is triggered early once this many workflow snapshots are pending
+WORKFLOW_STORE_BATCH_SIZE = int(os.getenv("WORKFLOW_STORE_BATCH_SIZE", "500"))
+
+
+class WorkflowStore:
+    """SQLite-backed store for workflow snapshots, a state-transition log and published-post fingerprints
+
+    save() and log_transition() only queue the change; a background task
+    commits queued changes in a single transaction every flush interval, so
+    persistence adds no disk latency to the request path. Snapshots for the
+    same workflow are coalesced and serialized only at flush time, so a burst
+    of transitions costs one write of the latest state.
+
+    In shared-queue mode (lease_owner set) the store also holds the queue of
+    workflow leases that worker processes claim, and a snapshot write is
+    skipped while another worker holds a live lease on that workflow, so a
+    worker that lost its lease cannot overwrite the new holder's state.
+    """
+
+    def __init__(self, db_path: str):
+        self.db_path = Path(db_path)
+        self.logger = logging.getLogger(__name__)
+        self._conn: Optional[sqlite3.Connection] = None
+        self._pending: Dict[str, Any] = {}
+        self._pending_transitions: List[Tuple[str, Optional[str], str, str, Optional[str]]] = []
+        self._pending_posts: Dict[Tuple[str, int], Dict[str, str]] = {}
+        # Workflow ID -> (connection ID, priority, available at, keep existing), or None to drop its lease
+        self._pending_leases: Dict[str, Optional[Tuple[str, int, float, bool]]] = {}
+        # This process's worker ID once shared-queue mode is enabled
+        self.lease_owner: Optional[str] = None
+        self._wakeup = asyncio.Event()
+        self._flush_lock = asyncio.Lock()
+        self._flusher: Optional[asyncio.Task] = None
+
+    @property
+    def started(self) -> bool:
+        return self._flusher is not None
+
+    def _connect(self) -> sqlite3.Connection:
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        # Only ever used from one worker thread at a time, serialized by _flush_lock
+        conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS content_workflows (
+                id TEXT PRIMARY KEY,
+                user_id TEXT NOT NULL,
+                connection_id TEXT NOT NULL,
+                status TEXT NOT NULL,
+                created_at TEXT NOT NULL,
+                updated_at TEXT NOT NULL,
+                data TEXT NOT NULL
+            )
+        """)
+        conn.execute("""
+            CREATE INDEX IF NOT EXISTS idx_content_workflows_status
+            ON content_workflows (status)
+        """)
+        # Listings are served from the in-memory WorkflowIndex; these only slowed every flush
+        conn.execute("DROP INDEX IF EXISTS idx_content_workflows_user_created")
+        conn.execute("DROP INDEX IF EXISTS idx_content_workflows_user_status_created")
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS workflow_transitions (
+                seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                workflow_id TEXT NOT NULL,
+                from_status TEXT,
+                to_status TEXT NOT NULL,
+                at TEXT NOT NULL,
+                detail TEXT
+            )
+        """)
+        conn.execute("""
+            CREATE INDEX IF NOT EXISTS idx_workflow_transitions_workflow
+            ON workflow_transitions (workflow_id, seq)
+        """)
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS published_posts (
+                connection_id TEXT NOT NULL,
+                post_id INTEGER NOT NULL,
+                fields TEXT NOT NULL,
+                updated_at TEXT NOT NULL,
+                PRIMARY KEY (connection_id, post_id)
+            )
+        """)
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS workflow_leases (
+                workflow_id TEXT PRIMARY KEY,
+                connection_id TEXT NOT NULL,
+                priority INTEGER NOT NULL,
+                available_at REAL NOT NULL,
+                lease_owner TEXT,
+                lease_expires REAL,
+                fence INTEGER NOT NULL DEFAULT 0
+            )
+        """)
+        conn.execute("""
+            CREATE INDEX IF NOT EXISTS idx_workflow_leases_due
+            ON workflow_leases (priority, available_at)
+        """)
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS publish_windows (
+                connection_id TEXT PRIMARY KEY,
+                settings TEXT NOT NULL,
+                updated_at TEXT NOT NULL
+            )
+        """)
+        conn.commit()
+        return conn
+
+    async def start(self) -> None:
+        """Open the database and start the background flusher"""
+        if self._flusher is not None:
+            return
+        self._conn = await asyncio.to_thread(self._connect)
+        self._flusher = asyncio.create_task(self._flush_loop())
+        self.logger.info(f"Workflow store opened at {self.db_path}")
+
+    async def stop(self) -> None:
+        """Flush outstanding writes and close the database"""
+        if self._flusher is None:
+            return
+        self._flusher.cancel()
+        try:
+            await self._flusher
+        except asyncio.CancelledError:
+            pass
+        self._flusher = None
+        await self.flush()
+        conn, self._conn = self._conn, None
+        if conn is not None:
+            await asyncio.to_thread(conn.close)
+
+    def save(self, workflow: Any) -> None:
+        """Queue a workflow (anything with .id and .to_dict()) for persistence"""
+        if self._flusher is None:
+            return
+        self._pending[workflow.id] = workflow
+        if len(self._pending) >= WORKFLOW_STORE_BATCH_SIZE:
+            self._wakeup.set()
+
+    def log_transition(self, workflow_id: str, from_status: Optional[str], to_status: str, detail: Optional[str] = None) -> None:
+        """Queue a state transition for the transition log"""
+        if self._flusher is None:
+            return
+        self._pending_transitions.append(
+            (workflow_id, from_status, to_status, datetime.utcnow().isoformat(), detail)
+        )
+
+    def save_post_fingerprint(self, connection_id: str, post_id: int, fingerprint: Dict[str, str]) -> None:
+        """Queue the per-field digests of what was last published to a post"""
+        if self._flusher is None:
+            return
+        self._pending_posts[(connection_id, post_id)] = fingerprint
+
+    def offer_lease(self, workflow_id: str, connection_id: str, priority: int, available_at: float, keep_existing: bool = False) -> None:
+        """Queue a workflow for any worker to claim once available_at (epoch seconds) has passed
+
+        Written in the same transaction as the workflow's pending snapshot, so
+        a worker never claims a workflow it cannot read. A live lease held by
+        a worker is left alone; keep_existing also leaves an unleased entry's
+        due time and priority unchanged.
+        """
+        if self._flusher is None:
+            return
+        self._pending_leases[workflow_id] = (connection_id, priority, available_at, keep_existing)
+        self._wakeup.set()
+
+    def drop_lease(self, workflow_id: str) -> None:
+        """Queue removal of a workflow from the shared queue, revoking any lease held on it"""
+        if self._flusher is None:
+            return
+        self._pending_leases[workflow_id] = None
+
+    async def claim_leases(self, owner: str, limit: int, lease_seconds: float) -> List[Tuple[Dict[str, Any], int, bool]]:
+        """Lease up to limit due workflows to owner
+
+        Unleased entries and entries whose lease has expired are both
+        claimable; every claim increments the entry's fence token. Returns
+        (snapshot, fence, reclaimed) for each claimed workflow, highest
+        priority and longest-due first.
+        """
+        if self._conn is None or limit <= 0:
+            return []
+        await self.flush()
+
+        def _claim() -> List[Tuple[Dict[str, Any], int, bool]]:
+            now = time.time()
+            with sqlite_query_duration.labels("lease_claim").time():
+                # IMMEDIATE takes the write lock up front, so two processes cannot claim the same row
+                self._conn.execute("BEGIN IMMEDIATE")
+                try:
+                    rows = self._conn.execute("""
+                        SELECT l.workflow_id, l.fence, l.lease_owner, w.data
+                        FROM workflow_leases l JOIN content_workflows w ON w.id = l.workflow_id
+                        WHERE l.available_at <= ? AND (l.lease_owner IS NULL OR l.lease_expires < ?)
+                        ORDER BY l.priority, l.available_at
+                        LIMIT ?
+                    """, (now, now, limit)).fetchall()
+                    self._conn.executemany("""
+                        UPDATE workflow_leases SET lease_owner = ?, lease_expires = ?, fence = fence + 1
+                        WHERE workflow_id = ?
+                    """, [(owner, now + lease_seconds, row[0]) for row in rows])
+                    self._conn.execute("COMMIT")
+                except BaseException:
+                    self._conn.execute("ROLLBACK")
+                    raise
+            return [(json.loads(row[3]), row[1] + 1, row[2] is not None) for row in rows]
+
+        async with self._flush_lock:
+            return await asyncio.to_thread(_claim)
+
+    async def renew_leases(self, owner: str, leases: List[Tuple[str, int]], lease_seconds: float) -> List[str]:
+        """Extend leases still held by owner at the given fences; returns the workflow IDs whose lease was lost"""
+        if self._conn is None or not leases:
+            return []
+
+        def _renew() -> List[str]:
+            expires = time.time() + lease_seconds
+            lost = []
+            with sqlite_query_duration.labels("lease_renew").time(), self._conn:
+                for workflow_id, fence in leases:
+                    cursor = self._conn.execute("""
+                        UPDATE workflow_leases SET lease_expires = ?
+                        WHERE workflow_id = ? AND lease_owner = ? AND fence = ?
+                    """, (expires, workflow_id, owner, fence))
+                    if cursor.rowcount == 0:
+                        lost.append(workflow_id)
+            return lost
+
+        async with self._flush_lock:
+            return await asyncio.to_thread(_renew)
+
+    async def release_lease(self, workflow_id: str, owner: str, fence: int, available_at: Optional[float]) -> bool:
+        """End a lease after its attempt: requeue the workflow at available_at, or remove it when None
+
+        The workflow's pending snapshot is committed first, so the next
+        claimer sees the outcome of this attempt. Does nothing, and returns
+        False, if the lease was already lost.
+        """
+        if self._conn is None:
+            return False
+        await self.flush()
+
+        def _release() -> bool:
+            with sqlite_query_duration.labels("lease_release").time(), self._conn:
+                if available_at is None:
+                    cursor = self._conn.execute(
+                        "DELETE FROM workflow_leases WHERE workflow_id = ? AND lease_owner = ? AND fence = ?",
+                        (workflow_id, owner, fence)
+                    )
+                else:
+                    cursor = self._conn.execute("""
+                        UPDATE workflow_leases SET lease_owner = NULL, lease_expires = NULL, available_at = ?
+                        WHERE workflow_id = ? AND lease_owner = ? AND fence = ?
+                    """, (available_at, workflow_id, owner, fence))
+            return cursor.rowcount > 0
+
+        async with self._flush_lock:
+            return await asyncio.to_thread(_release)
+
+    async def load(self, workflow_id: str) -> Optional[Dict[str, Any]]:
+        """Read one stored workflow snapshot"""
+        if self._conn is None:
+            return None
+        await self.flush()
+
+        def _read() -> Optional[Dict[str, Any]]:
+            with sqlite_query_duration.labels("workflow_read").time():
+                row = self._conn.execute("SELECT data FROM content_workflows WHERE id = ?", (workflow_id,)).fetchone()
+            return json.loads(row[0]) if row else None
+
+        async with self._flush_lock:
+            return await asyncio.to_thread(_read)
+
+    async def get_post_fingerprint(self, connection_id: str, post_id: int) -> Optional[Dict[str, str]]:
+        """Per-field digests last saved for a post, or None if it was never published through the store"""
+        if self._conn is None:
+            return None
+        pending = self._pending_posts.get((connection_id, post_id))
+        if pending is not None:
+            return pending
+
+        def _read() -> Optional[Dict[str, str]]:
+            with sqlite_query_duration.labels("post_fingerprint_read").time():
+                row = self._conn.execute(
+                    "SELECT fields FROM published_posts WHERE connection_id = ? AND post_id = ?",
+                    (connection_id, post_id)
+                ).fetchone()
+            return json.loads(row[0]) if row else None
+
+        async with self._flush_lock:
+            return await asyncio.to_thread(_read)
+
+    async def load_publish_windows(self) -> Dict[str, Dict[str, Any]]:
+        """Publish window settings saved by site owners, keyed by connection ID"""
+        if self._conn is None:
+            return {}
+
+        def _read() -> Dict[str, Dict[str, Any]]:
+            with sqlite_query_duration.labels("publish_window_read").time():
+                cursor = self._conn.execute("SELECT connection_id, settings FROM publish_windows")
+                return {row[0]: json.loads(row[1]) for row in cursor.fetchall()}
+
+        async with self._flush_lock:
+            return await asyncio.to_thread(_read)
+
+    async def save_publish_window(self, connection_id: str, settings: Optional[Dict[str, Any]]) -> None:
+        """Save a site owner's publish window settings for a connection, or remove them with None"""
+        if self._conn is None:
+            return
+
+        def _write() -> None:
+            with sqlite_query_duration.labels("publish_window_write").time(), self._conn:
+                if settings is None:
+                    self._conn.execute("DELETE FROM publish_windows WHERE connection_id = ?", (connection_id,))
+                else:
+                    self._conn.execute("""
+                        INSERT INTO publish_windows (connection_id, settings, updated_at)
+                        VALUES (?, ?, ?)
+                        ON CONFLICT(connection_id) DO UPDATE SET
+                            settings = excluded.settings,
+                            updated_at = excluded.updated_at
+                    """, (connection_id, json.dumps(settings), datetime.utcnow().isoformat()))
+
+        async with self._flush_lock:
+            await asyncio.to_thread(_write)
+
+    async def _flush_loop(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=WORKFLOW_STORE_FLUSH_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            try:
+                await self.flush()
+            except Exception as e:
+                self.logger.error(f"Workflow store flush failed: {str(e)}")
+
+    async def flush(self) -> None:
+        """Commit all queued snapshots and transitions in one transaction"""
+        async with self._flush_lock:
+            if not self._pending and not self._pending_transitions and not self._pending_posts and not self._pending_leases:
+                return
+            if self._conn is None:
+                return
+            snapshots, self._pending = self._pending, {}
+            transitions, self._pending_transitions = self._pending_transitions, []
+            posts, self._pending_posts = self._pending_posts, {}
+            leases, self._pending_leases = self._pending_leases, {}
+            # Snapshot on the loop thread so the worker never sees a workflow mid-update
+            records = [workflow.to_dict() for workflow in snapshots.values()]
+            try:
+                await asyncio.to_thread(self._write, records, transitions, posts, leases)
+            except Exception:
+                # Put the batch back so the next flush retries it, without
+                # clobbering snapshots queued while this one was in flight
+                for workflow_id, workflow in snapshots.items():
+                    self._pending.setdefault(workflow_id, workflow)
+                self._pending_transitions[:0] = transitions
+                for key, fingerprint in posts.items():
+                    self._pending_posts.setdefault(key, fingerprint)
+                for workflow_id, lease in leases.items():
+                    self._pending_leases.setdefault(workflow_id, lease)
+                raise
+
+    def _write(
+        self,
+        records: List[Dict[str, Any]],
+        transitions: List[Tuple],
+        posts: Dict[Tuple[str, int], Dict[str, str]],
+        leases: Dict[str, Optional[Tuple[str, int, float, bool]]]
+    ) -> None:
+        rows = [
+            (
+                r["id"], r["user_id"], r["connection_id"], r["status"],
+                r["created_at"], r["updated_at"], json.dumps(r)
+            )
+            for r in records
+        ]
+        now = time.time()
+        with sqlite_query_duration.labels("workflow_flush").time():
+            with self._conn:
+                # Drops first: revoking a lease is what lets this process's own snapshot through
+                self._conn.executemany(
+                    "DELETE FROM workflow_leases WHERE workflow_id = ?",
+                    [(workflow_id,) for workflow_id, lease in leases.items() if lease is None]
+                )
+                if self.lease_owner is None:
+                    self._conn.executemany("""
+                        INSERT INTO content_workflows (id, user_id, connection_id, status, created_at, updated_at, data)
+                        VALUES (?, ?, ?, ?, ?, ?, ?)
+                        ON CONFLICT(id) DO UPDATE SET
+                            status = excluded.status,
+                            updated_at = excluded.updated_at,
+                            data = excluded.data
+                    """, rows)
+                else:
+                    self._conn.executemany("""
+                        INSERT INTO content_workflows (id, user_id, connection_id, status, created_at, updated_at, data)
+                        VALUES (?, ?, ?, ?, ?, ?, ?)
+                        ON CONFLICT(id) DO UPDATE SET
+                            status = excluded.status,
+                            updated_at = excluded.updated_at,
+                            data = excluded.data
+                        WHERE NOT EXISTS (
+                            SELECT 1 FROM workflow_leases
+                            WHERE workflow_id = excluded.id AND lease_owner != ? AND lease_expires >= ?
+                        )
+                    """, [row + (self.lease_owner, now) for row in rows])
+                self._conn.executemany("""
+                    INSERT INTO workflow_transitions (workflow_id, from_status, to_status, at, detail)
+                    VALUES (?, ?, ?, ?, ?)
+                """, transitions)
+                updated = datetime.utcnow().isoformat()
+                self._conn.executemany("""
+                    INSERT INTO published_posts (connection_id, post_id, fields, updated_at)
+                    VALUES (?, ?, ?, ?)
+                    ON CONFLICT(connection_id, post_id) DO UPDATE SET
+                        fields = excluded.fields,
+                        updated_at = excluded.updated_at
+                """, [(connection_id, post_id, json.dumps(fingerprint), updated) for (connection_id, post_id), fingerprint in posts.items()])
+                self._conn.executemany("""
+                    INSERT INTO workflow_leases (workflow_id, connection_id, priority, available_at)
+                    VALUES (?, ?, ?, ?)
+                    ON CONFLICT(workflow_id) DO UPDATE SET
+                        connection_id = excluded.connection_id,
+                        priority = excluded.priority,
+                        available_at = excluded.available_at
+                    WHERE NOT ? AND (lease_owner IS NULL OR lease_expires < ?)
+                """, [
+                    (workflow_id, lease[0], lease[1], lease[2], lease[3], now)
+                    for workflow_id, lease in leases.items() if lease is not None
+                ])
+
+    async def load_all(self) -> List[Dict[str, Any]]:
+        """Load every stored workflow snapshot"""
+        def _read() -> List[Dict[str, Any]]:
+            with sqlite_query_duration.labels("workflow_load").time():
+                cursor = self._conn.execute("SELECT data FROM content_workflows")
+                return [json.loads(row[0]) for row in cursor.fetchall()]
+
+        async with self._flush_lock:
+            return await asyncio.to_thread(_read)
+
+    async def get_transitions(self, workflow_id: str) -> List[Dict[str, Any]]:
+        """Get the transition log for a workflow, oldest first"""
+        if self._conn is None:
+            return []
+        await self.flush()
+
+        def _read() -> List[Dict[str, Any]]:
+            cursor = self._conn.execute("""
+                SELECT from_status, to_status, at, detail
+                FROM workflow_transitions
+                WHERE workflow_id = ?
+                ORDER BY seq
+            """, (workflow_id,))
+            return [
+                {"from_status": row[0], "to_status": row[1], "at": row[2], "detail": row[3]}
+                for row in cursor.fetchall()
+            ]
+
+        async with self._flush_lock:
+            return await asyncio.to_thread(_read)
+
+    async def get_transitions_many(self, workflow_ids: List[str]) -> Dict[str, List[Dict[str, Any]]]:
+        """Get the transition logs for several workflows in one query, keyed by workflow ID"""
+        transitions: Dict[str, List[Dict[str, Any]]] = {workflow_id: [] for workflow_id in workflow_ids}
+        if self._conn is None or not workflow_ids:
+            return transitions
+        await self.flush()
+
+        def _read() -> None:
+            with sqlite_query_duration.labels("transition_read").time(), self._conn:
+                self._stage_ids(workflow_ids)
+                cursor = self._conn.execute("""
+                    SELECT workflow_id, from_status, to_status, at, detail
+                    FROM workflow_transitions
+                    WHERE workflow_id IN (SELECT id FROM staged_ids)
+                    ORDER BY seq
+                """)
+                for row in cursor.fetchall():
+                    transitions[row[0]].append(
+                        {"from_status": row[1], "to_status": row[2], "at": row[3], "detail": row[4]}
+                    )
+
+        async with self._flush_lock:
+            await asyncio.to_thread(_read)
+        return transitions
+
+    async def delete(self, workflow_ids: List[str]) -> None:
+        """Delete workflows, their transition logs and any shared-queue entries"""
+        if self._conn is None or not workflow_ids:
+            return
+
+        def _delete() -> None:
+            with sqlite_query_duration.labels("workflow_delete").time():
+                with self._conn:
+                    self._stage_ids(workflow_ids)
+                    self._conn.execute("DELETE FROM workflow_transitions WHERE workflow_id IN (SELECT id FROM staged_ids)")
+                    self._conn.execute("DELETE FROM workflow_leases WHERE workflow_id IN (SELECT id FROM staged_ids)")
+                    self._conn.execute("DELETE FROM content_workflows WHERE id IN (SELECT id FROM staged_ids)")
+
+        async with self._flush_lock:
+            # Drop queued writes so the next flush does not resurrect the rows
+            for workflow_id in workflow_ids:
+                self._pending.pop(workflow_id, None)
+                self._pending_leases.pop(workflow_id, None)
+            deleted = set(workflow_ids)
+            self._pending_transitions = [t for t in self._pending_transitions if t[0] not in deleted]
+            await asyncio.to_thread(_delete)
+
+    def _stage_ids(self, workflow_ids: List[str]) -> None:
+        """Load IDs into a temp table so bulk reads and deletes stay index lookups"""
+        self._conn.execute("CREATE TEMP TABLE IF NOT EXISTS staged_ids (id TEXT PRIMARY KEY)")
+        self._conn.execute("DELETE FROM staged_ids")
+        self._conn.executemany("INSERT OR IGNORE INTO staged_ids (id) VALUES (?)", [(i,) for i in workflow_ids])
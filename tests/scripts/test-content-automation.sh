@@ -8,6 +8,7 @@ set -e
 # Configuration
 PIPELINE_SERVICE_URL="${PIPELINE_SERVICE_URL:-http://localhost:9099}"
 LOADBALANCER_IP="${LOADBALANCER_IP:-}"
+PIPELINES_DIR="${PIPELINES_DIR:-$(cd "$(dirname "$0")/../../pipelines" && pwd)}"
 
 # Colors for output
 RED='\033[0;31m'
@@ -228,6 +229,117 @@ except Exception as e:
     echo ""
 }
 
+test_reschedule_batched_workflow() {
+    log_section "Testing Reschedule of a Batched Workflow"
+    echo ""
+    
+    # A workflow released with others waits in a batch job; rescheduling must take it out
+    PYTHONPATH="$PIPELINES_DIR" python3 -c "
+import asyncio
+from datetime import datetime, timedelta
+from content_automation import ContentAutomationService
+from publish_window import PublishWindows
+
+async def main():
+    service = ContentAutomationService(shared_queue=False, publish_windows=PublishWindows())
+    items = [{'connection_id': 'wp_test', 'title': f'Post {i}', 'content': f'Body {i}'} for i in range(3)]
+    batch, ids = await service.create_batch('test-user', items)
+    (job_id, queued), = service._batch_jobs.items()
+    assert queued == ids, 'batch job should hold the whole group'
+    
+    later = datetime.utcnow() + timedelta(hours=1)
+    await service.reschedule_workflow(ids[0], later)
+    assert service._batch_jobs[job_id] == ids[1:], 'rescheduled workflow is still in the batch job'
+    assert ids[0] in service.scheduler, 'rescheduled workflow is not armed for its new time'
+    print('✅ Rescheduled workflow left its batch job')
+    
+    await service.cancel_workflow(ids[1])
+    await service.reschedule_workflow(ids[2], later)
+    assert job_id not in service._batch_jobs and not service.executor.is_active(job_id), 'empty batch job still queued'
+    print('✅ Emptied batch job dropped from the executor')
+
+asyncio.run(main())
+" && log_success "Batched workflows reschedule correctly" || log_error "Rescheduling a batched workflow failed"
+    
+    echo ""
+}
+
+test_publish_window_backpressure() {
+    log_section "Testing Backpressure During Quiet Hours"
+    echo ""
+    
+    # Workflows held for a publish window count towards WORKFLOW_QUEUE_MAX
+    PYTHONPATH="$PIPELINES_DIR" python3 -c "
+import asyncio
+from datetime import datetime, timedelta
+from content_automation import ContentAutomationService
+from publish_window import PublishWindows
+from workflow_executor import WorkflowQueueFull
+
+async def main():
+    # Quiet from an hour ago to an hour from now, so the run always falls inside it
+    now = datetime.utcnow()
+    quiet_hours = f\"{now - timedelta(hours=1):%H:%M}-{now + timedelta(hours=1):%H:%M}\"
+    windows = PublishWindows()
+    windows.set('wp_quiet', {'quiet_hours': quiet_hours})
+    service = ContentAutomationService(shared_queue=False, publish_windows=windows)
+    service.executor.max_queue = 3
+    
+    accepted = 0
+    try:
+        for i in range(10):
+            workflow = await service.create_workflow({'user_id': 'test-user', 'connection_id': 'wp_quiet', 'title': f'Post {i}', 'content': f'Body {i}'})
+            await service.start_workflow(workflow.id)
+            accepted += 1
+    except WorkflowQueueFull:
+        pass
+    assert accepted == 3, f'accepted {accepted} workflows into a queue of 3'
+    assert service.pacer.held == 3 and service.is_full(), 'held workflows not counted as queued'
+    print('✅ Quiet-hours backlog is rejected once the queue is full')
+
+asyncio.run(main())
+" && log_success "Publish windows apply queue backpressure" || log_error "Publish window backpressure failed"
+    
+    echo ""
+}
+
+test_update_tags_only() {
+    log_section "Testing Tags-Only Post Update"
+    echo ""
+    
+    # An edit changing only tags must not be deduplicated against the earlier update of the post
+    PYTHONPATH="$PIPELINES_DIR" python3 -c "
+import asyncio, sys, types
+from content_automation import ContentAutomationService, WorkflowStatus
+from publish_window import PublishWindows
+import wordpress_client
+
+async def main():
+    async def credentials(user_id, connection_id):
+        return {'site_url': 'https://example.test'}
+    sys.modules['wordpress_oauth'] = types.SimpleNamespace(pipeline=types.SimpleNamespace(get_wordpress_credentials=credentials))
+    sent = []
+    async def update_post(user_id, connection_id, post_id, changes):
+        sent.append(changes)
+        return {'success': True, 'data': {'id': post_id, 'link': 'https://example.test/?p=42'}}
+    wordpress_client.wordpress_client.update_post = update_post
+    
+    service = ContentAutomationService(shared_queue=False, publish_windows=PublishWindows())
+    edit = {'user_id': 'test-user', 'connection_id': 'wp_test', 'title': 'Post', 'content': '<p>Body</p>', 'update_post_id': 42, 'tags': ['one']}
+    first, _ = await service.create_or_get_workflow(edit)
+    await service.process_workflow(first.id)
+    second, created = await service.create_or_get_workflow({**edit, 'tags': ['two']})
+    assert created and second.id != first.id, 'tags-only update was deduplicated against the earlier one'
+    await service.process_workflow(second.id)
+    assert second.status == WorkflowStatus.COMPLETED and len(sent) == 2 and 'two' in sent[1]['tags'], sent
+    print('✅ Tags-only update reaches update_post')
+
+asyncio.run(main())
+" && log_success "Post updates are not deduplicated by content alone" || log_error "Tags-only post update was dropped"
+    
+    echo ""
+}
+
 demonstrate_content_flow() {
     log_section "Content Automation Flow Demonstration"
     echo ""
@@ -297,6 +409,9 @@ main() {
     test_openwebui_pipelines
     test_content_automation_components
     test_openwebui_wordpress_pipeline
+    test_reschedule_batched_workflow
+    test_publish_window_backpressure
+    test_update_tags_only
     demonstrate_content_flow
     
     generate_summary